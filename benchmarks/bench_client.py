@@ -0,0 +1,67 @@
+"""
+End to end paths of the client against `FakeDatabend`: paging through the
+results of a query and loading rows.
+"""
+import pytest
+
+from benchmarks.fake_server import FakeDatabend, synthetic_rows
+from databend_py import Client
+
+PAGE_ROWS = 10000
+
+
+@pytest.fixture(scope="module")
+def server(bench_rows):
+    with FakeDatabend(rows=bench_rows, page_rows=PAGE_ROWS) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def slow_server():
+    # 1ms per request, small pages: round trips dominate
+    with FakeDatabend(rows=100000, page_rows=1000, latency=0.001) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def rows(bench_rows):
+    return synthetic_rows(bench_rows)
+
+
+def bench_execute(benchmark, server, bench_rows):
+    client = Client.from_url(server.url)
+    _, rows = benchmark.pedantic(client.execute, ("SELECT * FROM t",), rounds=3)
+    assert len(rows) == bench_rows
+
+
+def bench_execute_iter(benchmark, server, bench_rows):
+    client = Client.from_url(server.url)
+
+    def consume():
+        return sum(1 for _ in client.execute_iter("SELECT * FROM t"))
+
+    assert benchmark.pedantic(consume, rounds=3) == bench_rows
+
+
+@pytest.mark.parametrize("prefetch_pages", [0, 4])
+def bench_paging_latency(benchmark, slow_server, prefetch_pages):
+    client = Client.from_url(slow_server.url + f"?prefetch_pages={prefetch_pages}")
+    _, rows = benchmark.pedantic(client.execute, ("SELECT * FROM t",), rounds=3)
+    assert len(rows) == 100000
+
+
+@pytest.mark.parametrize(
+    "url_params",
+    [
+        "",
+        "?stream_upload=true",
+        "?upload_parallelism=4&upload_part_rows=250000",
+        "?load_method=streaming_load",
+    ],
+    ids=["stage", "stage_stream", "stage_parallel", "streaming_load"],
+)
+def bench_insert(benchmark, server, rows, url_params):
+    client = Client.from_url(server.url + url_params)
+    uploaded_bytes = server.uploaded_bytes
+    benchmark.pedantic(client.insert, ("default", "t", rows), rounds=3)
+    benchmark.extra_info["bytes"] = (server.uploaded_bytes - uploaded_bytes) // 3
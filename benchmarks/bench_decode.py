@@ -0,0 +1,173 @@
+"""
+Client side costs measured without any http: decoding the result pages,
+escaping the query parameters and serializing the uploaded rows.
+"""
+import datetime
+import functools
+import tracemalloc
+
+import pytest
+
+from benchmarks.fake_server import SCHEMA, synthetic_page_rows, synthetic_rows
+from databend_py import Client
+from databend_py.context import Context
+from databend_py.result import QueryResult
+from databend_py.util.escape import escape_params, prepare
+
+PAGE_ROWS = 10000
+
+
+@pytest.fixture(scope="module")
+def pages(bench_rows):
+    data = synthetic_page_rows(PAGE_ROWS)
+    count = max(bench_rows // PAGE_ROWS, 1)
+    return [{"schema": SCHEMA, "data": data} for _ in range(count)]
+
+
+@pytest.fixture(scope="module")
+def rows(bench_rows):
+    return synthetic_rows(bench_rows)
+
+
+@pytest.fixture(scope="module")
+def uploader():
+    return Client("localhost")._uploader
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"numpy_decode": True}, {"native_types": True, "timezone": "UTC"}],
+    ids=["python", "numpy", "native_types"],
+)
+def bench_query_result(benchmark, pages, options):
+    def decode():
+        _, rows = QueryResult(iter(pages[1:]), pages[0], **options).get_result()
+        return rows
+
+    rows = benchmark.pedantic(decode, rounds=3)
+    benchmark.extra_info["rows"] = len(rows)
+    assert len(rows) == len(pages) * PAGE_ROWS
+
+
+@pytest.mark.parametrize("compact_rows", [False, True], ids=["tuples", "compact"])
+def bench_query_result_memory(benchmark, pages, compact_rows):
+    def decode():
+        tracemalloc.start()
+        try:
+            _, rows = QueryResult(
+                iter(pages[1:]), pages[0], compact_rows=compact_rows
+            ).get_result()
+            # the pages are shared by the rounds, only the rows are counted
+            benchmark.extra_info["bytes"] = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return rows
+
+    rows = benchmark.pedantic(decode, rounds=1)
+    assert len(rows) == len(pages) * PAGE_ROWS
+
+
+def bench_query_result_lazy(benchmark, pages):
+    # the rows are decoded but only one of their columns is read
+    def decode():
+        _, rows = QueryResult(iter(pages[1:]), pages[0], lazy_rows=True).get_result()
+        return sum(row.id for row in rows)
+
+    benchmark.pedantic(decode, rounds=3)
+
+
+def bench_query_result_iter(benchmark, pages):
+    def decode():
+        count = 0
+        for _ in QueryResult(iter(pages[1:]), pages[0]).iter_result():
+            count += 1
+        return count
+
+    count = benchmark.pedantic(decode, rounds=3)
+    assert count == len(pages) * PAGE_ROWS
+
+
+NESTED_SCHEMA = [
+    {"name": "ids", "type": "Array(Int64)"},
+    {"name": "tags", "type": "Array(Nullable(String))"},
+    {"name": "attrs", "type": "Map(String, String)"},
+    {"name": "pair", "type": "Tuple(Int32, String)"},
+]
+
+
+def bench_query_result_nested(benchmark, bench_rows):
+    data = [
+        [
+            f"[{i},{i + 1},{i + 2}]",
+            f"['tag-{i}',NULL,'it\\'s']",
+            f"{{'k':'v-{i}','n':'{i}'}}",
+            f"({i},'p-{i}')",
+        ]
+        for i in range(PAGE_ROWS)
+    ]
+    count = max(bench_rows // PAGE_ROWS // 10, 1)
+    pages = [{"schema": NESTED_SCHEMA, "data": data} for _ in range(count)]
+
+    def decode():
+        _, rows = QueryResult(iter(pages[1:]), pages[0]).get_result()
+        return rows
+
+    rows = benchmark.pedantic(decode, rounds=3)
+    assert rows[1][1] == ["tag-1", None, "it's"]
+
+
+def bench_escape_params(benchmark):
+    params = {
+        "id": 42,
+        "name": "it's a\tname",
+        "price": 1.5,
+        "day": datetime.date(2024, 1, 1),
+        "tags": ["a", "b'c", None],
+        "pair": (1, "x"),
+    }
+    escaped = benchmark(escape_params, params, Context())
+    assert escaped["name"] == "'it\\'s a\\tname'"
+
+
+def _format_params(query, params, context):
+    return query % escape_params(params, context)
+
+
+@pytest.mark.parametrize("prepared", [False, True], ids=["format", "prepared"])
+def bench_substitute_params(benchmark, prepared):
+    query = (
+        "SELECT * FROM t WHERE id = %(id)s AND name = %(name)s "
+        "AND day >= %(day)s AND tag IN %(tags)s"
+    )
+    params = {
+        "id": 42,
+        "name": "it's a\tname",
+        "day": datetime.date(2024, 1, 1),
+        "tags": ["a", "b'c", None],
+    }
+    context = Context()
+    if prepared:
+        template = prepare(query)
+        substitute = functools.partial(template.substitute, params, context)
+    else:
+        substitute = functools.partial(_format_params, query, params, context)
+    assert benchmark(substitute).startswith("SELECT * FROM t WHERE id = 42 ")
+
+
+def bench_escape_params_large_list(benchmark, bench_rows):
+    params = {"names": [f"name-{i}" for i in range(bench_rows // 100)]}
+    benchmark.pedantic(escape_params, (params, Context()), rounds=3)
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "gzip"])
+def bench_serialize_data(benchmark, uploader, rows, compress):
+    output = benchmark.pedantic(uploader._serialize_data, (rows, compress), rounds=3)
+    benchmark.extra_info["bytes"] = len(output)
+
+
+def bench_serialize_data_stream(benchmark, uploader, rows):
+    def serialize():
+        return sum(len(chunk) for chunk in uploader._serialize_data_stream(rows, False))
+
+    size = benchmark.pedantic(serialize, rounds=3)
+    benchmark.extra_info["bytes"] = size
@@ -0,0 +1,11 @@
+import os
+
+import pytest
+
+# rows of the synthetic datasets, 1M by default
+BENCH_ROWS = int(os.getenv("DATABEND_BENCH_ROWS", "1000000"))
+
+
+@pytest.fixture(scope="session")
+def bench_rows():
+    return BENCH_ROWS
@@ -0,0 +1,175 @@
+import itertools
+import json
+import re
+import threading
+import time
+
+from tests.stub_server import StubServer, json_response
+
+SCHEMA = [
+    {"name": "id", "type": "UInt64"},
+    {"name": "name", "type": "String"},
+    {"name": "price", "type": "Float64"},
+    {"name": "qty", "type": "Nullable(Int32)"},
+    {"name": "flag", "type": "Boolean"},
+    {"name": "created", "type": "Timestamp"},
+]
+
+PRESIGN_SCHEMA = [
+    {"name": "method", "type": "String"},
+    {"name": "headers", "type": "Variant"},
+    {"name": "url", "type": "String"},
+]
+
+_LIMIT = re.compile(r"\blimit\s+(\d+)\s*$", re.IGNORECASE)
+_PAGE_PATH = re.compile(r"^/v1/query/([^/]+)/page/(\d+)$")
+
+
+def synthetic_page_rows(n, offset=0):
+    """
+    :return: `n` rows of `SCHEMA` as encoded in the pages, every value a
+             string.
+    """
+    return [
+        [
+            str(i),
+            f"name-{i}",
+            f"{i % 1000}.25",
+            "NULL" if i % 5 == 0 else str(i % 100),
+            "1" if i % 2 else "0",
+            f"2024-01-01 00:00:{i % 60:02d}.000000",
+        ]
+        for i in range(offset, offset + n)
+    ]
+
+
+def synthetic_rows(n):
+    """
+    :return: `n` rows of `SCHEMA` as passed to `Client.insert`.
+    """
+    return [
+        (
+            i,
+            f"name-{i}",
+            i % 1000 + 0.25,
+            None if i % 5 == 0 else i % 100,
+            bool(i % 2),
+            f"2024-01-01 00:00:{i % 60:02d}",
+        )
+        for i in range(n)
+    ]
+
+
+class FakeDatabend:
+    """
+    In-process stand-in of a Databend server for the benchmarks, serving:
+
+    - `SELECT` queries: `rows` rows of `SCHEMA` (or `LIMIT n` rows), paged
+      by `page_rows` rows through `next_uri`.
+    - `presign upload`: an url of the stage sink on the server itself.
+    - `PUT` on the stage or `/v1/streaming_load`: the body is counted and
+      dropped.
+    - any other statement: an empty result.
+
+    Each request is held `latency` seconds, as a network round trip. Pages
+    are rendered once per size, so that the server, running in the same
+    process, takes as little as possible from the measured client.
+
+        with FakeDatabend(rows=100000, page_rows=10000) as server:
+            client = Client.from_url(server.url)
+    """
+
+    def __init__(self, rows=1000, page_rows=10000, latency=0.0):
+        self.rows = rows
+        self.page_rows = page_rows
+        self.latency = latency
+        self.queries = 0
+        self.pages = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self._query_ids = itertools.count()
+        self._data = {}
+        self._lock = threading.Lock()
+        self.server = StubServer(self.handle, record=False)
+
+    @property
+    def url(self):
+        return self.server.url
+
+    def __enter__(self):
+        self.server.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.__exit__(*exc_info)
+
+    def handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        if request.method == "PUT":
+            return self._sink(request)
+        if request.method == "GET":
+            match = _PAGE_PATH.match(request.path)
+            if match is None:
+                return json_response({"error": "not found"}, 404)
+            query_id, page = match.groups()
+            return self._page(query_id, int(page))
+        return self._query(request.json()["sql"])
+
+    def _query(self, sql):
+        with self._lock:
+            self.queries += 1
+        statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if statement == "PRESIGN":
+            path = sql.rsplit(None, 1)[-1].lstrip("@~/")
+            url = f"http://127.0.0.1:{self.server.port}/stage/{path}"
+            return self._result("presign", PRESIGN_SCHEMA, [["PUT", "{}", url]], None)
+        if statement != "SELECT":
+            return self._result("statement", [], [], None)
+        match = _LIMIT.search(sql)
+        rows = int(match.group(1)) if match else self.rows
+        # the rows count of the query goes along its id, in the page urls
+        query_id = f"{next(self._query_ids)}-{rows}"
+        return self._page(query_id, 0)
+
+    def _page(self, query_id, page):
+        with self._lock:
+            self.pages += 1
+        rows = int(query_id.rsplit("-", 1)[1])
+        offset = page * self.page_rows
+        count = max(min(self.page_rows, rows - offset), 0)
+        next_uri = None
+        if offset + count < rows:
+            next_uri = f"/v1/query/{query_id}/page/{page + 1}"
+        return self._result(query_id, SCHEMA, self._page_data(count), next_uri)
+
+    def _page_data(self, count):
+        data = self._data.get(count)
+        if data is None:
+            data = json.dumps(synthetic_page_rows(count)).encode()
+            self._data[count] = data
+        return data
+
+    @staticmethod
+    def _result(query_id, schema, data, next_uri):
+        if not isinstance(data, bytes):
+            data = json.dumps(data).encode()
+        head = json.dumps(
+            {
+                "id": query_id,
+                "session": {"database": "default"},
+                "schema": schema,
+                "error": None,
+                "next_uri": next_uri,
+            }
+        ).encode()
+        # the rendered data is spliced in rather than encoded again
+        return 200, {"Content-Type": "application/json"}, head[:-1] + b', "data": ' + data + b"}"
+
+    def _sink(self, request):
+        with self._lock:
+            self.uploads += 1
+            self.uploaded_bytes += len(request.body)
+        if request.path.startswith("/v1/streaming_load"):
+            return json_response({"id": "load", "stats": {"bytes": len(request.body)}})
+        return 200, {}, b""
@@ -0,0 +1,20 @@
+"""
+`databend-py-bench` against `FakeDatabend`, measuring the client alone:
+
+    python -m benchmarks.load --threads 8 --mix execute=4,insert=1 --duration 30
+"""
+import sys
+
+from benchmarks.fake_server import FakeDatabend
+from databend_py import bench
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # the fake server shares the interpreter with the threads it serves
+    with FakeDatabend() as server:
+        return bench.main([server.url] + argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
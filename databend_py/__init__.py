@@ -1,4 +1,6 @@
 from .client import Client
+from .async_client import AsyncClient
+from .pool import ClientPool
 from .connection import Connection
 from .datetypes import DatabendDataType
 
@@ -17,6 +19,8 @@ from databend_driver import (
 
 __all__ = [
     "Client",
+    "AsyncClient",
+    "ClientPool",
     "Connection",
     "DatabendDataType",
     "AsyncDatabendClient",
@@ -0,0 +1,277 @@
+import asyncio
+import functools
+import time
+
+from .async_connection import AsyncConnection
+from .async_uploader import AsyncDataUploader
+from .cache import ResultCache, is_read_only, result_cache_key
+from .client import BaseClient
+from .connection import QueryID
+from .pagination import Pagination, PollBackoff
+from .prefetch import AsyncPagePrefetcher
+from .result import CompactRows, QueryResult
+from .retry import RetryPolicy
+from .tracing import get_tracer
+from .util.escape import prepare
+from .util.helper import Helper, asbool
+
+
+class AsyncQueryResult(QueryResult):
+    """
+    `QueryResult` fed by an async generator of pages.
+    """
+
+    async def get_result(self):
+        self.store_columns(self.first_data)
+        self.store_data(self.first_data)
+        async for d in self.data_generator:
+            self.store_data(d)
+
+        if self.with_column_types:
+            return self.columns_with_types, self.data
+        else:
+            return [], self.data
+
+    async def iter_result(self):
+        self.store_columns(self.first_data)
+        raw_data, self.first_data = self.first_data, None
+        try:
+            while raw_data is not None:
+                rows = self.page_rows(raw_data)
+                raw_data = None
+                for row in rows:
+                    yield row
+                # drop the consumed page before fetching the next one
+                rows = None
+                try:
+                    raw_data = await self.data_generator.__anext__()
+                except StopAsyncIteration:
+                    raw_data = None
+        finally:
+            await self.data_generator.aclose()
+
+
+class AsyncClient(BaseClient):
+    """
+    asyncio client for communication with the databend http server, it
+    mirrors `Client` with coroutines and requires aiohttp.
+    Single connection is established per each connected instance of the client,
+    `close` must be awaited when done with it:
+
+        async with AsyncClient.from_url(url) as client:
+            _, rows = await client.execute("SELECT 1")
+    """
+
+    def __init__(self, *args, **kwargs):
+        # the presign pool thread runs a blocking `Client`
+        presign_client_factory = functools.partial(
+            self._presign_client, args, dict(kwargs)
+        )
+        self.settings = (kwargs.pop("settings", None) or {}).copy()
+        self.result_config = (kwargs.pop("result_config", None) or {}).copy()
+        self.result_cache = kwargs.pop("result_cache", None)
+        self.connection = AsyncConnection(*args, **kwargs)
+        self.query_result_cls = AsyncQueryResult
+        self.helper = Helper
+        self._debug = asbool(self.settings.get("debug", False))
+        self._prefetch_pages = int(self.settings.get("prefetch_pages", 0))
+        self.connection.pagination = Pagination.from_settings(self.settings)
+        self.connection.retry_policy = RetryPolicy.from_settings(self.settings)
+        if self.result_cache is None:
+            self.result_cache = ResultCache.from_settings(self.settings)
+        self.connection.tracer = get_tracer(self.settings.get("tracer"), self._debug)
+        self._uploader = AsyncDataUploader(
+            self,
+            self.connection,
+            self.settings,
+            compress=self.settings.get("compress", False),
+            stream=asbool(self.settings.get("stream_upload", False)),
+            presign_client_factory=presign_client_factory,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        self.disconnect()
+        if self._uploader.presign_pool is not None:
+            self._uploader.presign_pool.close()
+        await self.connection.close()
+
+    @property
+    def retry_stats(self):
+        return self.connection.retry_policy.stats.as_dict()
+
+    def disconnect(self):
+        self.connection.disconnect()
+
+    async def _data_generator(self, raw_data, settings=None):
+        backoff = PollBackoff()
+        fetch_page = functools.partial(self._receive_next_data, backoff=backoff)
+        page_rows = [len(raw_data.get("data") or ())]
+        if self._prefetch_pages > 0:
+            pages = AsyncPagePrefetcher(fetch_page, raw_data, self._prefetch_pages)
+        else:
+            pages = self._fetch_pages(fetch_page, raw_data)
+        del raw_data
+        try:
+            async for page in pages:
+                page_rows.append(len(page.get("data") or ()))
+                yield page
+        except (Exception, KeyboardInterrupt):
+            self.disconnect()
+            raise
+        finally:
+            await pages.aclose()
+        if not (settings and settings.get("max_rows_per_page")):
+            self.connection.pagination.observe(page_rows)
+
+    @staticmethod
+    async def _fetch_pages(fetch_page, raw_data):
+        while raw_data["next_uri"] is not None:
+            raw_data = await fetch_page(raw_data)
+            yield raw_data
+
+    async def _receive_next_data(self, raw_data, backoff=None):
+        start_time = time.monotonic()
+        raw_data = await self._receive_data(raw_data["next_uri"], raw_data.get(QueryID))
+        if backoff is not None:
+            await asyncio.sleep(
+                backoff.observe(raw_data, time.monotonic() - start_time)
+            )
+        return raw_data
+
+    async def _receive_data(self, next_uri, query_id=None):
+        resp = await self.connection.next_page(next_uri, query_id)
+        raw_data = self.connection.decode_page(resp)
+        helper = self.helper()
+        helper.response = raw_data
+        helper.check_error()
+        return raw_data
+
+    async def _query_result(self, query, with_column_types=False, settings=None):
+        raw_data = await self.connection.query(query, settings)
+        helper = self.helper()
+        helper.response = raw_data
+        helper.check_error()
+        gen = self._data_generator(raw_data, settings)
+        return self.query_result_cls(
+            gen,
+            raw_data,
+            with_column_types=with_column_types,
+            **self._result_config()
+        )
+
+    async def execute(
+            self, query, params=None, with_column_types=False, query_id=None, settings=None
+    ):
+        """
+        Executes query, see `Client.execute`.
+        """
+        if isinstance(params, (list, tuple)):
+            # remove the `\n` '\s' `\t` in the SQL
+            query = " ".join([s.strip() for s in query.splitlines()]).strip()
+            self._invalidate_result_cache()
+            query, tuple_ls = self._prepare_insert_query(query, params)
+            if tuple_ls:
+                await self._uploader.upload_to_table_by_attachment(query, tuple_ls)
+            return [], len(tuple_ls)
+
+        if params is not None:
+            query = self._substitute_params(query, params, self.connection.context)
+        if self.result_cache is not None:
+            return await self._cached_query(query, with_column_types, settings)
+        result = await self._query_result(
+            query, with_column_types=with_column_types, settings=settings
+        )
+        return await result.get_result()
+
+    async def _cached_query(self, query, with_column_types=False, settings=None):
+        """
+        See `Client._cached_receive_result`.
+        """
+        if not is_read_only(query):
+            self._invalidate_result_cache()
+        key = result_cache_key(query, self.connection)
+        result = self.result_cache.get(key) if key is not None else None
+        if result is None:
+            query_result = await self._query_result(
+                query, with_column_types=True, settings=settings
+            )
+            result = await query_result.get_result()
+            if key is not None:
+                self.result_cache.put(key, *result)
+        columns, rows = result
+        if not isinstance(rows, CompactRows):
+            rows = list(rows)
+        return (list(columns) if with_column_types else []), rows
+
+    async def execute_iter(
+            self, query, params=None, with_column_types=False, query_id=None, settings=None
+    ):
+        """
+        Executes query and yields the rows page by page, see
+        `Client.execute_iter`. To be consumed with `async for`, a consumer
+        breaking early awaits `aclose()` on the iterator to stop the fetch
+        of the next pages at once rather than when it is collected.
+        """
+        if params is not None:
+            query = self._substitute_params(query, params, self.connection.context)
+        result = await self._query_result(
+            query, with_column_types=with_column_types, settings=settings
+        )
+        rows = result.iter_result()
+        try:
+            async for row in rows:
+                yield row
+        finally:
+            await rows.aclose()
+
+    async def executemany(self, query, seq_of_params, settings=None):
+        """
+        Executes the query once per parameters, see `Client.executemany`.
+        """
+        query = prepare(query)
+        seq_of_params = list(seq_of_params)
+        rows = self._batch_insert_rows(query, seq_of_params)
+        if rows is not None:
+            return (await self.execute(query, rows))[1]
+        for params in seq_of_params:
+            await self.execute(query, params, settings=settings)
+        return len(seq_of_params)
+
+    async def insert(self, database_name, table_name, data):
+        """
+        insert the data into database.table, see `Client.insert`.
+        """
+        self._invalidate_result_cache()
+        await self._uploader.upload_to_table_by_copy(
+            f"{database_name}.{table_name}", data
+        )
+
+    async def replace(self, database_name, table_name, conflict_keys, data):
+        """
+        replace the data into database.table, see `Client.replace`.
+        """
+        self._invalidate_result_cache()
+        await self._uploader.replace_into_table(
+            f"{database_name}.{table_name}", conflict_keys, data
+        )
+
+    async def upload_to_stage(self, stage_dir, file_name, data):
+        """
+        upload the file to user stage, see `Client.upload_to_stage`.
+        """
+        return await self._uploader.upload_to_stage(stage_dir, file_name, data)
+
+    async def begin(self):
+        await self.execute("BEGIN")
+
+    async def commit(self):
+        await self.execute("COMMIT")
+
+    async def rollback(self):
+        await self.execute("ROLLBACK")
@@ -0,0 +1,172 @@
+import asyncio
+import time
+import uuid
+
+from . import log
+from .connection import Connection, QueryID, StreamingLoadPath, XDatabendSQLHeader
+from .pagination import PollBackoff
+from .tracing import NOOP_SPAN
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncResponse:
+    """
+    Body and status of an aiohttp response, read once so that it can be
+    handled like a `requests.Response` by `Connection` and `PageFormat`.
+    """
+
+    __slots__ = ("content", "cookies", "headers", "status_code")
+
+    def __init__(self, status_code, headers, content, cookies):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.cookies = cookies
+
+    @classmethod
+    async def read(cls, response):
+        content = await response.read()
+        return cls(response.status, response.headers, content, response.cookies)
+
+
+class AsyncConnection(Connection):
+    """
+    asyncio counterpart of `Connection` on top of aiohttp. Settings, session
+    state and cookies are handled the same way, only the http calls differ.
+    The aiohttp session is created on first use, inside the running loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for the async client: "
+                "pip install databend-py[async]"
+            )
+        super().__init__(*args, **kwargs)
+        self.aiohttp_session = None
+        self.upload_session = None
+
+    def get_session(self):
+        if self.aiohttp_session is None or self.aiohttp_session.closed:
+            # like GlobalCookieJar, cookies are shared whatever the host
+            cookie_jar = aiohttp.CookieJar(unsafe=True)
+            cookie_jar.update_cookies({"cookie_enabled": "true"})
+            self.aiohttp_session = aiohttp.ClientSession(
+                cookie_jar=cookie_jar,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.connect_timeout, sock_read=self.read_timeout
+                ),
+            )
+        return self.aiohttp_session
+
+    def get_upload_session(self):
+        if self.upload_session is None or self.upload_session.closed:
+            # presigned urls are sent neither the cookies nor the headers
+            self.upload_session = aiohttp.ClientSession(
+                cookie_jar=aiohttp.DummyCookieJar()
+            )
+        return self.upload_session
+
+    async def close(self):
+        for session in (self.aiohttp_session, self.upload_session):
+            if session is not None:
+                await session.close()
+        self.aiohttp_session = None
+        self.upload_session = None
+
+    async def do_query(self, url, query_sql, query_id=None):
+        with self.tracer.span("query.submit", query_id=query_id) as span:
+            return await self.retry_policy.call_async(
+                self._do_query, url, query_sql, query_id, span
+            )
+
+    async def _do_query(self, url, query_sql, query_id=None, span=NOOP_SPAN):
+        async with self.get_session().post(
+            url,
+            data=self.codec.dumps(query_sql),
+            headers=self.make_query_headers(query_id),
+        ) as response:
+            response = await AsyncResponse.read(response)
+        span.set_attribute("bytes", len(response.content))
+        return self.parse_query_response(response)
+
+    async def query(self, statement, settings=None):
+        url = self.format_url()
+        log.logger.debug(f"http sql: {statement}")
+        query_sql = self.make_query_sql(statement, settings)
+        # the query id goes with each request instead of the shared headers,
+        # so that concurrent queries don't mix their pages up
+        query_id = str(uuid.uuid4())
+        try:
+            with self.tracer.span("query", sql=statement, query_id=query_id) as span:
+                resp_dict = await self.do_query(url, query_sql, query_id)
+                self.update_session(resp_dict)
+                resp_dict = await self.wait_until_has_schema(resp_dict)
+                span.set_attribute("rows", len(resp_dict.get("data") or ()))
+                return resp_dict
+        except Exception as err:
+            log.logger.error(
+                f"http error on {url}, SQL: {statement} error msg:{str(err)}"
+            )
+            raise
+
+    async def wait_until_has_schema(self, raw_data_dict):
+        backoff = PollBackoff()
+        resp_schema = raw_data_dict.get("schema")
+        while resp_schema is not None and len(resp_schema) == 0:
+            if raw_data_dict["next_uri"] is None:
+                break
+            start_time = time.monotonic()
+            resp = await self.next_page(
+                raw_data_dict["next_uri"], raw_data_dict.get(QueryID)
+            )
+
+            raw_data_dict = self.decode_page(resp)
+            resp_schema = raw_data_dict.get("schema")
+            if resp_schema is not None and (
+                len(resp_schema) != 0 or len(raw_data_dict.get("data")) != 0
+            ):
+                break
+            await asyncio.sleep(
+                backoff.observe(raw_data_dict, time.monotonic() - start_time)
+            )
+        return raw_data_dict
+
+    async def next_page(self, next_uri, query_id=None):
+        url = self.format_page_url(next_uri)
+        with self.tracer.span("page.fetch", query_id=query_id) as span:
+            response = await self.retry_policy.call_async(
+                self._get_page, url, query_id, idempotent=True
+            )
+            span.set_attribute("bytes", len(response.content))
+        return response
+
+    async def _get_page(self, url, query_id=None):
+        async with self.get_session().get(
+            url, headers=self.make_query_headers(query_id), cookies=self.cookies
+        ) as response:
+            response = await AsyncResponse.read(response)
+        self.check_page_response(url, response)
+        return response
+
+    async def streaming_load(self, sql, body, content_type):
+        url = self.format_endpoint_url(StreamingLoadPath)
+        headers = self.make_query_headers(str(uuid.uuid4()))
+        headers[XDatabendSQLHeader] = sql
+        headers["Content-Type"] = content_type
+        log.logger.debug(f"streaming load sql: {sql}")
+        async with self.get_session().put(
+            url, data=body, headers=headers
+        ) as response:
+            response = await AsyncResponse.read(response)
+        return self.parse_load_response(response)
+
+    async def put(self, url, headers, data):
+        async with self.get_upload_session().put(
+            url, headers=headers, data=data
+        ) as response:
+            response.raise_for_status()
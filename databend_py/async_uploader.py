@@ -0,0 +1,226 @@
+import asyncio
+import io
+import uuid
+from collections.abc import Iterator
+
+from . import log
+from .parquet import is_arrow_table, to_arrow_table
+from .presign import presign_headers
+from .uploader import DataUploader
+
+
+class AsyncDataUploader(DataUploader):
+    """
+    asyncio counterpart of `DataUploader`, statements and serialization are
+    shared, presign, PUT and COPY go through the `AsyncClient`.
+    """
+
+    async def upload_to_table_by_copy(self, table_name, data):
+        if self._is_empty(data):
+            return
+        with self._forget_columns_on_error(table_name):
+            data = await self._prepare_data(table_name, data)
+            if self._load_method == "streaming_load":
+                await self._streaming_load(
+                    f"INSERT INTO {table_name}", data, self._file_type()
+                )
+                return
+            stage_path, files = await self._upload_data_to_stage(data, file_list=True)
+            await self._execute_copy(table_name, stage_path, self._file_type(), files)
+
+    async def upload_to_table_by_attachment(self, sql_statement, data):
+        if self._is_empty(data):
+            return
+        table_name, column_names = self._parse_insert_statement(sql_statement)
+        with self._forget_columns_on_error(table_name):
+            data = await self._prepare_data(table_name, data, column_names)
+            if self._load_method == "streaming_load":
+                await self._streaming_load(
+                    self._strip_values(sql_statement), data, self._file_type()
+                )
+                return
+            stage_path, _ = await self._upload_data_to_stage(data)
+            await self._execute_with_attachment(
+                sql_statement, stage_path, self._file_type()
+            )
+
+    async def replace_into_table(self, table_name, conflict_keys, data):
+        if self._is_empty(data):
+            return
+        with self._forget_columns_on_error(table_name):
+            data = await self._prepare_data(table_name, data)
+            if self._load_method == "streaming_load":
+                await self._streaming_load(
+                    f"REPLACE INTO {table_name} ON ({','.join(conflict_keys)})",
+                    data,
+                    self._file_type(),
+                )
+                return
+            stage_path, _ = await self._upload_data_to_stage(data)
+            sql_statement = (
+                f"REPLACE INTO {table_name} ON ({','.join(conflict_keys)}) VALUES"
+            )
+            await self._execute_with_attachment(
+                sql_statement, stage_path, self._file_type()
+            )
+
+    async def upload_to_stage(self, stage_dir, filename, data):
+        stage_path = self._gen_stage_path(stage_dir, filename)
+        presigned_url, headers = await self._execute_presign(stage_path)
+        await self._upload_to_presigned_url(presigned_url, headers, data)
+        return stage_path
+
+    async def _upload_data_to_stage(self, data, file_list=False):
+        """
+        See `DataUploader._upload_data_to_stage`, the parts are presigned and
+        uploaded by up to `upload_parallelism` concurrent tasks.
+        """
+        offsets = self._split_parts(data)
+        if offsets is None:
+            stage_path, presigned_url, headers = await self._presign_stage_file()
+            await self._upload_to_presigned_url(presigned_url, headers, data)
+            return stage_path, None
+
+        pooled = file_list and self.presign_pool is not None
+        if pooled:
+            stage_dir = self.default_stage_dir
+        else:
+            stage_dir = self._gen_stage_path(self.default_stage_dir, str(uuid.uuid4()))
+        semaphore = asyncio.Semaphore(self._parallelism)
+
+        async def upload_part(filename, offset):
+            async with semaphore:
+                if pooled:
+                    stage_path, presigned_url, headers = await self._presign_stage_file()
+                    filename = stage_path.rsplit("/", 1)[1]
+                else:
+                    presigned_url, headers = await self._execute_presign(
+                        f"{stage_dir}/{filename}"
+                    )
+                await self._upload_to_presigned_url(
+                    presigned_url, headers, self._slice_part(data, offset)
+                )
+            return filename
+
+        files = await asyncio.gather(
+            *[
+                upload_part(f, offset)
+                for f, offset in zip(self._gen_part_filenames(len(offsets)), offsets)
+            ]
+        )
+        return stage_dir + "/", list(files)
+
+    async def _presign_stage_file(self):
+        # the pool never blocks, it is filled by a thread of its own
+        presigned = self.presign_pool.get() if self.presign_pool else None
+        if presigned is not None:
+            return presigned.stage_path, presigned.url, presigned.headers
+        stage_path = self._gen_stage_path(self.default_stage_dir)
+        presigned_url, headers = await self._execute_presign(stage_path)
+        return stage_path, presigned_url, headers
+
+    async def _prepare_data(self, table_name, data, column_names=None):
+        if self._format != "parquet":
+            return data
+        if column_names is None and not isinstance(data, dict) and not is_arrow_table(data):
+            column_names = await self._table_column_names(table_name)
+        return to_arrow_table(data, column_names)
+
+    async def _table_column_names(self, table_name):
+        if table_name not in self._column_names:
+            columns, _ = await self.client.execute(
+                f"SELECT * FROM {table_name} LIMIT 0", with_column_types=True
+            )
+            self._column_names[table_name] = [name for name, _ in columns]
+        return self._column_names[table_name]
+
+    async def _execute_presign(self, stage_path):
+        with self.connection.tracer.span("upload.presign", stage_path=stage_path):
+            _, row = await self.client.execute(f"presign upload {stage_path}")
+        presigned_url = row[0][2]
+        headers = presign_headers(row[0][1], self.connection.codec)
+        return presigned_url, headers
+
+    async def _upload_to_presigned_url(self, presigned_url, headers, data):
+        if self._stream and isinstance(data, (list, Iterator)):
+            await self._upload_stream_to_presigned_url(presigned_url, headers, data)
+            return
+        # the rows are serialized by a thread, not to block the event loop
+        loop = asyncio.get_running_loop()
+        if isinstance(data, (bytes, io.IOBase)):
+            buf = data if isinstance(data, bytes) else data.read()
+            rows = None
+        elif is_arrow_table(data):
+            buf = await loop.run_in_executor(None, self._serialize_parquet, data)
+            rows = len(data)
+        elif isinstance(data, list):
+            buf = await loop.run_in_executor(
+                None, self._serialize_data, data, self._compress
+            )
+            rows = len(data)
+        else:
+            raise TypeError(f"data is not bytes, File, or a list: {type(data)}")
+        with self.connection.tracer.span("upload.put", rows=rows, bytes=len(buf)):
+            await self.connection.put(presigned_url, headers, buf)
+
+    @staticmethod
+    async def _async_chunks(chunks):
+        for chunk in chunks:
+            yield chunk
+            # let the other tasks run between two chunks
+            await asyncio.sleep(0)
+
+    async def _upload_stream_to_presigned_url(self, presigned_url, headers, data):
+        stats = {}
+        chunks = self._serialize_data_stream(data, self._compress, stats)
+        with self.connection.tracer.span("upload.put", stream=True) as span:
+            try:
+                await self.connection.put(
+                    presigned_url, headers, self._async_chunks(chunks)
+                )
+            finally:
+                span.set_attribute("rows", stats.get("rows", 0))
+                span.set_attribute("bytes", stats.get("bytes", 0))
+
+    async def _streaming_load(self, statement, data, file_type):
+        with self.connection.tracer.span("upload.streaming_load", sql=statement) as span:
+            # serialized by a thread, or chunk by chunk between the other tasks
+            # when streaming
+            sql, body, content_type = await asyncio.get_running_loop().run_in_executor(
+                None, self._make_load_request, statement, data, file_type
+            )
+            if not isinstance(body, bytes):
+                body = self._async_chunks(body)
+            resp_dict = await self.connection.streaming_load(sql, body, content_type)
+            self._set_load_stats(span, resp_dict)
+        return resp_dict
+
+    async def _execute_copy(self, table_name, stage_path, file_type, files=None):
+        sql = self._make_copy_statement(table_name, stage_path, file_type, files)
+        with self.connection.tracer.span(
+            "upload.copy", table=table_name, stage_path=stage_path
+        ):
+            await self.client.execute(sql)
+
+    async def _execute_with_attachment(self, sql_statement, stage_path, file_type):
+        data = self._make_attachment(sql_statement, stage_path, file_type)
+        url = self.connection.format_url()
+        # a query id of its own, see `AsyncConnection.query`
+        query_id = str(uuid.uuid4())
+
+        try:
+            with self.connection.tracer.span(
+                "upload.attachment",
+                sql=sql_statement,
+                stage_path=stage_path,
+                query_id=query_id,
+            ):
+                resp_dict = await self.connection.do_query(url, data, query_id)
+            self.client_session = resp_dict.get(
+                "session", self.connection.default_session()
+            )
+        except Exception as e:
+            log.logger.error(
+                f"http error on {url}, SQL: {sql_statement} error msg:{e!s}"
+            )
+            raise
@@ -0,0 +1,413 @@
+"""
+Load generator measuring the throughput and the latency percentiles of the
+client, per operation and per phase (see `databend_py.tracing`):
+
+    databend-py-bench http://root:@localhost:8000/default \\
+        --threads 8 --mix execute=4,insert=1 --duration 30
+
+`python -m benchmarks.load` runs it against the in-process fake server of the
+benchmarks instead, from a source checkout.
+"""
+import argparse
+import collections
+import itertools
+import json
+import math
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from . import log
+from .client import Client
+from .tracing import Span, Tracer
+
+OPERATIONS = ("execute", "execute_iter", "insert", "upload_to_stage")
+
+# spans whose bytes went over the network, summed per operation
+TRANSFER_SPANS = (
+    "query.submit",
+    "page.fetch",
+    "upload.put",
+    "upload.streaming_load",
+)
+
+TABLE_COLUMNS = (
+    "id UInt64, name String, price Float64, qty Int32 NULL, "
+    "flag Boolean, created Timestamp"
+)
+
+
+def synthetic_rows(n):
+    """
+    :return: `n` rows of the `TABLE_COLUMNS` table.
+    """
+    return [
+        (
+            i,
+            f"name-{i}",
+            i % 1000 + 0.25,
+            None if i % 5 == 0 else i % 100,
+            bool(i % 2),
+            f"2024-01-01 00:00:{i % 60:02d}",
+        )
+        for i in range(n)
+    ]
+
+
+def parse_mix(mix):
+    """
+    :param mix: weighted operations, e.g. `execute=4,insert=1`.
+    :return: the operations to cycle through, repeated by weight.
+    """
+    operations = []
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        operations.extend([name] * int(weight or 1))
+    if not operations:
+        raise ValueError(f"Empty operation mix: {mix}")
+    return operations
+
+
+def percentile(sorted_values, p):
+    """
+    :return: the nearest-rank `p` percentile of the sorted values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100.0 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class StatsSpan(Span):
+    __slots__ = ("attributes", "name", "start_time", "tracer")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start_time = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(
+            self.name,
+            time.perf_counter() - self.start_time,
+            self.attributes.get("rows"),
+            self.attributes.get("bytes"),
+        )
+        return False
+
+
+class StatsTracer(Tracer):
+    """
+    Records the latency, rows and bytes of each span of a single thread.
+    """
+
+    def __init__(self):
+        self.samples = collections.defaultdict(list)
+        self.transferred_bytes = 0
+
+    def span(self, name, **attributes):
+        return StatsSpan(self, name, attributes)
+
+    def record(self, name, seconds, rows=None, nbytes=None):
+        self.samples[name].append((seconds, rows or 0, nbytes or 0))
+        if name in TRANSFER_SPANS:
+            self.transferred_bytes += nbytes or 0
+
+
+class Worker:
+    """
+    Runs the operations of the mix in a loop with a client of its own, until
+    the deadline or for `iterations` operations.
+    """
+
+    def __init__(self, options, offset):
+        self.options = options
+        self.operations = parse_mix(options.mix)
+        # the workers don't all start with the same operation
+        self.offset = offset % len(self.operations)
+        self.rows = synthetic_rows(options.batch_rows)
+        self.tracer = StatsTracer()
+        self.operation_samples = collections.defaultdict(list)
+        # exception type names of the failed operations, per operation
+        self.errors = collections.defaultdict(collections.Counter)
+
+    def run(self, deadline):
+        client = Client.from_url(self.options.dsn)
+        client.connection.tracer = self.tracer
+        operations = itertools.islice(
+            itertools.cycle(self.operations), self.offset, None
+        )
+        try:
+            for count, name in enumerate(operations):
+                if self.options.iterations is not None:
+                    if count >= self.options.iterations:
+                        break
+                elif time.monotonic() >= deadline:
+                    break
+                self.run_operation(client, name)
+        finally:
+            client.close()
+
+    def run_operation(self, client, name):
+        transferred_bytes = self.tracer.transferred_bytes
+        start_time = time.perf_counter()
+        try:
+            rows = getattr(self, name)(client)
+        except Exception as e:  # noqa: BLE001 - logged and counted in the report
+            log.logger.warning(f"bench {name} failed: {e!r}", exc_info=True)
+            self.errors[name][type(e).__name__] += 1
+            return
+        self.operation_samples[name].append(
+            (
+                time.perf_counter() - start_time,
+                rows,
+                self.tracer.transferred_bytes - transferred_bytes,
+            )
+        )
+
+    def execute(self, client):
+        _, rows = client.execute(self.options.query)
+        return len(rows)
+
+    def execute_iter(self, client):
+        return sum(1 for _ in client.execute_iter(self.options.query))
+
+    def insert(self, client):
+        database, _, table = self.options.table.rpartition(".")
+        client.insert(database or client.connection.database, table, self.rows)
+        return len(self.rows)
+
+    def upload_to_stage(self, client):
+        client.upload_to_stage(
+            self.options.stage, f"bench-{uuid.uuid4()}.csv", self.rows
+        )
+        return len(self.rows)
+
+
+def run_threads(options, process_index=0):
+    """
+    :return: the samples of the operations and of the phases, and the
+             exception type counts of the errors, of `options.threads`
+             workers.
+    """
+    workers = [
+        Worker(options, process_index * options.threads + i)
+        for i in range(options.threads)
+    ]
+    deadline = time.monotonic() + options.duration
+    threads = [
+        threading.Thread(target=worker.run, args=(deadline,)) for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    operations = collections.defaultdict(list)
+    phases = collections.defaultdict(list)
+    errors = collections.defaultdict(collections.Counter)
+    for worker in workers:
+        for name, samples in worker.operation_samples.items():
+            operations[name].extend(samples)
+        for name, samples in worker.tracer.samples.items():
+            phases[name].extend(samples)
+        for name, types in worker.errors.items():
+            errors[name].update(types)
+    return dict(operations), dict(phases), dict(errors)
+
+
+def run(options):
+    """
+    :return: the report of the run, see `summarize`.
+    """
+    start_time = time.monotonic()
+    if options.processes <= 1:
+        results = [run_threads(options)]
+    else:
+        with ProcessPoolExecutor(max_workers=options.processes) as executor:
+            results = list(
+                executor.map(
+                    run_threads,
+                    [options] * options.processes,
+                    range(options.processes),
+                )
+            )
+    elapsed = time.monotonic() - start_time
+
+    operations = collections.defaultdict(list)
+    phases = collections.defaultdict(list)
+    errors = collections.defaultdict(collections.Counter)
+    for result_operations, result_phases, result_errors in results:
+        for name, samples in result_operations.items():
+            operations[name].extend(samples)
+        for name, samples in result_phases.items():
+            phases[name].extend(samples)
+        for name, types in result_errors.items():
+            errors[name].update(types)
+    return {
+        "elapsed": elapsed,
+        "workers": options.processes * options.threads,
+        "operations": {
+            name: summarize(operations.get(name, ()), elapsed, errors.get(name))
+            for name in sorted(set(operations) | set(errors))
+        },
+        "phases": {
+            name: summarize(samples, elapsed) for name, samples in sorted(phases.items())
+        },
+    }
+
+
+def summarize(samples, elapsed, errors=None):
+    """
+    :param samples: `(seconds, rows, bytes)` of each operation or phase.
+    :param elapsed: wall clock seconds of the run, throughputs are the ones
+                    of all the workers together.
+    :param errors: count of the failures of an operation per exception type.
+    """
+    errors = errors or {}
+    latencies = sorted(seconds for seconds, _, _ in samples)
+    rows = sum(r for _, r, _ in samples)
+    nbytes = sum(b for _, _, b in samples)
+    return {
+        "count": len(samples),
+        "errors": sum(errors.values()),
+        "error_types": dict(errors),
+        "rows": rows,
+        "bytes": nbytes,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "mb_per_sec": nbytes / 1e6 / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+# columns of the report, a name then the stats of `summarize`
+HEADER_FORMAT = "{:<24} {:>8} {:>7} {:>12} {:>9} {:>10} {:>10} {:>10}"
+ROW_FORMAT = "{:<24} {:>8d} {:>7d} {:>12.0f} {:>9.2f} {:>10.2f} {:>10.2f} {:>10.2f}"
+
+
+def format_report(report):
+    header = HEADER_FORMAT.format(
+        "",
+        "count",
+        "errors",
+        "rows/s",
+        "MB/s",
+        "p50 ms",
+        "p95 ms",
+        "p99 ms",
+    )
+    lines = [
+        f"{report['workers']} workers, {report['elapsed']:.2f}s",
+        "",
+        header,
+    ]
+    for section in ("operations", "phases"):
+        for name, stats in report[section].items():
+            lines.append(
+                ROW_FORMAT.format(
+                    name,
+                    stats["count"],
+                    stats["errors"],
+                    stats["rows_per_sec"],
+                    stats["mb_per_sec"],
+                    stats["p50_ms"],
+                    stats["p95_ms"],
+                    stats["p99_ms"],
+                )
+            )
+        lines.append("")
+    for name, stats in report["operations"].items():
+        for error_type, count in sorted(stats["error_types"].items()):
+            lines.append(f"{name} failed with {error_type}: {count}")
+    return "\n".join(lines)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog="databend-py-bench",
+        description="Measures the throughput and latency of the databend-py client.",
+    )
+    parser.add_argument(
+        "dsn", help="Client.from_url DSN, e.g. http://root:@localhost:8000/default"
+    )
+    parser.add_argument(
+        "--mix",
+        default="execute=1",
+        help="weighted operations among {}, e.g. execute=4,insert=1".format(
+            ", ".join(OPERATIONS)
+        ),
+    )
+    parser.add_argument("--threads", type=int, default=1, help="workers per process")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="processes running --threads workers each, "
+        "to load the client beyond one GIL",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="seconds the workers run"
+    )
+    parser.add_argument(
+        "--iterations", type=int, help="operations per worker, instead of --duration"
+    )
+    parser.add_argument(
+        "--query",
+        default="SELECT * FROM numbers(100000)",
+        help="query of execute and execute_iter",
+    )
+    parser.add_argument(
+        "--table", default="databend_py_bench", help="table of insert, [database.]table"
+    )
+    parser.add_argument(
+        "--create-table",
+        action="store_true",
+        help="create the insert table if it does not exist",
+    )
+    parser.add_argument("--stage", default="@~", help="stage of upload_to_stage")
+    parser.add_argument(
+        "--batch-rows", type=int, default=10000, help="rows of each insert and upload"
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    options = parser.parse_args(argv)
+    try:
+        parse_mix(options.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    return bench(options)
+
+
+def bench(options):
+    if options.create_table:
+        with Client.from_url(options.dsn) as client:
+            client.execute(
+                f"CREATE TABLE IF NOT EXISTS {options.table} ({TABLE_COLUMNS})"
+            )
+    report = run(options)
+    if options.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    return 1 if any(s["errors"] for s in report["operations"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
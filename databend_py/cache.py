@@ -0,0 +1,137 @@
+import collections
+import re
+import sys
+import threading
+import time
+
+from . import defines
+from .result import LazyRow
+
+# quoted literals and identifiers, kept as is by `normalize_sql`
+_QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+_WHITESPACES = re.compile(r"\s+")
+_LEADING_COMMENTS = re.compile(r"^(\s*(--[^\n]*\n|/\*.*?\*/)?)*\s*\(*", re.DOTALL)
+
+# statements only reading data, the others are never cached
+READ_ONLY_STATEMENTS = frozenset(["SELECT", "WITH", "SHOW", "DESC", "DESCRIBE"])
+
+
+def normalize_sql(sql):
+    """
+    Collapses the whitespaces out of the quoted literals, so that the same
+    query formatted differently hits the same cache entry.
+    """
+    parts = _QUOTED.split(sql.strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACES.sub(" ", parts[i])
+    return "".join(parts)
+
+
+def is_read_only(sql):
+    statement = _LEADING_COMMENTS.sub("", sql, count=1).split(None, 1)
+    return bool(statement) and statement[0].upper() in READ_ONLY_STATEMENTS
+
+
+def result_cache_key(query, connection):
+    """
+    :return: the cache key of the query on the connection, None if the
+             query must not be cached: not read-only or in a transaction.
+    """
+    if not is_read_only(query):
+        return None
+    session = connection.client_session or {}
+    if session.get("txn_state") not in (None, "AutoCommit"):
+        return None
+    return normalize_sql(query), session.get("database", connection.database)
+
+
+def estimate_size(columns, rows):
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    for row in rows:
+        if isinstance(row, LazyRow):
+            # sized by their raw cells, not converted for the estimate
+            row = row.raw
+        size += sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row)
+    return size
+
+
+class ResultCache:
+    """
+    LRU cache of query results, bounded by the estimated size of the rows
+    in bytes. Entries expire `ttl` seconds after the query ran.
+    Thread-safe, the clients of a `ClientPool.from_url` pool share one.
+
+    :param ttl: seconds the results are served from the cache.
+    :param max_bytes: estimated size budget of all the cached results.
+    """
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        :return: the cache configured by the settings, None if disabled.
+        """
+        ttl = float(settings.get("result_cache_ttl", 0))
+        if ttl <= 0:
+            return None
+        max_bytes = int(
+            settings.get("result_cache_max_bytes", defines.DEFAULT_RESULT_CACHE_MAX_BYTES)
+        )
+        return cls(ttl, max_bytes)
+
+    def get(self, key):
+        """
+        :return: the cached `(columns, rows)`, None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, columns, rows):
+        size = estimate_size(columns, rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, (columns, rows))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,79 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+class JsonCodec:
+    """
+    JSON codec of the request and response bodies, the stdlib one.
+    `loads` takes the raw body bytes, `dumps` returns bytes.
+    """
+
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj)
+
+
+class UjsonCodec(JsonCodec):
+    name = "ujson"
+
+    @staticmethod
+    def loads(data):
+        return ujson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# by order of preference when the codec is not specified
+CODECS = {}
+if orjson is not None:
+    CODECS[OrjsonCodec.name] = OrjsonCodec
+if ujson is not None:
+    CODECS[UjsonCodec.name] = UjsonCodec
+CODECS[JsonCodec.name] = JsonCodec
+
+
+def get_codec(codec=None):
+    """
+    :param codec: a `JsonCodec`, a codec name or None for the fastest
+                  installed one: orjson, ujson then json.
+    """
+    if codec is None:
+        return next(iter(CODECS.values()))()
+    if isinstance(codec, JsonCodec):
+        return codec
+    try:
+        return CODECS[codec.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown or not installed json codec: {codec}")
+
+
+default_codec = get_codec()
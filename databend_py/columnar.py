@@ -0,0 +1,235 @@
+from .datetypes import DatabendDataType
+from .defines import TRUE_VALUES
+from .result import get_converter_plan, null_safe
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:  # pragma: no cover
+    pd = None
+
+# inner column types converted in one vectorized pass, see `column_to_array`
+NUMPY_DTYPES = {
+    "int8": "int8",
+    "int16": "int16",
+    "int32": "int32",
+    "int64": "int64",
+    "uint8": "uint8",
+    "uint16": "uint16",
+    "uint32": "uint32",
+    "uint64": "uint64",
+    "float32": "float32",
+    "float64": "float64",
+    "float": "float32",
+    "double": "float64",
+    "boolean": "bool",
+    "bool": "bool",
+}
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError(
+            "numpy is required for columnar results: pip install databend-py[numpy]"
+        )
+
+
+def require_pandas():
+    if pd is None:
+        raise ImportError(
+            "pandas is required for DataFrame results: pip install databend-py[pandas]"
+        )
+
+
+def arrow_column_to_array(column):
+    """
+    Converts a column of arrow pages into a NumPy array, without copies for
+    single chunk numeric columns that hold no NULL.
+    :param column: `pyarrow.ChunkedArray`.
+    :return: `(array, mask)`, as `column_to_array`.
+    """
+    require_numpy()
+    import pyarrow as pa
+
+    mask = None
+    if column.null_count:
+        mask = column.is_null().to_numpy()
+        if pa.types.is_boolean(column.type):
+            column = column.fill_null(False)
+        elif pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            column = column.fill_null(0)
+    return column.to_numpy(), mask
+
+
+def parse_numbers(values, dtype):
+    """
+    Parses decimal strings into an array of `dtype` in a single C pass.
+    Integers are parsed as 64 bits then checked against the range of
+    `dtype`, so that out of range values raise rather than wrap.
+    :raise ValueError: if some string is not a number.
+    :raise OverflowError: if some integer does not fit `dtype`.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind not in "iu":
+        return np.array(values, dtype=dtype)
+    array = np.array(values, dtype=np.uint64 if dtype == np.uint64 else np.int64)
+    if dtype.itemsize < 8 and len(array):
+        info = np.iinfo(dtype)
+        if array.min() < info.min or array.max() > info.max:
+            raise OverflowError(f"value out of range of {dtype}")
+    # empty columns are cast too, to keep the dtype of their type
+    return array.astype(dtype, copy=False)
+
+
+def column_to_array(values, column_type, convert=None):
+    """
+    Converts the raw cells of a column into a NumPy array.
+    Numeric and bool columns are parsed in a single vectorized pass, other
+    columns go through `convert` cell by cell.
+    :param values: sequence of raw cells as sent by the server.
+    :param column_type: inner column type, e.g. `UInt64`.
+    :param convert: converter of the column in the `ConverterPlan` of the
+                    result, NULL cells converted to None. Defaults to the
+                    `DatabendDataType.type_convert_fn` of `column_type`.
+    :return: `(array, mask)`, mask is a bool array flagging NULL cells or
+             None if the column has no NULL.
+    """
+    require_numpy()
+    dtype = NUMPY_DTYPES.get(column_type.lower())
+    if dtype is None:
+        if convert is None:
+            convert = null_safe(DatabendDataType.type_convert_fn(column_type), True)
+        array = np.empty(len(values), dtype=object)
+        array[:] = [convert(d) for d in values]
+        mask = np.equal(array, None)
+        return array, (mask if mask.any() else None)
+
+    mask = None
+    if "NULL" in values:
+        mask = np.array([d == "NULL" for d in values])
+        values = ["0" if d == "NULL" else d for d in values]
+    if dtype == "bool":
+        array = np.isin(np.asarray(values, dtype=str), TRUE_VALUES)
+        return array, mask
+    try:
+        array = parse_numbers(values, dtype)
+    except OverflowError:
+        # out of range values, kept as the Python ints of the row path
+        array = np.empty(len(values), dtype=object)
+        array[:] = [int(d) for d in values]
+    return array, mask
+
+
+class ColumnarResult:
+    """
+    Accumulates the pages of a query result into per-column buffers and
+    converts them into arrays once all pages are received.
+    """
+
+    def __init__(
+        self,
+        data_generator,
+        first_data,
+        with_column_types=False,
+        native_types=False,
+        timezone=None,
+        decode_variant=False,
+    ):
+        self.data_generator = data_generator
+        self.with_column_types = with_column_types
+        self.first_data = first_data
+        # the non-numeric columns are converted as by `QueryResult`
+        self.native_types = native_types
+        self.timezone = timezone
+        self.decode_variant = decode_variant
+        self.plan = None
+        self.buffers = []
+        self.arrow_tables = []
+
+        super().__init__()
+
+    def store_columns(self, raw_data: dict):
+        self.plan = get_converter_plan(
+            raw_data.get("schema"),
+            True,
+            native_types=self.native_types,
+            timezone=self.timezone,
+            decode_variant=self.decode_variant,
+        )
+        self.buffers = [[] for _ in self.plan.column_names]
+
+    def store_data(self, raw_data: dict):
+        if raw_data.get("arrow") is not None:
+            self.arrow_tables.append(raw_data["arrow"])
+            return
+        datas = raw_data.get("data")
+        if not datas:
+            return
+        for buffer, column in zip(self.buffers, zip(*datas)):
+            buffer.extend(column)
+
+    def receive(self):
+        self.store_columns(self.first_data)
+        raw_data, self.first_data = self.first_data, None
+        self.store_data(raw_data)
+        del raw_data
+        for d in self.data_generator:
+            self.store_data(d)
+
+    def get_arrays(self):
+        """
+        :return: dict of column name to `(array, mask)`.
+        """
+        self.receive()
+        arrays = {}
+        if self.arrow_tables:
+            import pyarrow as pa
+
+            table = pa.concat_tables(self.arrow_tables)
+            self.arrow_tables = []
+            for name, column in zip(table.column_names, table.columns):
+                arrays[name] = arrow_column_to_array(column)
+            return arrays
+        for (name, column_type), convert, buffer in zip(
+            self.plan.columns_with_types, self.plan.converters, self.buffers
+        ):
+            arrays[name] = column_to_array(buffer, column_type, convert)
+        self.buffers = []
+        return arrays
+
+    def get_result(self):
+        """
+        :return: dict of column name to NumPy array, columns holding NULL
+                 are returned as `numpy.ma.MaskedArray`.
+        """
+        columns = {}
+        for name, (array, mask) in self.get_arrays().items():
+            columns[name] = array if mask is None else np.ma.MaskedArray(array, mask)
+        if self.with_column_types:
+            return list(self.plan.columns_with_types), columns
+        else:
+            return [], columns
+
+    def get_dataframe(self):
+        """
+        :return: pandas DataFrame, columns holding NULL use the pandas
+                 nullable extension arrays.
+        """
+        require_pandas()
+        columns = {}
+        for name, (array, mask) in self.get_arrays().items():
+            if mask is None:
+                columns[name] = array
+            elif array.dtype.kind in "iu":
+                columns[name] = pd.arrays.IntegerArray(array, mask)
+            elif array.dtype.kind == "f":
+                columns[name] = pd.arrays.FloatingArray(array, mask)
+            elif array.dtype.kind == "b":
+                columns[name] = pd.arrays.BooleanArray(array, mask)
+            else:
+                columns[name] = array
+        return pd.DataFrame(columns, columns=list(self.plan.column_names))
@@ -1,4 +1,3 @@
-import json
 import os
 import base64
 import time
@@ -13,17 +12,24 @@ import requests
 from . import log
 from . import defines
 from .context import Context
+from .codec import get_codec
+from .page_format import get_page_format
+from .pagination import Pagination, PollBackoff
+from .tracing import NOOP_SPAN, NOOP_TRACER
 from databend_py.errors import (
+    HTTPStatusException,
     WarehouseTimeoutException,
     UnexpectedException,
     ServerException,
 )
-from databend_py.retry import retry
+from databend_py.retry import RetryPolicy
 from databend_py.sdk_info import sdk_info
 
 XDatabendQueryIDHeader = "X-DATABEND-QUERY-ID"
 XDatabendTenantHeader = "X-DATABEND-TENANT"
 XDatabendWarehouseHeader = "X-DATABEND-WAREHOUSE"
+XDatabendSQLHeader = "X-DATABEND-SQL"
+StreamingLoadPath = "/v1/streaming_load"
 QueryID = "id"
 
 
@@ -69,6 +75,13 @@ class ServerInfo(object):
         return "<ServerInfo(%s)>" % (params)
 
 
+def get_retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
 def get_error(response):
     if response["error"] is None:
         return None
@@ -114,6 +127,8 @@ class Connection(object):
         copy_purge=False,
         session_settings=None,
         persist_cookies=False,
+        page_format=None,
+        json_codec=None,
     ):
         self.host = host
         self.port = port
@@ -141,10 +156,18 @@ class Connection(object):
             self.schema = "https"
         e = environs.Env()
         if os.getenv("ADDITIONAL_HEADERS") is not None:
-            print(os.getenv("ADDITIONAL_HEADERS"))
             self.additional_headers = e.dict("ADDITIONAL_HEADERS")
+            # the values may hold credentials
+            log.logger.debug(
+                f"additional headers: {sorted(self.additional_headers)}"
+            )
         self.persist_cookies = persist_cookies
         self.cookies = None
+        self.codec = get_codec(json_codec)
+        self.page_format = get_page_format(page_format, self.codec)
+        self.pagination = Pagination()
+        self.retry_policy = RetryPolicy()
+        self.tracer = NOOP_TRACER
 
     def default_session(self):
         return {"database": self.database}
@@ -153,10 +176,10 @@ class Connection(object):
         headers = {
             "Content-Type": "application/json",
             "User-Agent": sdk_info(),
-            "Accept": "application/json",
             "X-DATABEND-ROUTE": "warehouse",
             XDatabendTenantHeader: self.tenant,
             XDatabendWarehouseHeader: self.warehouse,
+            **self.page_format.request_headers(),
         }
         if "Authorization" not in self.additional_headers:
             return {
@@ -170,41 +193,62 @@ class Connection(object):
         else:
             return {**headers, **self.additional_headers}
 
+    def make_query_headers(self, query_id=None):
+        """
+        Headers of a request on the query `query_id`, rather than the last
+        query sent by this connection.
+        """
+        headers = self.make_headers()
+        if query_id is not None:
+            headers[XDatabendQueryIDHeader] = query_id
+        # requests drops the unset headers, aiohttp rejects them
+        return {k: v for k, v in headers.items() if v is not None}
+
     def get_description(self):
         return "{}:{}".format(self.host, self.port)
 
     def disconnect(self):
         self.client_session = dict()
 
-    @retry(times=10, exceptions=WarehouseTimeoutException)
     def do_query(self, url, query_sql):
+        with self.tracer.span("query.submit") as span:
+            # the query is not idempotent, it is only retried when not processed
+            return self.retry_policy.call(self._do_query, url, query_sql, span)
+
+    def _do_query(self, url, query_sql, span=NOOP_SPAN):
         response = self.requests_session.post(
             url,
-            data=json.dumps(query_sql),
+            data=self.codec.dumps(query_sql),
             headers=self.make_headers(),
             auth=HTTPBasicAuth(self.user, self.password),
             timeout=(self.connect_timeout, self.read_timeout),
             verify=True,
         )
+        span.set_attribute("bytes", len(response.content))
+        return self.parse_query_response(response)
+
+    def parse_query_response(self, response):
         if response.status_code != 200:
             try:
-                resp_dict = json.loads(response.content)
+                resp_dict = self.codec.loads(response.content)
                 if (
                     resp_dict
                     and resp_dict.get("error")
                     and "no endpoint" in resp_dict.get("error")
                 ):
-                    raise WarehouseTimeoutException
+                    raise WarehouseTimeoutException(resp_dict.get("error"))
             except ValueError:
                 pass
-            raise UnexpectedException(
+            raise HTTPStatusException(
                 "Unexpected status code %d when post query, content: %s, headers: %s"
-                % (response.status_code, response.content, response.headers)
+                % (response.status_code, response.content, response.headers),
+                response.status_code,
+                get_retry_after(response),
             )
 
         if response.content:
             try:
-                resp_dict = json.loads(response.content)
+                resp_dict = self.page_format.decode(response)
             except ValueError:
                 raise UnexpectedException(
                     "failed to parse response: %s" % response.content
@@ -214,7 +258,7 @@ class Connection(object):
                 and resp_dict.get("error")
                 and "no endpoint" in resp_dict.get("error")
             ):
-                raise WarehouseTimeoutException
+                raise WarehouseTimeoutException(resp_dict.get("error"))
             if resp_dict and resp_dict.get("error"):
                 raise UnexpectedException("failed to query: %s" % response.content)
             if self.persist_cookies:
@@ -223,10 +267,48 @@ class Connection(object):
         else:
             raise UnexpectedException("response content is empty: %s" % response)
 
-    def query(self, statement):
-        url = self.format_url()
-        log.logger.debug(f"http sql: {statement}")
-        query_sql = {"sql": statement, "string_fields": True}
+    def streaming_load(self, sql, body, content_type):
+        """
+        Sends `body` to the streaming load endpoint in a single request, the
+        `sql` in header reads it from `@_databend_load`.
+        :param body: bytes or iterator of bytes, sent chunked.
+        :return: the response, its `stats` counting the rows and bytes loaded.
+        """
+        url = self.format_endpoint_url(StreamingLoadPath)
+        headers = self.make_query_headers(str(uuid.uuid4()))
+        headers[XDatabendSQLHeader] = sql
+        headers["Content-Type"] = content_type
+        log.logger.debug(f"streaming load sql: {sql}")
+        response = self.requests_session.put(
+            url,
+            data=body,
+            headers=headers,
+            auth=HTTPBasicAuth(self.user, self.password),
+            timeout=(self.connect_timeout, self.read_timeout),
+            verify=True,
+        )
+        return self.parse_load_response(response)
+
+    def parse_load_response(self, response):
+        try:
+            resp_dict = self.codec.loads(response.content) if response.content else {}
+        except ValueError:
+            resp_dict = {}
+        error = resp_dict.get("error") if isinstance(resp_dict, dict) else None
+        if isinstance(error, dict):
+            raise ServerException(error.get("message"), error.get("code"))
+        if response.status_code != 200:
+            raise UnexpectedException(
+                f"Unexpected status code {response.status_code} when streaming load, "
+                f"content: {response.content}"
+            )
+        return resp_dict
+
+    def make_query_sql(self, statement, settings=None):
+        query_sql = {"sql": statement, **self.page_format.request_options()}
+        pagination = self.pagination.request_options(settings)
+        if pagination is not None:
+            query_sql["pagination"] = pagination
         if self.client_session is not None and len(self.client_session) != 0:
             if "database" not in self.client_session:
                 self.client_session = self.default_session()
@@ -234,24 +316,38 @@ class Connection(object):
         else:
             self.client_session = self.default_session()
             query_sql["session"] = self.client_session
+        return query_sql
+
+    def update_session(self, resp_dict):
+        new_session_state = resp_dict.get("session", self.default_session())
+        if new_session_state:
+            self.client_session = new_session_state
+        if self.additional_headers:
+            self.additional_headers.update(
+                {XDatabendQueryIDHeader: resp_dict.get(QueryID)}
+            )
+        else:
+            self.additional_headers = {XDatabendQueryIDHeader: resp_dict.get(QueryID)}
+
+    def query(self, statement, settings=None):
+        """
+        :param settings: the settings of the query, overriding the pagination
+                         options of the connection.
+        """
+        url = self.format_url()
+        log.logger.debug(f"http sql: {statement}")
+        query_sql = self.make_query_sql(statement, settings)
         # if XDatabendQueryIDHeader in self.additional_headers:
         #     del self.additional_headers[XDatabendQueryIDHeader]
-        self.additional_headers.update({XDatabendQueryIDHeader: str(uuid.uuid4())})
-        log.logger.debug(f"http headers {self.make_headers()}")
+        query_id = str(uuid.uuid4())
+        self.additional_headers.update({XDatabendQueryIDHeader: query_id})
         try:
-            resp_dict = self.do_query(url, query_sql)
-            new_session_state = resp_dict.get("session", self.default_session())
-            if new_session_state:
-                self.client_session = new_session_state
-            if self.additional_headers:
-                self.additional_headers.update(
-                    {XDatabendQueryIDHeader: resp_dict.get(QueryID)}
-                )
-            else:
-                self.additional_headers = {
-                    XDatabendQueryIDHeader: resp_dict.get(QueryID)
-                }
-            return self.wait_until_has_schema(resp_dict)
+            with self.tracer.span("query", sql=statement, query_id=query_id) as span:
+                resp_dict = self.do_query(url, query_sql)
+                self.update_session(resp_dict)
+                resp_dict = self.wait_until_has_schema(resp_dict)
+                span.set_attribute("rows", len(resp_dict.get("data") or ()))
+                return resp_dict
         except Exception as err:
             log.logger.error(
                 f"http error on {url}, SQL: {statement} error msg:{str(err)}"
@@ -259,43 +355,77 @@ class Connection(object):
             raise
 
     def format_url(self):
+        return self.format_endpoint_url("/v1/query/")
+
+    def format_endpoint_url(self, path):
         if self.schema == "https" and self.port is None:
             self.port = 443
         elif self.schema == "http" and self.port is None:
             self.port = 80
-        return f"{self.schema}://{self.host}:{self.port}/v1/query/"
+        return f"{self.schema}://{self.host}:{self.port}{path}"
 
     def reset_session(self):
         self.client_session = dict()
 
     def wait_until_has_schema(self, raw_data_dict):
+        backoff = PollBackoff()
         resp_schema = raw_data_dict.get("schema")
         while resp_schema is not None and len(resp_schema) == 0:
             if raw_data_dict["next_uri"] is None:
                 break
+            start_time = time.monotonic()
             resp = self.next_page(raw_data_dict["next_uri"])
 
-            resp_dict = json.loads(resp.content)
+            resp_dict = self.decode_page(resp)
             raw_data_dict = resp_dict
             resp_schema = raw_data_dict.get("schema")
             if resp_schema is not None and (
                 len(resp_schema) != 0 or len(raw_data_dict.get("data")) != 0
             ):
                 break
+            time.sleep(backoff.observe(raw_data_dict, time.monotonic() - start_time))
         return raw_data_dict
 
-    def next_page(self, next_uri):
-        url = "{}://{}:{}{}".format(self.schema, self.host, self.port, next_uri)
+    def format_page_url(self, next_uri):
+        return f"{self.schema}://{self.host}:{self.port}{next_uri}"
 
+    def next_page(self, next_uri, query_id=None):
+        url = self.format_page_url(next_uri)
+        with self.tracer.span("page.fetch", query_id=query_id) as span:
+            # a page is served again until the next one is requested
+            response = self.retry_policy.call(
+                self._get_page, url, query_id, idempotent=True
+            )
+            span.set_attribute("bytes", len(response.content))
+        return response
+
+    def decode_page(self, response):
+        """
+        :return: the page dict of the response, see `PageFormat.decode`.
+        """
+        with self.tracer.span("page.decode", bytes=len(response.content)) as span:
+            page = self.page_format.decode(response)
+            span.set_attribute("rows", len(page.get("data") or ()))
+        return page
+
+    def _get_page(self, url, query_id=None):
         response = self.requests_session.get(
-            url=url, headers=self.make_headers(), cookies=self.cookies
+            url=url,
+            headers=self.make_query_headers(query_id),
+            cookies=self.cookies,
+            timeout=(self.connect_timeout, self.read_timeout),
         )
+        self.check_page_response(url, response)
+        return response
+
+    def check_page_response(self, url, response):
         if response.status_code != 200:
-            raise UnexpectedException(
+            raise HTTPStatusException(
                 "Unexpected status code %d when get %s, content: %s"
-                % (response.status_code, url, response.content)
+                % (response.status_code, url, response.content),
+                response.status_code,
+                get_retry_after(response),
             )
-        return response
 
     # return a list of response util empty next_uri
     def query_with_session(self, statement):
@@ -308,11 +438,14 @@ class Connection(object):
         session = response.get("session")
         if session:
             self.client_session = session
+        backoff = PollBackoff()
         while response["next_uri"] is not None:
+            poll_time = time.monotonic()
             resp = self.next_page(response["next_uri"])
-            response = json.loads(resp.content)
+            response = self.decode_page(resp)
             log.logger.debug(f"Sql in progress, fetch next_uri content: {response}")
             self.check_error(response)
+            time.sleep(backoff.observe(response, time.monotonic() - poll_time))
             session = response.get("session")
             if session:
                 self.client_session = session
@@ -1,4 +1,11 @@
-import ast
+import functools
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytz
+
+from .nested import parse_json, parse_value
 
 INTType = "int"
 FLOATTYPE = "float"
@@ -7,6 +14,7 @@ BOOLEANTYPE = "bool"
 ARRAYTYPE = "array"
 MAPTYPE = "map"
 JSONTYPE = "json"
+VARIANTTYPE = "variant"
 NULLTYPE = "null"
 
 
@@ -15,7 +23,11 @@ class DatabendDataType:
         pass
 
     @staticmethod
-    def type_convert_fn(type_str: str):
+    def type_convert_fn(type_str: str, decode_variant=False):
+        """
+        :param decode_variant: if the Variant cells are decoded as JSON rather
+                               than returned as their JSON text.
+        """
         if INTType in type_str.lower():
             return int
         elif FLOATTYPE in type_str.lower():
@@ -25,15 +37,95 @@ class DatabendDataType:
         elif BOOLEANTYPE in type_str.lower():
             return str_to_bool
         elif MAPTYPE in type_str.lower():
-            return ast.literal_eval
+            return parse_value
         elif ARRAYTYPE in type_str.lower():
-            return ast.literal_eval
+            return parse_value
         elif JSONTYPE in type_str.lower():
-            return ast.literal_eval
+            return parse_json
+        elif VARIANTTYPE in type_str.lower():
+            return parse_json if decode_variant else str
         else:
             return str
 
 
+# types decoded into Python objects by `native_convert_fn`
+TIMESTAMP_TYPES = ("timestamp", "datetime", "datetime64")
+DATE_TYPES = ("date", "date32")
+
+
+@functools.lru_cache(maxsize=64)
+def get_timezone(name):
+    return pytz.timezone(name)
+
+
+def parse_timestamp(s):
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        # before Python 3.11, only 3 or 6 digits fractions are parsed
+        if "." not in s:
+            raise
+        head, fraction = s.split(".", 1)
+        return datetime.fromisoformat("{}.{}".format(head, fraction[:6].ljust(6, "0")))
+
+
+def timestamp_convert_fn(tz_name=None):
+    """
+    :param tz_name: the timezone of the session, the timestamps are naive
+                    datetimes if not known.
+    """
+    if not tz_name:
+        return parse_timestamp
+    tz = get_timezone(tz_name)
+    if tz is pytz.utc:
+        utc = pytz.utc
+
+        def convert(s):
+            dt = parse_timestamp(s)
+            if dt.tzinfo is None:
+                return dt.replace(tzinfo=utc)
+            return dt.astimezone(utc)
+
+        return convert
+
+    def convert(s):
+        dt = parse_timestamp(s)
+        if dt.tzinfo is None:
+            return tz.localize(dt)
+        return dt.astimezone(tz)
+
+    return convert
+
+
+def native_convert_fn(type_str, tz_name=None):
+    """
+    :return: the converter of the Timestamp, Date, Decimal and UUID cells into
+             `datetime`, `date`, `Decimal` and `UUID`, None for the other types.
+    """
+    type_str = type_str.lower()
+    if type_str in TIMESTAMP_TYPES:
+        return timestamp_convert_fn(tz_name)
+    elif type_str in DATE_TYPES:
+        return date.fromisoformat
+    elif type_str == "decimal":
+        return Decimal
+    elif type_str == "uuid":
+        return UUID
+    return None
+
+
+def session_timezone(connection):
+    """
+    :return: the timezone name of the server info of the connection context,
+             or else the one of its session settings, None if not known.
+    """
+    server_info = connection.context.server_info
+    if server_info is not None and server_info.timezone:
+        return server_info.timezone
+    settings = (connection.client_session or {}).get("settings") or {}
+    return settings.get("timezone")
+
+
 def str_to_bool(s):
     if isinstance(s, str) and s.isdigit():
         return bool(int(s))
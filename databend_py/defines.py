@@ -4,6 +4,17 @@ DEFAULT_PASSWORD = ""
 DEFAULT_SESSION_IDLE_TIME = 30
 DEFAULT_CONNECT_TIMEOUT = 180
 DEFAULT_READ_TIMEOUT = 180
+DEFAULT_UPLOAD_CHUNK_ROWS = 10000
+DEFAULT_UPLOAD_PART_ROWS = 1000000
+DEFAULT_UPLOAD_ROW_GROUP_ROWS = 100000
+DEFAULT_MAX_ROWS_PER_PAGE = 10000
+DEFAULT_ADAPTIVE_MAX_ROWS_PER_PAGE = 200000
+DEFAULT_POLL_INTERVAL = 0.05
+DEFAULT_MAX_POLL_INTERVAL = 1.0
+DEFAULT_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Boolean cells parsed as True by value, see `numpy_decode`
+TRUE_VALUES = ("1", "true", "True", "TRUE")
 
 DBMS_NAME = "Databend"
 CLIENT_NAME = "databend-py"
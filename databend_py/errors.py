@@ -38,3 +38,25 @@ class UnexpectedException(Error):
     def __str__(self):
         message = " " + self.message if self.message is not None else ""
         return "Unexpected: {}".format(message)
+
+
+class HTTPStatusException(UnexpectedException):
+    def __init__(self, message, status_code, retry_after=None):
+        self.status_code = status_code
+        # seconds from the Retry-After header of 429/503 responses
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class PoolTimeoutException(Error):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self):
+        return f"Pool timeout: {self.message}"
+
+
+# errors of a failed query: raised by the server, by the transport (requests
+# errors are OSErrors) or while decoding a malformed response
+QUERY_ERRORS = (Error, OSError, ValueError)
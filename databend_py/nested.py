@@ -0,0 +1,299 @@
+"""
+Decoders of the text encoding of the nested values, e.g.
+`[1,NULL]`, `['a','b\\'c']`, `{'k':[1.5]}` or `(1,'x')`, compiled once per
+column type instead of evaluating each cell with `ast.literal_eval`.
+"""
+import functools
+import json
+import re
+
+from .defines import TRUE_VALUES
+
+# quoted strings, punctuation, and bare tokens (numbers, NULL, true...)
+_TOKENS = re.compile(
+    r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[\[\]{}(),:]|[^\[\]{}(),:'"\s]+""",
+    re.DOTALL,
+)
+_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+_UNESCAPES = {
+    "b": "\b",
+    "f": "\f",
+    "r": "\r",
+    "n": "\n",
+    "t": "\t",
+    "0": "\0",
+    "a": "\a",
+    "v": "\v",
+}
+_STRING_ITEMS = re.compile(r"""'((?:[^'\\]|\\.)*)'|(NULL)""", re.DOTALL)
+_INT = re.compile(r"[+-]?\d+$")
+
+NESTED_TYPES = ("array", "map", "tuple")
+
+
+def _unescape(match):
+    c = match.group(1)
+    return _UNESCAPES.get(c, c)
+
+
+def unquote(token):
+    body = token[1:-1]
+    if "\\" in body:
+        body = _ESCAPE.sub(_unescape, body)
+    return body
+
+
+def _split_args(args):
+    """
+    Splits the arguments of a type on the top level commas.
+    """
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(args):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(args[start:i].strip())
+            start = i + 1
+    parts.append(args[start:].strip())
+    return parts
+
+
+def _strip_field_name(arg):
+    # `Tuple(a Int32, b String)` names its fields
+    parts = arg.split(None, 1)
+    if len(parts) == 2 and "(" not in parts[0]:
+        return parts[1]
+    return arg
+
+
+@functools.lru_cache(maxsize=256)
+def parse_type(schema_type):
+    """
+    :return: `(name, args)`, args are the parsed types of the Nullable and
+             nested types, empty for the others, e.g. `Decimal(10, 2)`.
+    """
+    name, paren, rest = schema_type.strip().partition("(")
+    name = name.strip()
+    if not paren or name.lower() not in NESTED_TYPES + ("nullable",):
+        return name, ()
+    args = _split_args(rest[: rest.rindex(")")])
+    return name, tuple(parse_type(_strip_field_name(arg)) for arg in args)
+
+
+def strip_nullable(parsed_type):
+    name, args = parsed_type
+    if name.lower() == "nullable":
+        return args[0]
+    return parsed_type
+
+
+def _scalar(token):
+    # values of unknown types, as `ast.literal_eval` would read them
+    if token[0] in "'\"":
+        return unquote(token)
+    if token == "NULL" or token == "null":
+        return None
+    if token in ("true", "false"):
+        return token == "true"
+    if _INT.match(token):
+        return int(token)
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def _scalar_reader(convert):
+    def read(tokens, i):
+        token = tokens[i]
+        if token == "NULL":
+            return None, i + 1
+        if token[0] in "'\"":
+            token = unquote(token)
+        return convert(token), i + 1
+
+    return read
+
+
+def _items_reader(read_item, close, make):
+    # `[a,b]`, `(a,b)`: items separated by commas up to `close`
+    def read(tokens, i):
+        if tokens[i] == "NULL":
+            return None, i + 1
+        items = []
+        i += 1
+        if tokens[i] == close:
+            return make(items), i + 1
+        while True:
+            item, i = read_item(tokens, i, len(items))
+            items.append(item)
+            token = tokens[i]
+            i += 1
+            if token == close:
+                return make(items), i
+            if token != ",":
+                raise ValueError(f"unexpected {token!r} in nested value")
+
+    return read
+
+
+def _map_reader(read_key, read_value):
+    def read(tokens, i):
+        if tokens[i] == "NULL":
+            return None, i + 1
+        items = {}
+        i += 1
+        if tokens[i] == "}":
+            return items, i + 1
+        while True:
+            key, i = read_key(tokens, i)
+            if tokens[i] != ":":
+                raise ValueError(f"unexpected {tokens[i]!r} in map value")
+            value, i = read_value(tokens, i + 1)
+            items[key] = value
+            token = tokens[i]
+            i += 1
+            if token == "}":
+                return items, i
+            if token != ",":
+                raise ValueError(f"unexpected {token!r} in map value")
+
+    return read
+
+
+def _any_reader(tokens, i):
+    token = tokens[i]
+    if token == "[":
+        return _ANY_ARRAY(tokens, i)
+    if token == "{":
+        return _ANY_MAP(tokens, i)
+    if token == "(":
+        return _ANY_TUPLE(tokens, i)
+    return _scalar(token), i + 1
+
+
+def _variant_reader(tokens, i):
+    # items are the quoted JSON text of the values, or the values themselves
+    token = tokens[i]
+    if token[0] == "'":
+        text = unquote(token)
+        try:
+            return json.loads(text), i + 1
+        except ValueError:
+            return text, i + 1
+    return _any_reader(tokens, i)
+
+
+_ANY_ARRAY = _items_reader(lambda tokens, i, _: _any_reader(tokens, i), "]", list)
+_ANY_TUPLE = _items_reader(lambda tokens, i, _: _any_reader(tokens, i), ")", tuple)
+_ANY_MAP = _map_reader(_any_reader, _any_reader)
+
+
+def _make_reader(parsed_type, decode_variant=False):
+    from .datetypes import DatabendDataType
+
+    name, args = strip_nullable(parsed_type)
+    kind = name.lower()
+    if kind == "array":
+        read_item = _make_reader(args[0], decode_variant)
+        return _items_reader(lambda tokens, i, _: read_item(tokens, i), "]", list)
+    if kind == "tuple":
+        readers = [_make_reader(arg, decode_variant) for arg in args]
+
+        def read_field(tokens, i, n):
+            reader = readers[n] if n < len(readers) else _any_reader
+            return reader(tokens, i)
+
+        return _items_reader(read_field, ")", tuple)
+    if kind == "map":
+        return _map_reader(
+            _make_reader(args[0], decode_variant), _make_reader(args[1], decode_variant)
+        )
+    if "bool" in kind:
+        return _scalar_reader(TRUE_VALUES.__contains__)
+    if kind in ("variant", "json"):
+        # otherwise the items are typed by their text
+        return _variant_reader if decode_variant else _any_reader
+    convert = DatabendDataType.type_convert_fn(name)
+    if convert in (int, float, str):
+        return _scalar_reader(convert)
+    return _any_reader
+
+
+def _numbers_decoder(convert):
+    # `[1,2,NULL]`: no quotes nor nesting, split rather than tokenized
+    def decode(text):
+        body = text[1:-1].strip()
+        if not body:
+            return []
+        if "NULL" not in body:
+            return list(map(convert, body.split(",")))
+        return [None if v.strip() == "NULL" else convert(v) for v in body.split(",")]
+
+    return decode
+
+
+@functools.lru_cache(maxsize=256)
+def compile_decoder(schema_type, decode_variant=False):
+    """
+    :param schema_type: the type of a column, e.g. `Array(Nullable(Int32))`.
+    :param decode_variant: if the Variant items are decoded as JSON.
+    :return: the function decoding a cell of the column, None if the type
+             is not a nested one.
+    """
+    parsed_type = strip_nullable(parse_type(schema_type))
+    name, args = parsed_type
+    if name.lower() not in NESTED_TYPES:
+        return None
+    if name.lower() == "array":
+        item_name, _ = strip_nullable(args[0])
+        if item_name.lower() in ("int8", "int16", "int32", "int64", "uint8", "uint16",
+                                 "uint32", "uint64"):
+            return _numbers_decoder(int)
+        if item_name.lower() in ("float32", "float64"):
+            return _numbers_decoder(float)
+        if item_name.lower() == "string":
+            return _strings_decoder
+    return _tokens_decoder(_make_reader(parsed_type, decode_variant))
+
+
+def _strings_decoder(text):
+    # `['a',NULL]`: the items are read by a single regex
+    if text == "NULL":
+        return None
+    if text[:1] != "[" or '"' in text:
+        return _decode_any(text)
+    return [
+        None if null else (_ESCAPE.sub(_unescape, body) if "\\" in body else body)
+        for body, null in _STRING_ITEMS.findall(text)
+    ]
+
+
+def _tokens_decoder(read):
+    def decode(text):
+        tokens = _TOKENS.findall(text)
+        value, i = read(tokens, 0)
+        if i != len(tokens):
+            raise ValueError(f"unexpected {tokens[i]!r} after nested value")
+        return value
+
+    return decode
+
+
+_decode_any = _tokens_decoder(_any_reader)
+
+
+def parse_value(text):
+    """
+    Decodes a nested value of unknown type, numbers, strings, NULL and
+    booleans are typed by their text.
+    """
+    return _decode_any(text)
+
+
+def parse_json(text):
+    return json.loads(text)
@@ -0,0 +1,151 @@
+import abc
+
+from databend_py.codec import default_codec
+from databend_py.errors import UnexpectedException
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover
+    pa = None
+
+JSON_CONTENT_TYPE = "application/json"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+# schema metadata of an arrow page holding the json response without `data`
+ARROW_RESPONSE_METADATA_KEY = b"databend.response"
+# field metadata holding the databend type of a column
+ARROW_TYPE_METADATA_KEY = b"databend.type"
+
+
+class PageFormat(abc.ABC):
+    """
+    Wire format of the query result pages: what the client asks for when it
+    posts a query or fetches a page, and how the response body is decoded.
+    `decode` returns the response as a dict in the shape of the json format:
+    `schema`, `data`, `next_uri`, `session`, `error`...
+    """
+
+    name = None
+
+    def __init__(self, codec=None):
+        self.codec = codec or default_codec
+
+    def request_headers(self):
+        return {}
+
+    def request_options(self):
+        return {}
+
+    @abc.abstractmethod
+    def decode(self, response):
+        """
+        :param response: the http response of a query or of a page.
+        :return: the response as a dict, in the shape of the json format.
+        """
+
+
+class JsonPageFormat(PageFormat):
+    """
+    The default format, every field is sent as a string and converted by
+    `QueryResult`.
+    """
+
+    name = "json"
+
+    def request_headers(self):
+        return {"Accept": JSON_CONTENT_TYPE}
+
+    def request_options(self):
+        return {"string_fields": True}
+
+    def decode(self, response):
+        return self.codec.loads(response.content)
+
+
+class ArrowPageFormat(JsonPageFormat):
+    """
+    Asks for the page data as an Arrow IPC stream, so columns come back typed
+    and can be handed to numpy without copies. The rest of the response is
+    carried as json in the schema metadata. The server may still answer with
+    json (errors, servers without arrow support), it is then decoded as such,
+    hence `string_fields` is still requested for the json pages.
+    """
+
+    name = "arrow"
+
+    def __init__(self, codec=None):
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required for the arrow page format: "
+                "pip install databend-py[arrow]"
+            )
+        super().__init__(codec)
+
+    def request_headers(self):
+        return {"Accept": f"{ARROW_CONTENT_TYPE}, {JSON_CONTENT_TYPE}"}
+
+    def decode(self, response):
+        content_type = response.headers.get("Content-Type", "")
+        if not content_type.startswith(ARROW_CONTENT_TYPE):
+            return super().decode(response)
+
+        table = pa.ipc.open_stream(pa.py_buffer(response.content)).read_all()
+        metadata = table.schema.metadata or {}
+        if ARROW_RESPONSE_METADATA_KEY not in metadata:
+            raise UnexpectedException(
+                f"arrow page without {ARROW_RESPONSE_METADATA_KEY.decode()} metadata"
+            )
+        page = self.codec.loads(metadata[ARROW_RESPONSE_METADATA_KEY])
+        page["schema"] = [arrow_field_schema(field) for field in table.schema]
+        page["data"] = ArrowRows(table)
+        page["arrow"] = table
+        return page
+
+
+def arrow_field_schema(field):
+    metadata = field.metadata or {}
+    if ARROW_TYPE_METADATA_KEY in metadata:
+        column_type = metadata[ARROW_TYPE_METADATA_KEY].decode()
+    else:
+        column_type = str(field.type)
+    return {"name": field.name, "type": column_type}
+
+
+class ArrowRows:
+    """
+    Row view over an arrow page, rows are built batch by batch when iterated.
+    """
+
+    __slots__ = ("table",)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __iter__(self):
+        for batch in self.table.to_batches():
+            yield from zip(*[column.to_pylist() for column in batch.columns])
+
+
+PAGE_FORMATS = {
+    JsonPageFormat.name: JsonPageFormat,
+    ArrowPageFormat.name: ArrowPageFormat,
+}
+
+
+def get_page_format(page_format=None, codec=None):
+    """
+    :param page_format: a `PageFormat`, a format name or None for json.
+    :param codec: the `JsonCodec` of the format, if not given as instance.
+    """
+    if page_format is None:
+        return JsonPageFormat(codec)
+    if isinstance(page_format, PageFormat):
+        return page_format
+    try:
+        page_format_cls = PAGE_FORMATS[page_format.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown page format: {page_format}")
+    return page_format_cls(codec)
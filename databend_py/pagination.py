@@ -0,0 +1,107 @@
+from . import defines
+from .util.helper import asbool
+
+PAGINATION_OPTIONS = ("wait_time_secs", "max_rows_in_buffer", "max_rows_per_page")
+
+
+class Pagination:
+    """
+    Pagination options sent along with the queries: the server holds each
+    page request up to `wait_time_secs` while the query runs (long-poll) and
+    returns up to `max_rows_per_page` rows per page. Unset options keep the
+    server defaults.
+    When `adaptive`, `max_rows_per_page` is doubled, up to
+    `adaptive_max_rows_per_page`, after each query filling several pages, so
+    that bulk reads take fewer round trips.
+    """
+
+    def __init__(
+        self,
+        wait_time_secs=None,
+        max_rows_in_buffer=None,
+        max_rows_per_page=None,
+        adaptive=False,
+        adaptive_max_rows_per_page=defines.DEFAULT_ADAPTIVE_MAX_ROWS_PER_PAGE,
+    ):
+        if adaptive and max_rows_per_page is None:
+            max_rows_per_page = defines.DEFAULT_MAX_ROWS_PER_PAGE
+        self.wait_time_secs = wait_time_secs
+        self.max_rows_in_buffer = max_rows_in_buffer
+        self.max_rows_per_page = max_rows_per_page
+        self.adaptive = adaptive
+        self.adaptive_max_rows_per_page = adaptive_max_rows_per_page
+
+    @classmethod
+    def from_settings(cls, settings):
+        kwargs = {
+            name: int(settings[name])
+            for name in PAGINATION_OPTIONS + ("adaptive_max_rows_per_page",)
+            if settings.get(name) is not None
+        }
+        return cls(adaptive=asbool(settings.get("adaptive_pagination", False)), **kwargs)
+
+    def request_options(self, settings=None):
+        """
+        :param settings: the settings of a single query, overriding the
+                         options of the client.
+        :return: the `pagination` of the query request, None if unset.
+        """
+        options = {}
+        for name in PAGINATION_OPTIONS:
+            value = getattr(self, name)
+            if settings and settings.get(name) is not None:
+                value = int(settings[name])
+            if value is not None:
+                options[name] = value
+        return options or None
+
+    def observe(self, page_rows):
+        """
+        Grows the page size after a query that filled several pages.
+        :param page_rows: the rows count of each page of the query.
+        """
+        if not self.adaptive or self.max_rows_per_page >= self.adaptive_max_rows_per_page:
+            return
+        full_pages = sum(1 for rows in page_rows if rows >= self.max_rows_per_page)
+        if full_pages >= 2:
+            self.max_rows_per_page = min(
+                self.max_rows_per_page * 2, self.adaptive_max_rows_per_page
+            )
+
+
+class PollBackoff:
+    """
+    Delays the polls of a running query which bring nothing new, from
+    `initial` up to `maximum` seconds. Polls held by the server (long-poll)
+    at least as long as the delay are not delayed any further.
+    """
+
+    def __init__(
+        self,
+        initial=defines.DEFAULT_POLL_INTERVAL,
+        maximum=defines.DEFAULT_MAX_POLL_INTERVAL,
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self._delay = initial
+
+    def reset(self):
+        self._delay = self.initial
+
+    def next_delay(self, elapsed):
+        """
+        :param elapsed: seconds the empty poll took.
+        :return: seconds to wait before the next poll.
+        """
+        delay = max(self._delay - elapsed, 0)
+        self._delay = min(self._delay * 2, self.maximum)
+        return delay
+
+    def observe(self, page, elapsed):
+        """
+        :return: seconds to wait before polling the query past `page`.
+        """
+        if page.get("data") or page.get("next_uri") is None:
+            self.reset()
+            return 0
+        return self.next_delay(elapsed)
@@ -0,0 +1,53 @@
+import io
+from collections.abc import Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "pyarrow is required for parquet uploads: pip install databend-py[arrow]"
+        )
+
+
+def is_arrow_table(data):
+    return pa is not None and isinstance(data, pa.Table)
+
+
+def to_arrow_table(data, column_names=None):
+    """
+    Builds the typed table of the uploaded data, the column types are
+    inferred from the python values.
+    :param data: `pyarrow.Table`, dict of column name to values, or list or
+                 iterator of rows.
+    :param column_names: the column names of the rows, the parquet columns
+                         are matched to the table columns by name.
+    """
+    require_pyarrow()
+    if isinstance(data, pa.Table):
+        return data
+    if isinstance(data, dict):
+        return pa.table(data)
+    if isinstance(data, Iterator):
+        data = list(data)
+    columns = list(zip(*data)) if data else [[] for _ in column_names]
+    if len(columns) != len(column_names):
+        raise ValueError(
+            f"rows have {len(columns)} columns, expected {len(column_names)}: "
+            + ", ".join(column_names)
+        )
+    return pa.table([pa.array(c) for c in columns], names=list(column_names))
+
+
+def serialize_parquet(table, row_group_size, compression="snappy"):
+    require_pyarrow()
+    buf = io.BytesIO()
+    pq.write_table(
+        table, buf, row_group_size=row_group_size, compression=compression
+    )
+    return buf.getvalue()
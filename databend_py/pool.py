@@ -0,0 +1,232 @@
+import collections
+import contextlib
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from databend_py.errors import QUERY_ERRORS, PoolTimeoutException, ServerException
+
+from . import log
+from .cache import ResultCache
+from .client import Client
+
+# session transaction states in which a client can be handed out again
+IDLE_TXN_STATES = (None, "AutoCommit")
+
+
+class ClientPool:
+    """
+    Thread-safe pool of `Client`. Each client owns its connection: session
+    state, query id header, cookies and keep-alive `requests.Session`, so
+    threads never share them and reuse the already opened connections.
+
+        pool = ClientPool.from_url("http://root@localhost:8000/db", max_size=8)
+        with pool.client() as client:
+            client.execute("SELECT 1")
+
+    :param factory: callable creating a new client.
+    :param min_size: clients opened up front and kept even when idle.
+    :param max_size: maximum number of clients, checked out or idle.
+    :param max_idle_time: seconds after which idle clients above `min_size`
+                          are closed.
+    :param health_check_interval: seconds a client can stay idle before it is
+                                  checked with `SELECT 1` on checkout, None
+                                  disables the check.
+    :param checkout_timeout: default seconds to wait for a client when all
+                             are checked out, None waits forever.
+    """
+
+    def __init__(
+        self,
+        factory,
+        min_size=1,
+        max_size=10,
+        max_idle_time=300,
+        health_check_interval=60,
+        checkout_timeout=None,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"Invalid pool size: min_size={min_size} max_size={max_size}"
+            )
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        # (client, last checkin time), most recently used last
+        self._idle = collections.deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """
+        Return a pool of clients configured from the given URL, see
+        `Client.from_url`. kwargs are passed along to the pool initializer.
+        The clients share the result cache configured by the URL.
+        """
+        settings = {
+            name: value[0] for name, value in parse_qs(urlparse(url).query).items()
+        }
+        result_cache = ResultCache.from_settings(settings)
+        return cls(lambda: Client.from_url(url, result_cache=result_cache), **kwargs)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def _create(self):
+        client = self.factory()
+        self._size += 1
+        return client
+
+    def _discard(self, client):
+        self._size -= 1
+        try:
+            client.close()
+            client.connection.requests_session.close()
+        except QUERY_ERRORS as e:
+            log.logger.warning(f"failed to close pooled client: {e!s}")
+
+    def _is_healthy(self, client, idle_since):
+        if self.health_check_interval is None:
+            return True
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            client.execute("SELECT 1")
+            return True
+        except QUERY_ERRORS as e:
+            log.logger.warning(f"pooled client failed the health check: {e!s}")
+            return False
+
+    def checkout(self, timeout=None):
+        """
+        :param timeout: seconds to wait for a client when all are checked
+                        out, defaults to `checkout_timeout`.
+        :return: a `Client`, to be given back with `checkin`.
+        """
+        if timeout is None:
+            timeout = self.checkout_timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                self._evict_idle()
+                while not self._idle and self._size >= self.max_size:
+                    if self._closed:
+                        raise PoolTimeoutException("pool is closed")
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeoutException(
+                                f"no client available after {timeout}s"
+                            )
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise PoolTimeoutException("pool is closed")
+                if self._idle:
+                    client, idle_since = self._idle.pop()
+                else:
+                    # reserve the slot, the client is created out of the lock
+                    self._size += 1
+                    client, idle_since = None, None
+
+            if client is None:
+                try:
+                    client = self.factory()
+                except BaseException:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                return client
+            if self._is_healthy(client, idle_since):
+                return client
+            with self._cond:
+                self._discard(client)
+                self._cond.notify()
+
+    def checkin(self, client, discard=False):
+        """
+        Give a client back to the pool. It is closed instead if `discard` is
+        set, the pool is closed or the client is left in a transaction that
+        cannot be rolled back.
+        """
+        if not discard:
+            txn_state = (client.connection.client_session or {}).get("txn_state")
+            if txn_state not in IDLE_TXN_STATES:
+                try:
+                    client.rollback()
+                except QUERY_ERRORS:
+                    discard = True
+        with self._cond:
+            if discard or self._closed:
+                self._discard(client)
+            else:
+                self._idle.append((client, time.monotonic()))
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def client(self, timeout=None):
+        """
+        Check a client out for the duration of the block. It is discarded if
+        the block raises anything but a query error, as its connection may be
+        left in any state.
+        """
+        client = self.checkout(timeout)
+        try:
+            yield client
+        except ServerException:
+            self.checkin(client)
+            raise
+        except BaseException:
+            self.checkin(client, discard=True)
+            raise
+        self.checkin(client)
+
+    def _evict_idle(self):
+        if self.max_idle_time is None:
+            return
+        now = time.monotonic()
+        # the least recently used clients are first
+        while (
+            self._idle
+            and self._size > self.min_size
+            and now - self._idle[0][1] > self.max_idle_time
+        ):
+            client, _ = self._idle.popleft()
+            self._discard(client)
+
+    def evict_idle(self):
+        """
+        Close the clients idle for more than `max_idle_time`, down to `min_size`.
+        """
+        with self._cond:
+            self._evict_idle()
+
+    def close(self):
+        """
+        Close the idle clients, the checked out ones are closed on checkin.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                client, _ = self._idle.popleft()
+                self._discard(client)
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
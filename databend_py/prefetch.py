@@ -0,0 +1,117 @@
+import asyncio
+import queue
+import threading
+
+_END = object()
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class PagePrefetcher:
+    """
+    Iterates the pages following `first_data`, fetched ahead of the consumer
+    by a background thread into a queue of `depth` pages, so that downloading
+    a page overlaps with decoding the previous ones.
+    Errors of the fetches are raised to the consumer, `close` stops the
+    thread when the consumer stops early.
+    :param fetch_page: `fetch_page(raw_data) -> raw_data` of the next page.
+    """
+
+    def __init__(self, fetch_page, first_data, depth):
+        self.fetch_page = fetch_page
+        self.pages = queue.Queue(maxsize=max(int(depth), 1))
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, args=(first_data,), name="databend-prefetch", daemon=True
+        )
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, raw_data):
+        try:
+            while raw_data["next_uri"] is not None and not self.stopped.is_set():
+                raw_data = self.fetch_page(raw_data)
+                if not self._put(raw_data):
+                    return
+        except BaseException as e:  # noqa: BLE001 - re-raised by the consumer
+            self._put(_Failure(e))
+            return
+        self._put(_END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self.pages.get()
+        if item is _END:
+            self.stopped.set()
+            raise StopIteration
+        if isinstance(item, _Failure):
+            self.stopped.set()
+            raise item.error
+        return item
+
+    def close(self):
+        self.stopped.set()
+        # unblock the thread if it waits on a full queue
+        while True:
+            try:
+                self.pages.get_nowait()
+            except queue.Empty:
+                break
+
+
+class AsyncPagePrefetcher:
+    """
+    asyncio counterpart of `PagePrefetcher`, pages are fetched by a task.
+    :param fetch_page: coroutine function `fetch_page(raw_data) -> raw_data`.
+    """
+
+    def __init__(self, fetch_page, first_data, depth):
+        self.fetch_page = fetch_page
+        self.pages = asyncio.Queue(maxsize=max(int(depth), 1))
+        self.task = asyncio.ensure_future(self._run(first_data))
+
+    async def _run(self, raw_data):
+        try:
+            while raw_data["next_uri"] is not None:
+                raw_data = await self.fetch_page(raw_data)
+                await self.pages.put(raw_data)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:  # noqa: BLE001 - re-raised by the consumer
+            await self.pages.put(_Failure(e))
+            return
+        await self.pages.put(_END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.pages.get()
+        if item is _END:
+            raise StopAsyncIteration
+        if isinstance(item, _Failure):
+            raise item.error
+        return item
+
+    async def aclose(self):
+        if not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
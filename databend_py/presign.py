@@ -0,0 +1,139 @@
+import collections
+import threading
+import time
+import uuid
+
+from . import log
+from .errors import QUERY_ERRORS
+
+
+def presign_headers(headers, codec):
+    """
+    :param headers: the `headers` cell of a `presign upload` row, decoded
+                    as a Variant, or the JSON text of older results.
+    :return: the headers of the upload, as a dict.
+    """
+    if isinstance(headers, (str, bytes)):
+        return codec.loads(headers)
+    return headers
+
+
+class PresignedUpload:
+    __slots__ = ("expires_at", "headers", "stage_path", "url")
+
+    def __init__(self, stage_path, url, headers, expires_at):
+        self.stage_path = stage_path
+        self.url = url
+        self.headers = headers
+        self.expires_at = expires_at
+
+
+class PresignPool:
+    """
+    Keeps presigned upload urls of fresh stage files ready, so that uploads
+    skip the `presign upload` query. The urls are fetched ahead by a
+    background thread on a client of its own, created by `client_factory`,
+    as `Client` is not thread-safe.
+    `get` never waits: when no url is ready the upload presigns by itself.
+
+    :param client_factory: callable creating the client of the thread.
+    :param stage_dir: the stage directory of the files.
+    :param suffix: the file name suffix, e.g. `.csv.gz`.
+    :param size: number of urls kept ready.
+    :param expire: seconds the urls are valid for.
+    :param expire_margin: seconds of validity an url must have left to be
+                          handed out, time for the upload to complete.
+    """
+
+    def __init__(
+        self,
+        client_factory,
+        stage_dir="@~",
+        suffix=".csv",
+        size=4,
+        expire=3600,
+        expire_margin=60,
+    ):
+        self.client_factory = client_factory
+        self.stage_dir = stage_dir
+        self.suffix = suffix
+        self.size = size
+        self.expire = expire
+        # short lived urls would be dropped as soon as presigned
+        self.expire_margin = min(expire_margin, expire / 2)
+        self.hits = 0
+        self.misses = 0
+        self._ready = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._client = None
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="databend-presign", daemon=True
+            )
+            self._thread.start()
+
+    def _drop_expired(self):
+        deadline = time.monotonic() + self.expire_margin
+        while self._ready and self._ready[0].expires_at <= deadline:
+            self._ready.popleft()
+
+    def get(self):
+        """
+        :return: a `PresignedUpload` or None if none is ready.
+        """
+        with self._cond:
+            self._start()
+            self._drop_expired()
+            if self._ready:
+                self.hits += 1
+                presigned = self._ready.popleft()
+            else:
+                self.misses += 1
+                presigned = None
+            self._cond.notify()
+            return presigned
+
+    def presign(self):
+        stage_path = f"{self.stage_dir}/{uuid.uuid4()}{self.suffix}"
+        expires_at = time.monotonic() + self.expire
+        _, row = self._client.execute(
+            f"presign upload {stage_path} EXPIRE = {self.expire}"
+        )
+        headers = presign_headers(row[0][1], self._client.connection.codec)
+        return PresignedUpload(stage_path, row[0][2], headers, expires_at)
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                self._drop_expired()
+                while not self._closed and len(self._ready) >= self.size:
+                    # wake up to replace the urls before they expire
+                    timeout = self._ready[0].expires_at - self.expire_margin
+                    self._cond.wait(max(timeout - time.monotonic(), 0.1))
+                    self._drop_expired()
+                if self._closed:
+                    return
+            try:
+                if self._client is None:
+                    self._client = self.client_factory()
+                presigned = self.presign()
+                failures = 0
+            except QUERY_ERRORS as e:
+                failures += 1
+                log.logger.warning(f"failed to presign upload url: {e!s}")
+                with self._cond:
+                    self._cond.wait(min(2 ** failures, 60))
+                continue
+            with self._cond:
+                self._ready.append(presigned)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._ready.clear()
+            self._cond.notify_all()
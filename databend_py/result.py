@@ -1,5 +1,368 @@
-from .datetypes import DatabendDataType
-import re
+import array
+import bisect
+import functools
+from collections.abc import Sequence
+from types import MappingProxyType
+
+from .datetypes import DatabendDataType, native_convert_fn
+from .nested import compile_decoder, parse_type, strip_nullable
+
+
+class ConverterPlan:
+    """
+    Column names, types and per-column converters compiled from a response
+    schema. Plans are cached per distinct schema, see `get_converter_plan`.
+    """
+
+    __slots__ = ("column_names", "columns_with_types", "converters")
+
+    def __init__(self, column_names, columns_with_types, converters):
+        self.column_names = column_names
+        self.columns_with_types = columns_with_types
+        self.converters = converters
+
+    def convert_row(self, row):
+        return tuple([convert(d) for convert, d in zip(self.converters, row)])
+
+
+def null_safe(convert, null_to_none=False):
+    """
+    Wraps a converter so that NULL cells are not converted: they are returned
+    as None if `null_to_none` is set, otherwise as sent by the server.
+    """
+
+    def null_safe_convert(d):
+        if d == "NULL" or d is None:
+            return None if null_to_none else d
+        return convert(d)
+
+    return null_safe_convert
+
+
+def typed_null_safe(null_to_none=False):
+    """
+    Converter of the cells of typed pages (e.g. arrow), which only need their
+    NULL cells (None) rendered the way string pages render them.
+    """
+
+    def typed_convert(d):
+        if d is None and not null_to_none:
+            return "NULL"
+        return d
+
+    return typed_convert
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_converter_plan(
+    fields, null_to_none, typed, native_types, timezone, decode_variant
+):
+    column_names = []
+    columns_with_types = []
+    converters = []
+    for name, schema_type in fields:
+        inner_type = QueryResult.extract_type(schema_type)
+        column_names.append(name)
+        columns_with_types.append((name, inner_type))
+        if typed:
+            converters.append(typed_null_safe(null_to_none))
+        else:
+            # nested types are decoded by their full type, e.g. Array(String)
+            convert = compile_decoder(schema_type, decode_variant)
+            if convert is None and native_types:
+                convert = native_convert_fn(inner_type, timezone)
+            if convert is None:
+                convert = DatabendDataType.type_convert_fn(inner_type, decode_variant)
+            converters.append(null_safe(convert, null_to_none))
+    return ConverterPlan(
+        tuple(column_names), tuple(columns_with_types), tuple(converters)
+    )
+
+
+def get_converter_plan(
+    fields,
+    null_to_none=False,
+    typed=False,
+    native_types=False,
+    timezone=None,
+    decode_variant=False,
+):
+    """
+    :param fields: the `schema` of a query response.
+    :param null_to_none: if NULL cells are converted to None.
+    :param typed: if the cells are already typed, see `PageFormat`.
+    :param native_types: if the temporal, Decimal and UUID cells are decoded
+                         into Python objects, see `native_convert_fn`.
+    :param timezone: the timezone of the session, for the timestamps.
+    :param decode_variant: if the Variant cells are decoded as JSON, rather
+                           than kept as their JSON text.
+    :return: the cached `ConverterPlan` of the schema.
+    """
+    key = tuple((field["name"], field["type"]) for field in fields or ())
+    return _compile_converter_plan(
+        key,
+        null_to_none,
+        typed,
+        native_types,
+        timezone if native_types else None,
+        decode_variant,
+    )
+
+
+# inner column types stored as machine values by `CompactRows`
+COMPACT_TYPECODES = {
+    "int8": "q",
+    "int16": "q",
+    "int32": "q",
+    "int64": "q",
+    "uint8": "q",
+    "uint16": "q",
+    "uint32": "q",
+    "uint64": "Q",
+    "float32": "d",
+    "float64": "d",
+    "float": "d",
+    "double": "d",
+}
+
+
+class Row(tuple):
+    """
+    Row of `CompactRows`: a tuple whose cells can also be read by column
+    name, `row["name"]` or `row.name` when the name is not a tuple method.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _index = MappingProxyType({})
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __reduce__(self):
+        # the row classes are made per schema, rows are pickled as tuples
+        return tuple, (tuple(self),)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+
+@functools.lru_cache(maxsize=256)
+def row_class(column_names):
+    """
+    :return: the cached `Row` class of the column names.
+    """
+    index = {}
+    for i, name in enumerate(column_names):
+        # duplicated names read the first column
+        index.setdefault(name, i)
+    return type("Row", (Row,), {"__slots__": (), "_fields": column_names, "_index": index})
+
+
+class CompactRows(Sequence):
+    """
+    Read-only rows of a result, stored page by page as columns: numeric
+    columns without NULL as `array.array` (or views over the NumPy arrays
+    when decoding with NumPy), the others as lists. Rows are
+    `Row` tuples built on access, so that the result takes a fraction of the
+    memory of a list of tuples.
+    """
+
+    def __init__(self, plan):
+        self.row_class = row_class(plan.column_names)
+        self._typecodes = tuple(
+            COMPACT_TYPECODES.get(column_type.lower())
+            for _, column_type in plan.columns_with_types
+        )
+        # first row and columns of each page
+        self._starts = []
+        self._pages = []
+        self._len = 0
+
+    def append_columns(self, columns):
+        """
+        :param columns: the converted cells of a page, column by column.
+        """
+        if not columns or not len(columns[0]):
+            return
+        compact = []
+        for typecode, values in zip(self._typecodes, columns):
+            if typecode is not None and not isinstance(values, memoryview):
+                try:
+                    values = array.array(typecode, values)
+                except (TypeError, OverflowError):
+                    # NULL cells or out of range values
+                    pass
+            compact.append(values)
+        self._starts.append(self._len)
+        self._pages.append(compact)
+        self._len += len(columns[0])
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("row index out of range")
+        page = bisect.bisect_right(self._starts, i) - 1
+        offset = i - self._starts[page]
+        return self.row_class([column[offset] for column in self._pages[page]])
+
+    def __iter__(self):
+        row_cls = self.row_class
+        for columns in self._pages:
+            yield from map(row_cls, zip(*columns))
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, CompactRows)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<CompactRows: {self._len} rows>"
+
+    def column(self, key):
+        """
+        :param key: the column name or position.
+        :return: the values of the column, as a list.
+        """
+        if isinstance(key, str):
+            key = self.row_class._index[key]
+        values = []
+        for columns in self._pages:
+            values.extend(columns[key])
+        return values
+
+
+_UNCONVERTED = object()
+
+
+class LazyRow(Sequence):
+    """
+    Row of the results decoded with `lazy_rows`: wraps the raw row of the
+    page and converts each cell on first access, then keeps it. Cells are
+    read by position or by column name, `row["name"]` or `row.name`, and
+    rows compare equal to the tuples of the eager results.
+    """
+
+    __slots__ = ("_cells", "raw")
+    _fields = ()
+    _index = MappingProxyType({})
+    _converters = ()
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._cells = None
+
+    def _cell(self, i):
+        cells = self._cells
+        if cells is None:
+            cells = self._cells = [_UNCONVERTED] * len(self.raw)
+        value = cells[i]
+        if value is _UNCONVERTED:
+            value = cells[i] = self._converters[i](self.raw[i])
+        return value
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._cell(self._index[key])
+        if isinstance(key, slice):
+            return tuple(self._cell(i) for i in range(*key.indices(len(self.raw))))
+        if key < 0:
+            key += len(self.raw)
+        if not 0 <= key < len(self.raw):
+            raise IndexError("row index out of range")
+        return self._cell(key)
+
+    def __getattr__(self, name):
+        try:
+            index = self._index[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return self._cell(index)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __iter__(self):
+        return map(self._cell, range(len(self.raw)))
+
+    def __eq__(self, other):
+        if isinstance(other, LazyRow):
+            other = tuple(other)
+        elif not isinstance(other, tuple):
+            return NotImplemented
+        return tuple(self) == other
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+    def __reduce__(self):
+        # the row classes are made per schema, rows are pickled as tuples
+        return tuple, (tuple(self),)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+
+def _cell_property(i):
+    return property(lambda row: row._cell(i))
+
+
+@functools.lru_cache(maxsize=256)
+def lazy_row_class(plan):
+    """
+    :return: the cached `LazyRow` class of the converter plan, its columns
+             are properties unless their name is taken.
+    """
+    index = row_class(plan.column_names)._index
+    namespace = {
+        "__slots__": (),
+        "_fields": plan.column_names,
+        "_index": index,
+        "_converters": plan.converters,
+    }
+    for name, i in index.items():
+        if name.isidentifier() and not hasattr(LazyRow, name):
+            namespace[name] = _cell_property(i)
+    return type("LazyRow", (LazyRow,), namespace)
+
+
+def get_numpy_types(columns_with_types):
+    """
+    :return: for each column, the type its cells are parsed as by
+             `column_to_array` when decoding with NumPy, None for the
+             columns converted cell by cell.
+    """
+    from .columnar import NUMPY_DTYPES, require_numpy
+
+    require_numpy()
+    numpy_types = []
+    for _, column_type in columns_with_types:
+        dtype = NUMPY_DTYPES.get(column_type.lower())
+        if dtype == "float32":
+            # the rows hold the float64 of the text, as `float` converts it
+            numpy_types.append("Float64")
+        else:
+            numpy_types.append(column_type if dtype is not None else None)
+    return tuple(numpy_types)
 
 
 class QueryResult(object):
@@ -8,69 +371,162 @@ class QueryResult(object):
     """
 
     def __init__(
-        self, data_generator, first_data, with_column_types=False, null_to_none=False
+        self,
+        data_generator,
+        first_data,
+        with_column_types=False,
+        null_to_none=False,
+        compact_rows=False,
+        numpy_decode=False,
+        lazy_rows=False,
+        native_types=False,
+        timezone=None,
+        decode_variant=False,
     ):
         self.data_generator = data_generator
         self.with_column_types = with_column_types
         self.first_data = first_data
-        self.column_data_dict_list = []
+        self.data = []
         self.columns_with_types = []
         self.column_type_dic = {}
-        self.type_convert = DatabendDataType.type_convert_fn
+        self.plan = None
         self.null_to_none = null_to_none
+        # store the rows as `CompactRows` instead of a list of tuples
+        self.compact_rows = compact_rows
+        # parse the numeric and bool columns of each page with NumPy. Boolean
+        # cells are parsed by value, `true` or `1`, where the default
+        # converter takes any non-numeric text, `false` included, as True
+        self.numpy_decode = numpy_decode
+        self.numpy_types = ()
+        # convert the cells of the rows on access, see `LazyRow`
+        self.lazy_rows = lazy_rows
+        # decode the Timestamp, Date, Decimal and UUID cells to Python objects,
+        # the timestamps in `timezone` if known
+        self.native_types = native_types
+        self.timezone = timezone
+        # decode the Variant cells as JSON instead of returning their text
+        self.decode_variant = decode_variant
+        if compact_rows and lazy_rows:
+            raise ValueError("compact_rows and lazy_rows are exclusive")
 
         super(QueryResult, self).__init__()
 
     def store_data(self, raw_data: dict):
-        fields = raw_data.get("schema")
-        column_name_ls = []
-        datas = raw_data.get("data")
-        for field in fields:
-            column_name_ls.append(field["name"])
-
-        for data in datas:
-            self.column_data_dict_list.append(dict(zip(column_name_ls, data)))
+        if self.compact_rows:
+            self.data.append_columns(self.convert_page_columns(raw_data))
+        else:
+            self.data.extend(self.page_rows(raw_data))
 
     def store_columns(self, raw_data: dict):
-        fields = raw_data.get("schema")
-        for field in fields:
-            inner_type = self.extract_type(field["type"])
-            column_type = (field["name"], inner_type)
-            self.column_type_dic[field["name"]] = inner_type
-            self.columns_with_types.append(column_type)
+        self.plan = get_converter_plan(
+            raw_data.get("schema"),
+            self.null_to_none,
+            typed=raw_data.get("arrow") is not None,
+            native_types=self.native_types,
+            timezone=self.timezone,
+            decode_variant=self.decode_variant,
+        )
+        self.columns_with_types = list(self.plan.columns_with_types)
+        self.column_type_dic = dict(self.plan.columns_with_types)
+        if self.compact_rows:
+            self.data = CompactRows(self.plan)
+        if self.numpy_decode and not self.lazy_rows and raw_data.get("arrow") is None:
+            self.numpy_types = get_numpy_types(self.plan.columns_with_types)
+
+    def page_rows(self, raw_data: dict):
+        """
+        :return: the converted rows of the page, an iterable of tuples,
+                 `Row` tuples as those of `CompactRows` if `compact_rows`.
+        """
+        if self.lazy_rows:
+            return map(lazy_row_class(self.plan), raw_data.get("data") or ())
+        if self.numpy_types:
+            rows = zip(*self.convert_page_columns(raw_data))
+        else:
+            rows = self.convert_page(raw_data)
+        if self.compact_rows:
+            return map(self.data.row_class, rows)
+        return rows
+
+    def convert_page(self, raw_data: dict):
+        convert_row = self.plan.convert_row
+        return [convert_row(row) for row in raw_data.get("data") or ()]
+
+    def convert_page_columns(self, raw_data: dict):
+        """
+        :return: the converted cells of the page, column by column.
+        """
+        rows = raw_data.get("data")
+        if not rows:
+            return []
+        if not self.numpy_types:
+            return [
+                list(map(convert, values))
+                for convert, values in zip(self.plan.converters, zip(*rows))
+            ]
+        columns = []
+        for convert, numpy_type, values in zip(
+            self.plan.converters, self.numpy_types, zip(*rows)
+        ):
+            if numpy_type is None:
+                columns.append(list(map(convert, values)))
+            else:
+                columns.append(self.convert_numpy_column(values, numpy_type))
+        return columns
+
+    def convert_numpy_column(self, values, column_type):
+        """
+        :return: the cells of the column parsed in one NumPy pass, as a view
+                 over the array, or as a list if the column holds NULL.
+        """
+        from .columnar import column_to_array
+
+        array, mask = column_to_array(values, column_type)
+        if mask is None and array.dtype != object:
+            # the cells are read from the array as Python scalars
+            return memoryview(array)
+        column = array.tolist()
+        if mask is not None:
+            null = None if self.null_to_none else "NULL"
+            for i in mask.nonzero()[0].tolist():
+                column[i] = null
+        return column
 
     def get_result(self):
         """
         :return: stored query result.
         """
-        data = []
-        self.store_data(self.first_data)
         self.store_columns(self.first_data)
+        self.store_data(self.first_data)
         for d in self.data_generator:
             self.store_data(d)
 
-        for read_data in self.column_data_dict_list:
-            tmp_list = []
-            for c, d in read_data.items():
-                if d == "NULL":
-                    if self.null_to_none:
-                        tmp_list.append(None)
-                    else:
-                        tmp_list.append(d)
-                else:
-                    tmp_list.append(self.type_convert(self.column_type_dic[c])(d))
-            data.append(tuple(tmp_list))
-
         if self.with_column_types:
-            return self.columns_with_types, data
+            return self.columns_with_types, self.data
         else:
-            return [], data
+            return [], self.data
+
+    def iter_result(self):
+        """
+        Decodes and yields the rows page by page. Only the page being consumed
+        is referenced, so memory stays bounded whatever the result size.
+        :return: generator of row tuples.
+        """
+        self.store_columns(self.first_data)
+        raw_data, self.first_data = self.first_data, None
+        while raw_data is not None:
+            rows = self.page_rows(raw_data)
+            raw_data = None
+            yield from rows
+            # drop the consumed page before fetching the next one
+            rows = None
+            raw_data = next(self.data_generator, None)
 
     @staticmethod
     def extract_type(schema_type):
-        if "nullable" in schema_type.lower():
-            return re.findall(r"[(](.*?)[)]", schema_type)[0]
-        elif "(" in schema_type:
-            return schema_type.split("(")[0]
-        else:
-            return schema_type
+        """
+        :return: the name of the type, without its parameters nor Nullable,
+                 e.g. `Array` for `Nullable(Array(Int32))`.
+        """
+        name, _ = strip_nullable(parse_type(schema_type))
+        return name
@@ -1,45 +1,220 @@
+import asyncio
+import random
+import threading
 import time
 
-from databend_py.errors import WarehouseTimeoutException
+import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
 
+from databend_py import log
+from databend_py.errors import HTTPStatusException, WarehouseTimeoutException
 
-# retry in 550s for WarehouseTimeoutException
-def retry(times, exceptions):
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+# the request was rejected before being processed, whatever the method; a
+# gateway answering 502/504 may have forwarded it, see `RetryPolicy.classify`
+RETRYABLE_STATUS_CODES = (429, 503)
+
+
+def is_connect_error(exc):
+    """
+    :return: if the requests error was raised before the request was sent:
+             the connection was refused or timed out.
+    """
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.exceptions.ConnectionError):
+        return False
+    # the cause is wrapped in the `MaxRetryError` of urllib3
+    cause = exc.args[0] if exc.args else None
+    cause = getattr(cause, "reason", cause)
+    return isinstance(cause, (NewConnectionError, ConnectTimeoutError))
+
+
+class RetryStats:
     """
-    Retry Decorator
-    Retries the wrapped function/method `times` times if the exceptions listed
-    in ``exceptions`` are thrown
-    :type times: Int
-    :param exceptions: Lists of exceptions that trigger a retry attempt
-    :type exceptions: Tuple of Exceptions
+    Counters of a `RetryPolicy`, shared by the threads using it.
     """
 
-    def decorator(func):
-        def newfn(*args, **kwargs):
-            attempt = 1
-            while attempt <= times:
-                try:
-                    return func(*args, **kwargs)
-                except exceptions:
-                    print(
-                        "Exception thrown when attempting to run %s, attempt "
-                        "%d of %d" % (func, attempt, times)
-                    )
-                    time.sleep(attempt * 10)
-                    attempt += 1
-            return func(*args, **kwargs)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.delay = 0.0
+        self.failures = 0
+        self.reasons = {}
+
+    def record_retry(self, reason, delay):
+        with self._lock:
+            self.retries += 1
+            self.delay += delay
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "delay": self.delay,
+                "failures": self.failures,
+                "reasons": dict(self.reasons),
+            }
+
+
+class RetryPolicy:
+    """
+    Retries the http calls failing with a transient error, waiting an
+    exponential backoff with jitter between the attempts:
+    `min(initial_delay * multiplier ** n, max_delay)`, minus up to `jitter`
+    of it at random, until `max_attempts` attempts or `deadline` seconds.
+
+    Provisioning warehouses, connect errors and 429/503 are always retried,
+    the requests were not processed. Read errors, timeouts and the other
+    5xx, 502/504 of the gateways included, only are for idempotent calls,
+    such as the `next_uri` pages: a query may have run already.
+
+    Connect errors and provisioning warehouses have budgets of their own, a
+    server down fails within seconds while a warehouse may take minutes to
+    resume.
+
+    :param max_attempts: attempts of a call, the first one included.
+    :param deadline: seconds budget of all the attempts, None for unlimited.
+    :param connect_max_attempts: `max_attempts` of the connect errors.
+    :param connect_deadline: `deadline` of the connect errors.
+    :param warehouse_max_attempts: `max_attempts` of the provisioning
+                                   warehouses.
+    :param warehouse_deadline: `deadline` of the provisioning warehouses.
+    """
+
+    def __init__(
+        self,
+        max_attempts=5,
+        initial_delay=1.0,
+        max_delay=30.0,
+        multiplier=2.0,
+        jitter=0.5,
+        deadline=60.0,
+        connect_max_attempts=3,
+        connect_deadline=5.0,
+        warehouse_max_attempts=11,
+        warehouse_deadline=550.0,
+    ):
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.budgets = {
+            "connect": (connect_max_attempts, connect_deadline),
+            "warehouse_timeout": (warehouse_max_attempts, warehouse_deadline),
+        }
+        self.stats = RetryStats()
+
+    @classmethod
+    def from_settings(cls, settings):
+        kwargs = {}
+        for name in ("max_attempts", "connect_max_attempts", "warehouse_max_attempts"):
+            if settings.get("retry_" + name) is not None:
+                kwargs[name] = int(settings["retry_" + name])
+        for name in (
+            "initial_delay",
+            "max_delay",
+            "deadline",
+            "connect_deadline",
+            "warehouse_deadline",
+        ):
+            if settings.get("retry_" + name) is not None:
+                kwargs[name] = float(settings["retry_" + name])
+        return cls(**kwargs)
 
-        return newfn
+    def budget(self, reason):
+        """
+        :return: `(max_attempts, deadline)` of the retry reason.
+        """
+        return self.budgets.get(reason, (self.max_attempts, self.deadline))
 
-    return decorator
+    def classify(self, exc, idempotent=False):
+        """
+        :return: the retry reason of `exc`, None if it must not be retried.
+        """
+        if isinstance(exc, WarehouseTimeoutException):
+            return "warehouse_timeout"
+        if isinstance(exc, HTTPStatusException):
+            if exc.status_code in RETRYABLE_STATUS_CODES or (
+                idempotent and exc.status_code >= 500
+            ):
+                return f"http_{exc.status_code}"
+            return None
+        if is_connect_error(exc):
+            return "connect"
+        if aiohttp is not None and isinstance(exc, aiohttp.ClientConnectorError):
+            return "connect"
+        if not idempotent:
+            return None
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return "connection"
+        if aiohttp is not None and isinstance(exc, aiohttp.ClientConnectionError):
+            return "connection"
+        if isinstance(exc, asyncio.TimeoutError):
+            return "connection"
+        return None
 
+    def backoff(self, attempt):
+        """
+        :param attempt: the number of the failed attempt, from 1.
+        """
+        delay = min(self.initial_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return delay * (1 - self.jitter * random.random())
 
-@retry(times=3, exceptions=WarehouseTimeoutException)
-def foo1():
-    print("Some code here ....")
-    print("Oh no, we have exception")
-    raise WarehouseTimeoutException("Some error")
+    def next_delay(self, exc, attempt, start_time, idempotent=False):
+        """
+        :return: seconds to wait before the next attempt, None to give up.
+        """
+        reason = self.classify(exc, idempotent)
+        if reason is None:
+            return None
+        max_attempts, deadline = self.budget(reason)
+        if attempt >= max_attempts:
+            self.stats.record_failure()
+            return None
+        delay = max(self.backoff(attempt), getattr(exc, "retry_after", None) or 0)
+        if deadline is not None and time.monotonic() + delay - start_time > deadline:
+            self.stats.record_failure()
+            return None
+        self.stats.record_retry(reason, delay)
+        log.logger.warning(
+            f"{exc}, retrying in {delay:.2f}s, attempt {attempt} of {max_attempts}"
+        )
+        return delay
 
+    def call(self, func, *args, idempotent=False, **kwargs):
+        start_time = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, start_time, idempotent)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
 
-if __name__ == "__main__":
-    foo1()
+    async def call_async(self, func, *args, idempotent=False, **kwargs):
+        start_time = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, start_time, idempotent)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
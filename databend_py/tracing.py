@@ -0,0 +1,159 @@
+import time
+
+from . import log
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover
+    otel_trace = None
+
+
+class Span:
+    """
+    A phase of a query or an upload, used as a context manager. Attributes,
+    such as the `rows` and `bytes` handled, can be set until it ends.
+    This one records nothing, it is shared by all the phases.
+    """
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = Span()
+
+
+class Tracer:
+    """
+    Makes the spans around the phases of the client:
+
+    - `query`: from the submission of the query until its schema is known.
+    - `query.submit`: each query request, the loads by attachment included.
+    - `page.fetch`, `page.decode`: each page of the results.
+    - `upload.presign`, `upload.serialize`, `upload.put`: each staged file.
+    - `upload.copy`, `upload.attachment`, `upload.streaming_load`: the
+      statement loading the rows.
+
+    The default one does nothing, subclasses override `span`.
+    """
+
+    def span(self, name, **attributes):
+        """
+        :param name: the phase, prefixed with `databend.` by the adapters.
+        :param attributes: the attributes known when the phase starts.
+        :return: the `Span` of the phase, not started yet.
+        """
+        return NOOP_SPAN
+
+
+NOOP_TRACER = Tracer()
+
+
+class LoggingSpan(Span):
+    __slots__ = ("attributes", "name", "start_time")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start_time = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.attributes["error"] = repr(exc)
+        log.logger.debug(
+            "span %s %.6fs %s",
+            self.name,
+            time.monotonic() - self.start_time,
+            " ".join("{}={}".format(*item) for item in self.attributes.items()),
+        )
+        return False
+
+
+class LoggingTracer(Tracer):
+    """
+    Logs the duration and the attributes of each span at debug level, it is
+    the tracer of the clients with the `debug` setting.
+    """
+
+    def span(self, name, **attributes):
+        return LoggingSpan(name, attributes)
+
+
+class OpenTelemetrySpan(Span):
+    __slots__ = ("_context", "_span")
+
+    def __init__(self, context):
+        self._context = context
+        self._span = None
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self._span.set_attribute("databend." + key, value)
+
+    def __enter__(self):
+        self._span = self._context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._context.__exit__(exc_type, exc, tb)
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Reports the spans to OpenTelemetry, as children of the current span.
+    :param tracer: the OpenTelemetry tracer, the one of the global tracer
+                   provider by default.
+    """
+
+    def __init__(self, tracer=None):
+        if otel_trace is None:
+            raise ImportError(
+                "opentelemetry-api is required for the opentelemetry tracer: "
+                "pip install databend-py[opentelemetry]"
+            )
+        self.tracer = tracer or otel_trace.get_tracer("databend_py")
+
+    def span(self, name, **attributes):
+        attributes = {
+            "databend." + key: value
+            for key, value in attributes.items()
+            if value is not None
+        }
+        return OpenTelemetrySpan(
+            self.tracer.start_as_current_span("databend." + name, attributes=attributes)
+        )
+
+
+TRACERS = {
+    "log": LoggingTracer,
+    "opentelemetry": OpenTelemetryTracer,
+}
+
+
+def get_tracer(tracer=None, debug=False):
+    """
+    :param tracer: a `Tracer`, or the name of one: `log` or `opentelemetry`.
+    :param debug: when no tracer is given, log the spans.
+    :return: the tracer of a connection, the no-op one by default.
+    """
+    if isinstance(tracer, Tracer):
+        return tracer
+    if tracer:
+        if tracer not in TRACERS:
+            raise ValueError(f"Unknown tracer: {tracer}")
+        return TRACERS[tracer]()
+    return LoggingTracer() if debug else NOOP_TRACER
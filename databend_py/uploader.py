@@ -1,11 +1,38 @@
-import requests
-import io
+import contextlib
 import csv
-import uuid
-import json
-import time
 import gzip
-from . import log
+import io
+import re
+import uuid
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+
+from . import defines, log
+from .parquet import is_arrow_table, require_pyarrow, serialize_parquet, to_arrow_table
+from .presign import PresignPool, presign_headers
+from .util.helper import chunks
+
+
+def serialize_csv(rows, compress):
+    """
+    :return: the CSV encoding of the rows, gzip compressed if `compress`.
+             A module function, so that the parts of a batch can be
+             serialized by the processes of a pool.
+    """
+    # In Python3 csv.writer expects a file-like object opened in text mode. In Python2, csv.writer expects a file-like object opened in binary mode.
+    buf = io.StringIO()
+    csvwriter = csv.writer(buf, delimiter=",", quoting=csv.QUOTE_MINIMAL)
+    csvwriter.writerows(rows)
+    output = buf.getvalue().encode("utf-8")
+    if compress:
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb") as gzwriter:
+            gzwriter.write(output)
+        output = buf.getvalue()
+    return output
 
 
 class DataUploader:
@@ -15,8 +42,9 @@ class DataUploader:
             connection,
             settings,
             default_stage_dir="@~",
-            debug=False,
             compress=False,
+            stream=False,
+            presign_client_factory=None,
     ):
         # TODO: make it depends on Connection instead of Client
         self.client = client
@@ -24,23 +52,66 @@ class DataUploader:
         self.settings = settings
         self.default_stage_dir = default_stage_dir
         self._compress = compress
-        self._debug = debug
+        self._stream = stream
+        # batches larger than part_rows are staged as several files uploaded
+        # by parallelism threads, and serialized by as many processes (CSV)
+        # or threads (parquet, written by pyarrow without the GIL)
+        self._parallelism = int(settings.get("upload_parallelism", 1))
+        self._part_rows = int(
+            settings.get("upload_part_rows", defines.DEFAULT_UPLOAD_PART_ROWS)
+        )
+        # "parquet" uploads typed columns, built from the rows with pyarrow
+        self._format = settings.get("upload_format", "csv").lower()
+        if self._format not in ("csv", "parquet"):
+            raise ValueError(f"Unknown upload format: {self._format}")
+        if self._format == "parquet":
+            require_pyarrow()
+        # column names of the tables loaded from parquet, by table name
+        self._column_names = {}
+        # "stage" uploads the rows to a stage then loads them, "streaming_load"
+        # sends them along with the statement in a single request
+        self._load_method = settings.get("load_method", "stage")
+        if self._load_method not in ("stage", "streaming_load"):
+            raise ValueError(f"Unknown load method: {self._load_method}")
+        # single file uploads take their presigned url from the pool, filled
+        # in background by a client made by presign_client_factory
+        self.presign_pool = None
+        presign_pool_size = int(settings.get("presign_pool_size", 0))
+        if presign_pool_size > 0 and presign_client_factory is not None:
+            self.presign_pool = PresignPool(
+                presign_client_factory,
+                stage_dir=default_stage_dir,
+                suffix=self._file_suffix(),
+                size=presign_pool_size,
+                expire=int(settings.get("presign_expire", 3600)),
+            )
 
     def upload_to_table_by_copy(self, table_name, data):
-        if len(data) == 0:
+        if self._is_empty(data):
             return
-        stage_path = self._gen_stage_path(self.default_stage_dir)
-        presigned_url, headers = self._execute_presign(stage_path)
-        self._upload_to_presigned_url(presigned_url, headers, data)
-        self._execute_copy(table_name, stage_path, "CSV")
+        with self._forget_columns_on_error(table_name):
+            data = self._prepare_data(table_name, data)
+            if self._load_method == "streaming_load":
+                self._streaming_load(
+                    f"INSERT INTO {table_name}", data, self._file_type()
+                )
+                return
+            stage_path, files = self._upload_data_to_stage(data, file_list=True)
+            self._execute_copy(table_name, stage_path, self._file_type(), files)
 
     def upload_to_table_by_attachment(self, sql_statement, data):
-        if len(data) == 0:
+        if self._is_empty(data):
             return
-        stage_path = self._gen_stage_path(self.default_stage_dir)
-        presigned_url, headers = self._execute_presign(stage_path)
-        self._upload_to_presigned_url(presigned_url, headers, data)
-        self._execute_with_attachment(sql_statement, stage_path, "CSV")
+        table_name, column_names = self._parse_insert_statement(sql_statement)
+        with self._forget_columns_on_error(table_name):
+            data = self._prepare_data(table_name, data, column_names)
+            if self._load_method == "streaming_load":
+                self._streaming_load(
+                    self._strip_values(sql_statement), data, self._file_type()
+                )
+                return
+            stage_path, _ = self._upload_data_to_stage(data)
+            self._execute_with_attachment(sql_statement, stage_path, self._file_type())
 
     def replace_into_table(self, table_name, conflict_keys, data):
         """
@@ -49,15 +120,22 @@ class DataUploader:
         :param data: list data to insert/replace
         :return:
         """
-        if len(data) == 0:
+        if self._is_empty(data):
             return
-        stage_path = self._gen_stage_path(self.default_stage_dir)
-        presigned_url, headers = self._execute_presign(stage_path)
-        self._upload_to_presigned_url(presigned_url, headers, data)
-        sql_statement = (
-            f"REPLACE INTO {table_name} ON ({','.join(conflict_keys)}) VALUES"
-        )
-        self._execute_with_attachment(sql_statement, stage_path, "CSV")
+        with self._forget_columns_on_error(table_name):
+            data = self._prepare_data(table_name, data)
+            if self._load_method == "streaming_load":
+                self._streaming_load(
+                    f"REPLACE INTO {table_name} ON ({','.join(conflict_keys)})",
+                    data,
+                    self._file_type(),
+                )
+                return
+            stage_path, _ = self._upload_data_to_stage(data)
+            sql_statement = (
+                f"REPLACE INTO {table_name} ON ({','.join(conflict_keys)}) VALUES"
+            )
+            self._execute_with_attachment(sql_statement, stage_path, self._file_type())
 
     def upload_to_stage(self, stage_dir, filename, data):
         stage_path = self._gen_stage_path(stage_dir, filename)
@@ -65,79 +143,362 @@ class DataUploader:
         self._upload_to_presigned_url(presigned_url, headers, data)
         return stage_path
 
+    def _is_empty(self, data):
+        """
+        :return: if there are no rows to upload, iterators are only consumed
+                 by the upload.
+        :raise TypeError: if the rows are an iterator while they are neither
+                          streamed nor loaded as parquet.
+        """
+        if isinstance(data, dict):
+            return all(len(column) == 0 for column in data.values())
+        if isinstance(data, Iterator):
+            if not self._stream and self._format != "parquet":
+                raise TypeError(
+                    "iterators of rows are only uploaded with stream_upload, "
+                    "pass a list"
+                )
+            return False
+        return len(data) == 0
+
+    @staticmethod
+    def _parse_insert_statement(sql_statement):
+        """
+        :return: the table name and the column names, None if not listed, of
+                 an `INSERT INTO t (a, b) VALUES` statement.
+        """
+        match = re.match(
+            r"\s*(?:insert|replace)\s+into\s+([^\s(]+)\s*(?:\(([^)]*)\))?",
+            sql_statement,
+            flags=re.IGNORECASE,
+        )
+        if match is None:
+            raise ValueError("Not standard insert/replace statement")
+        table_name, columns = match.groups()
+        if columns is None:
+            return table_name, None
+        return table_name, [c.strip().strip("`\"") for c in columns.split(",")]
+
+    def _prepare_data(self, table_name, data, column_names=None):
+        """
+        :return: the data as uploaded, a `pyarrow.Table` for parquet uploads.
+        """
+        if self._format != "parquet":
+            return data
+        if column_names is None and not isinstance(data, dict) and not is_arrow_table(data):
+            column_names = self._table_column_names(table_name)
+        return to_arrow_table(data, column_names)
+
+    @contextlib.contextmanager
+    def _forget_columns_on_error(self, table_name):
+        """
+        Drops the cached column names of the table when its load fails, they
+        may be stale after an ALTER TABLE.
+        """
+        try:
+            yield
+        except BaseException:
+            self._column_names.pop(table_name, None)
+            raise
+
+    def _table_column_names(self, table_name):
+        # parquet columns are loaded by name, rows only have positions
+        if table_name not in self._column_names:
+            columns, _ = self.client.execute(
+                f"SELECT * FROM {table_name} LIMIT 0", with_column_types=True
+            )
+            self._column_names[table_name] = [name for name, _ in columns]
+        return self._column_names[table_name]
+
+    def _split_parts(self, data):
+        """
+        :return: the row offsets of the parts to stage, or None to stage the
+                 rows as a single file.
+        """
+        if (
+            self._parallelism <= 1
+            or not (isinstance(data, list) or is_arrow_table(data))
+            or len(data) <= self._part_rows
+        ):
+            return None
+        return range(0, len(data), self._part_rows)
+
+    def _slice_part(self, data, offset):
+        if is_arrow_table(data):
+            return data.slice(offset, self._part_rows)
+        return data[offset: offset + self._part_rows]
+
+    def _upload_data_to_stage(self, data, file_list=False):
+        """
+        Uploads the rows into the default stage, as a single file or, for
+        large batches, as parts serialized and uploaded concurrently.
+        :param file_list: if the load lists the files, the parts may then be
+                          the presigned files of the pool, in the default
+                          stage, rather than the files of a new directory.
+        :return: the stage path of the file or of the parts directory, and
+                 the file names of the parts (None for a single file).
+        """
+        offsets = self._split_parts(data)
+        if offsets is None:
+            stage_path, presigned_url, headers = self._presign_stage_file()
+            self._upload_to_presigned_url(presigned_url, headers, data)
+            return stage_path, None
+
+        pooled = file_list and self.presign_pool is not None
+        if pooled:
+            stage_dir = self.default_stage_dir
+        else:
+            stage_dir = self._gen_stage_path(self.default_stage_dir, str(uuid.uuid4()))
+        files = []
+        with ThreadPoolExecutor(
+            max_workers=self._parallelism
+        ) as executor, self._part_serializer(data) as processes:
+            futures = []
+            # presign queries go through the client, which is not thread-safe:
+            # each part is uploaded as soon as presigned, while the next ones
+            # are being presigned
+            for filename, offset in zip(self._gen_part_filenames(len(offsets)), offsets):
+                if pooled:
+                    stage_path, presigned_url, headers = self._presign_stage_file()
+                    filename = stage_path.rsplit("/", 1)[1]
+                else:
+                    presigned_url, headers = self._execute_presign(
+                        f"{stage_dir}/{filename}"
+                    )
+                files.append(filename)
+                futures.append(
+                    executor.submit(
+                        self._upload_part,
+                        processes,
+                        presigned_url,
+                        headers,
+                        self._slice_part(data, offset),
+                    )
+                )
+            for future in futures:
+                future.result()
+        return stage_dir + "/", files
+
+    def _part_serializer(self, data):
+        """
+        :return: the process pool serializing the CSV parts, outside of the
+                 GIL, or a null context for parquet parts.
+        """
+        if is_arrow_table(data):
+            return contextlib.nullcontext()
+        return ProcessPoolExecutor(max_workers=self._parallelism)
+
+    def _serialize_part(self, processes, part):
+        if is_arrow_table(part):
+            # pyarrow writes the parquet pages without holding the GIL
+            return self._serialize_parquet(part)
+        with self.connection.tracer.span(
+            "upload.serialize", format="csv", rows=len(part)
+        ) as span:
+            output = processes.submit(serialize_csv, part, self._compress).result()
+            span.set_attribute("bytes", len(output))
+        return output
+
+    def _upload_part(self, processes, presigned_url, headers, part):
+        self._put(presigned_url, headers, self._serialize_part(processes, part), len(part))
+
+    def _file_type(self):
+        return self._format.upper()
+
+    def _file_suffix(self):
+        if self._format == "parquet":
+            # parquet compresses its pages itself
+            return ".parquet"
+        return ".csv.gz" if self._compress else ".csv"
+
+    def _gen_part_filenames(self, count):
+        return [f"part-{i:05d}{self._file_suffix()}" for i in range(count)]
+
     def _gen_stage_path(self, stage_dir, stage_filename=None):
         if stage_filename is None:
-            suffix = ".csv.gz" if self._compress else ".csv"
-            stage_filename = "%s%s" % (uuid.uuid4(), suffix)
+            stage_filename = f"{uuid.uuid4()}{self._file_suffix()}"
         if stage_filename.startswith("/"):
             stage_filename = stage_filename[1:]
         # TODO: escape the stage_path if it contains special characters
         stage_path = "%s/%s" % (stage_dir, stage_filename)
         return stage_path
 
+    def _presign_stage_file(self):
+        """
+        :return: the stage path of a new file in the default stage, its
+                 presigned url and headers.
+        """
+        presigned = self.presign_pool.get() if self.presign_pool else None
+        if presigned is not None:
+            return presigned.stage_path, presigned.url, presigned.headers
+        stage_path = self._gen_stage_path(self.default_stage_dir)
+        presigned_url, headers = self._execute_presign(stage_path)
+        return stage_path, presigned_url, headers
+
     def _execute_presign(self, stage_path):
-        start_time = time.time()
-        _, row = self.client.execute("presign upload %s" % stage_path)
+        with self.connection.tracer.span("upload.presign", stage_path=stage_path):
+            _, row = self.client.execute("presign upload %s" % stage_path)
         presigned_url = row[0][2]
-        headers = json.loads(row[0][1])
-        if self._debug:
-            print(
-                "upload:_execute_presign %s: %s"
-                % (stage_path, time.time() - start_time)
-            )
+        headers = presign_headers(row[0][1], self.connection.codec)
         return presigned_url, headers
 
     def _serialize_data(self, data, compress):
-        # In Python3 csv.writer expects a file-like object opened in text mode. In Python2, csv.writer expects a file-like object opened in binary mode.
-        start_time = time.time()
+        with self.connection.tracer.span(
+            "upload.serialize", format="csv", rows=len(data)
+        ) as span:
+            output = serialize_csv(data, compress)
+            span.set_attribute("bytes", len(output))
+        return output
+
+    def _serialize_parquet(self, table):
+        with self.connection.tracer.span(
+            "upload.serialize", format="parquet", rows=len(table)
+        ) as span:
+            output = serialize_parquet(
+                table,
+                defines.DEFAULT_UPLOAD_ROW_GROUP_ROWS,
+                compression="zstd" if self._compress else "snappy",
+            )
+            span.set_attribute("bytes", len(output))
+        return output
+
+    def _serialize_data_stream(self, data, compress, stats=None):
+        """
+        Yields the CSV encoding of the rows by chunks of
+        `defines.DEFAULT_UPLOAD_CHUNK_ROWS` rows, gzip compressed on the fly
+        if `compress`, so that memory stays constant whatever the rows count.
+        :param data: list or iterator of rows.
+        :param stats: dict updated with the `rows` and `bytes` yielded so far.
+        """
+        stats = stats if stats is not None else {}
+        stats["rows"] = stats["bytes"] = 0
         buf = io.StringIO()
         csvwriter = csv.writer(buf, delimiter=",", quoting=csv.QUOTE_MINIMAL)
-        csvwriter.writerows(data)
-        output = buf.getvalue().encode("utf-8")
-        if compress:
-            buf = io.BytesIO()
-            with gzip.GzipFile(fileobj=buf, mode="wb") as gzwriter:
-                gzwriter.write(output)
-            output = buf.getvalue()
-        if self._debug:
-            print("upload:_serialize_data %s" % (time.time() - start_time))
-        return output
+        # wbits=31 writes the gzip header and trailer, as gzip.GzipFile does
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        for rows in chunks(data, defines.DEFAULT_UPLOAD_CHUNK_ROWS):
+            csvwriter.writerows(rows)
+            output = buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+            if compressor is not None:
+                output = compressor.compress(output)
+            stats["rows"] += len(rows)
+            if output:
+                stats["bytes"] += len(output)
+                yield output
+        if compressor is not None:
+            output = compressor.flush()
+            stats["bytes"] += len(output)
+            yield output
 
     def _upload_to_presigned_url(self, presigned_url, headers, data):
+        if self._stream and isinstance(data, (list, Iterator)):
+            self._upload_stream_to_presigned_url(presigned_url, headers, data)
+            return
         # Check if data is bytes or File
         if isinstance(data, (bytes, io.IOBase)):
-            data = data.read()  # Read the data from the buffer
-            buf = data
-            buf_size = len(buf)
-            data_len = 1
+            buf = data if isinstance(data, bytes) else data.read()
+            rows = None
+        elif is_arrow_table(data):
+            buf = self._serialize_parquet(data)
+            rows = len(data)
         elif isinstance(data, list):
             buf = self._serialize_data(data, self._compress)
-            buf_size = len(buf)
-            data_len = len(data)
+            rows = len(data)
         else:
-            raise Exception("data is not bytes, File, or a list: %s" % type(data))
-        start_time = time.time()
-        try:
+            raise TypeError(f"data is not bytes, File, or a list: {type(data)}")
+        self._put(presigned_url, headers, buf, rows)
+
+    def _put(self, presigned_url, headers, buf, rows=None):
+        with self.connection.tracer.span("upload.put", rows=rows, bytes=len(buf)):
             resp = requests.put(presigned_url, headers=headers, data=buf)
             resp.raise_for_status()
-        finally:
-            if self._debug:
-                print(
-                    "upload:_upload_to_presigned_url len=%d bufsize=%d %s"
-                    % (data_len, buf_size, time.time() - start_time)
+
+    def _upload_stream_to_presigned_url(self, presigned_url, headers, data):
+        # a generator body is sent with chunked transfer encoding, while the
+        # next chunks are being serialized, both within the `upload.put` span
+        stats = {}
+        with self.connection.tracer.span("upload.put", stream=True) as span:
+            try:
+                resp = requests.put(
+                    presigned_url,
+                    headers=headers,
+                    data=self._serialize_data_stream(data, self._compress, stats),
                 )
+                resp.raise_for_status()
+            finally:
+                span.set_attribute("rows", stats.get("rows", 0))
+                span.set_attribute("bytes", stats.get("bytes", 0))
+
+    def _execute_copy(self, table_name, stage_path, file_type, files=None):
+        sql = self._make_copy_statement(table_name, stage_path, file_type, files)
+        with self.connection.tracer.span(
+            "upload.copy", table=table_name, stage_path=stage_path
+        ):
+            self.client.execute(sql)
 
-    def _execute_copy(self, table_name, stage_path, file_type):
-        start_time = time.time()
-        sql = self._make_copy_statement(table_name, stage_path, file_type)
-        self.client.execute(sql)
-        if self._debug:
-            print(
-                "upload:_execute_copy table=%s %s"
-                % (table_name, time.time() - start_time)
+    @staticmethod
+    def _strip_values(sql_statement):
+        # `INSERT INTO t (a, b) VALUES` -> `INSERT INTO t (a, b)`
+        return re.sub(r"\s+values\s*$", "", sql_statement, flags=re.IGNORECASE)
+
+    def _make_load_request(self, statement, data, file_type):
+        """
+        :param statement: the insert or replace statement, without source.
+        :return: the statement reading from `@_databend_load`, the multipart
+                 body holding the serialized rows, and its content type.
+                 The body is a generator of chunks when streaming.
+        """
+        sql = (
+            f"{statement} FROM @_databend_load "
+            f"FILE_FORMAT = ({self._make_file_format(file_type)})"
+        )
+        boundary = uuid.uuid4().hex
+        head = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="upload"; '
+            f'filename="data{self._file_suffix()}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        if self._stream and isinstance(data, (list, Iterator)):
+            body = self._join_stream(
+                head, self._serialize_data_stream(data, self._compress), tail
             )
+        elif is_arrow_table(data):
+            body = head + self._serialize_parquet(data) + tail
+        elif isinstance(data, list):
+            body = head + self._serialize_data(data, self._compress) + tail
+        else:
+            raise TypeError(f"data is not a list: {type(data)}")
+        return sql, body, f"multipart/form-data; boundary={boundary}"
 
-    def _make_copy_statement(self, table_name, stage_path, file_type):
+    @staticmethod
+    def _join_stream(head, chunks, tail):
+        yield head
+        yield from chunks
+        yield tail
+
+    def _streaming_load(self, statement, data, file_type):
+        # the rows are serialized while being sent when streaming
+        with self.connection.tracer.span("upload.streaming_load", sql=statement) as span:
+            sql, body, content_type = self._make_load_request(statement, data, file_type)
+            resp_dict = self.connection.streaming_load(sql, body, content_type)
+            self._set_load_stats(span, resp_dict)
+        return resp_dict
+
+    @staticmethod
+    def _set_load_stats(span, resp_dict):
+        stats = resp_dict.get("stats") or {}
+        span.set_attribute("rows", stats.get("rows"))
+        span.set_attribute("bytes", stats.get("bytes"))
+
+    def _make_file_format(self, file_type):
+        if file_type == "PARQUET":
+            return "type = PARQUET"
+        return f"type = {file_type} RECORD_DELIMITER = '\\r\\n' COMPRESSION = AUTO"
+
+    def _make_copy_statement(self, table_name, stage_path, file_type, files=None):
         # copy options docs: https://databend.rs/doc/sql-commands/dml/dml-copy-into-table#copyoptions
         copy_options = {}
         copy_options["PURGE"] = self.settings.get("copy_purge", False)
@@ -146,28 +507,28 @@ class DataUploader:
             "size_limit", 0
         )  # TODO: is this correct to set size_limit = 100?
         copy_options["ON_ERROR"] = self.settings.get("on_error", "abort")
+        files_option = ""
+        if files:
+            files_option = "FILES = ({}) ".format(", ".join(f"'{f}'" for f in files))
         return (
-            f"COPY INTO {table_name} FROM {stage_path} "
-            f"FILE_FORMAT = (type = {file_type} RECORD_DELIMITER = '\\r\\n' COMPRESSION = AUTO) "
+            f"COPY INTO {table_name} FROM {stage_path} {files_option}"
+            f"FILE_FORMAT = ({self._make_file_format(file_type)}) "
             f"PURGE = {copy_options['PURGE']} FORCE = {copy_options['FORCE']} "
             f"SIZE_LIMIT={copy_options['SIZE_LIMIT']} ON_ERROR = {copy_options['ON_ERROR']}"
         )
 
     def _execute_with_attachment(self, sql_statement, stage_path, file_type):
-        start_time = time.time()
         data = self._make_attachment(sql_statement, stage_path, file_type)
         url = self.connection.format_url()
 
         try:
-            resp_dict = self.connection.do_query(url, data)
+            with self.connection.tracer.span(
+                "upload.attachment", sql=sql_statement, stage_path=stage_path
+            ):
+                resp_dict = self.connection.do_query(url, data)
             self.client_session = resp_dict.get(
                 "session", self.connection.default_session()
             )
-            if self._debug:
-                print(
-                    "upload:_execute_attachment sql=%s %s"
-                    % (sql_statement, time.time() - start_time)
-                )
         except Exception as e:
             log.logger.error(
                 f"http error on {url}, SQL: {sql_statement} error msg:{str(e)}"
@@ -183,8 +544,9 @@ class DataUploader:
 
         file_format_options = {}
         file_format_options["type"] = file_type
-        file_format_options["RECORD_DELIMITER"] = '\r\n'
-        file_format_options["COMPRESSION"] = "AUTO"
+        if file_type != "PARQUET":
+            file_format_options["RECORD_DELIMITER"] = '\r\n'
+            file_format_options["COMPRESSION"] = "AUTO"
 
         data = {
             "sql": sql_statement,
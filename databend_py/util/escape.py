@@ -1,8 +1,10 @@
+import functools
+import re
 from datetime import date, datetime
 from enum import Enum
 from uuid import UUID
 
-from pytz import timezone
+from ..datetypes import get_timezone
 
 escape_chars_map = {
     "\b": "\\b",
@@ -17,34 +19,45 @@ escape_chars_map = {
     "'": "\\'",
 }
 
+# the same escapes, applied by `str.translate` in C
+escape_chars_table = str.maketrans(escape_chars_map)
+
+# `%(name)s` placeholders and `%%`, other `%` formats are left to `%`
+_PLACEHOLDERS = re.compile(r"%(?:\((\w+)\)s|%)")
 
-def escape_datetime(item, context):
-    server_tz = timezone(context.server_info.timezone)
 
+def escape_datetime(item, context):
     if item.tzinfo is not None:
-        item = item.astimezone(server_tz)
+        item = item.astimezone(get_timezone(context.server_info.timezone))
 
     return "'%s'" % item.strftime("%Y-%m-%d %H:%M:%S")
 
 
+def escape_string(item):
+    return f"'{item.translate(escape_chars_table)}'"
+
+
 def escape_param(item, context):
     if item is None:
         return "NULL"
 
+    elif isinstance(item, str):
+        return escape_string(item)
+
+    elif type(item) in (int, float):
+        return item
+
     elif isinstance(item, datetime):
         return escape_datetime(item, context)
 
     elif isinstance(item, date):
         return "'%s'" % item.strftime("%Y-%m-%d")
 
-    elif isinstance(item, str):
-        return "'%s'" % "".join(escape_chars_map.get(c, c) for c in item)
-
     elif isinstance(item, list):
-        return "[%s]" % ", ".join(str(escape_param(x, context)) for x in item)
+        return "[{}]".format(", ".join([str(escape_param(x, context)) for x in item]))
 
     elif isinstance(item, tuple):
-        return "(%s)" % ", ".join(str(escape_param(x, context)) for x in item)
+        return "({})".format(", ".join([str(escape_param(x, context)) for x in item]))
 
     elif isinstance(item, Enum):
         return escape_param(item.value, context)
@@ -63,3 +76,50 @@ def escape_params(params, context):
         escaped[key] = escape_param(value, context)
 
     return escaped
+
+
+class PreparedQuery(str):
+    """
+    A query whose `%(name)s` placeholders are parsed once, so that it is
+    substituted without reformatting the whole query, see `prepare`.
+    It is the query text itself, usable wherever a query is.
+    """
+
+    def __new__(cls, query):
+        self = super().__new__(cls, query)
+        parts = _PLACEHOLDERS.split(query)
+        literals = parts[::2]
+        if any("%" in literal for literal in literals):
+            # other formats than `%(name)s`, substituted by `%`
+            self.names = None
+            self.template = None
+        else:
+            self.names = tuple(name for name in parts[1::2] if name is not None)
+            self.template = ""
+            for i, literal in enumerate(literals):
+                self.template += literal.replace("{", "{{").replace("}", "}}")
+                if i * 2 + 1 < len(parts):
+                    name = parts[i * 2 + 1]
+                    self.template += "%" if name is None else "{!s}"
+        return self
+
+    def substitute(self, params, context):
+        """
+        :param params: the values of the placeholders, in dict form.
+        :return: the query with the escaped values.
+        """
+        if self.template is None:
+            return self % escape_params(params, context)
+        return self.template.format(
+            *[escape_param(params[name], context) for name in self.names]
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def prepare(query):
+    """
+    :return: the cached `PreparedQuery` of the query.
+    """
+    if isinstance(query, PreparedQuery):
+        return query
+    return PreparedQuery(query)
@@ -25,7 +25,7 @@ setup(
     description="Python driver with native interface for Databend",
     long_description=long_description,
     url=github_url,
-    packages=find_packages(".", exclude=["tests*"]),
+    packages=find_packages(".", exclude=["tests*", "benchmarks*"]),
     python_requires=">=3.4, <4",
     install_requires=[
         "pytz",
@@ -33,6 +33,18 @@ setup(
         "requests",
         "databend-driver>=0.11.3",
     ],
+    entry_points={
+        "console_scripts": ["databend-py-bench=databend_py.bench:main"],
+    },
+    extras_require={
+        "numpy": ["numpy"],
+        "pandas": ["numpy", "pandas"],
+        "arrow": ["pyarrow"],
+        "async": ["aiohttp"],
+        "orjson": ["orjson"],
+        "ujson": ["ujson"],
+        "opentelemetry": ["opentelemetry-api"],
+    },
     author="Databend Cloud Team",
     author_email="hantmac@outlook.com",
     license="Apache License",
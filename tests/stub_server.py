@@ -0,0 +1,109 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubRequest:
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def json_response(data, status=200):
+    return status, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+
+def query_page(rows, next_uri=None, schema=None, query_id="q1", session=None):
+    """
+    :return: the response of a query or of a result page, with a single
+             `n UInt64` column unless `schema` is given.
+    """
+    return json_response(
+        {
+            "id": query_id,
+            "session": session if session is not None else {"database": "default"},
+            "schema": schema if schema is not None else [{"name": "n", "type": "UInt64"}],
+            "data": rows,
+            "error": None,
+            "next_uri": next_uri,
+        }
+    )
+
+
+class StubServer:
+    """
+    In-process http server for offline tests, every request is recorded and
+    answered by `handler(request) -> (status, headers, body)`.
+    Requests are not recorded when `record` is false, e.g. for benchmarks.
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url)
+    """
+
+    def __init__(self, handler, record=True):
+        self.handler = handler
+        self.record = record
+        self.requests = []
+        stub = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _read_chunked(self):
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return b"".join(chunks)
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+
+            def _handle(self):
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    body = self._read_chunked()
+                else:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    body = self.rfile.read(length) if length else b""
+                request = StubRequest(self.command, self.path, dict(self.headers), body)
+                if stub.record:
+                    stub.requests.append(request)
+                status, headers, content = stub.handler(request)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = _handle
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://root:@127.0.0.1:{self.port}/default"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
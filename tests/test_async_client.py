@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import unittest
+
+from tests.stub_server import StubServer, json_response, query_page
+
+try:
+    import aiohttp  # noqa: F401
+
+    from databend_py.async_client import AsyncClient
+except ImportError:
+    AsyncClient = None
+
+
+@unittest.skipIf(AsyncClient is None, "aiohttp is not installed")
+class AsyncClientTestCase(unittest.TestCase):
+    def handler(self, request):
+        if request.path == "/v1/streaming_load":
+            self.loads.append(request)
+            return json_response({"id": "q1", "stats": {"rows": 2, "bytes": 10}})
+        if request.method == "PUT":
+            self.uploads.append(request.body)
+            return 200, {}, b""
+        if request.method == "GET":
+            query_id, n = request.path.split("/")[3], int(request.path.split("/")[5])
+            next_uri = f"/v1/query/{query_id}/page/{n + 1}" if n < 2 else None
+            return query_page(
+                [[str(n * 10 + i)] for i in range(10)], next_uri, query_id=query_id
+            )
+
+        body = request.json()
+        sql = body["sql"]
+        query_id = request.headers["X-DATABEND-QUERY-ID"]
+        if sql.startswith("presign upload"):
+            self.presigned.append(sql)
+            schema = [
+                {"name": "method", "type": "String"},
+                {"name": "headers", "type": "Variant"},
+                {"name": "url", "type": "String"},
+            ]
+            url = f"http://127.0.0.1:{self.server.port}/stage"
+            return query_page([["PUT", "{}", url]], None, schema, query_id=query_id)
+        if "stage_attachment" in body:
+            self.attachments.append(body)
+            self.attachment_query_ids.append(query_id)
+            return query_page([], None, [], query_id=query_id)
+        return query_page([["0"]], f"/v1/query/{query_id}/page/1", query_id=query_id)
+
+    def run_client(self, coroutine_fn, url_params=""):
+        self.uploads = []
+        self.loads = []
+        self.presigned = []
+        self.attachments = []
+        self.attachment_query_ids = []
+
+        async def run():
+            async with AsyncClient.from_url(self.server.url + url_params) as client:
+                return await coroutine_fn(client)
+
+        with StubServer(self.handler) as self.server:
+            return asyncio.run(run())
+
+    def test_execute(self):
+        async def run(client):
+            return await client.execute("SELECT", with_column_types=True)
+
+        columns, rows = self.run_client(run)
+        self.assertEqual(columns, [("n", "UInt64")])
+        self.assertEqual(rows, [(0,)] + [(i,) for i in range(10, 30)])
+        page_requests = [r for r in self.server.requests if r.method == "GET"]
+        self.assertEqual(len(page_requests), 2)
+        for request in page_requests:
+            self.assertIn(request.headers["X-DATABEND-QUERY-ID"], request.path)
+
+    def test_execute_iter(self):
+        async def run(client):
+            return [row async for row in client.execute_iter("SELECT")]
+
+        self.assertEqual(len(self.run_client(run)), 21)
+
+    def test_execute_iter_break(self):
+        async def run(client):
+            rows = client.execute_iter("SELECT")
+            async for row in rows:
+                if row == (10,):
+                    break
+            await rows.aclose()
+            # the prefetch task is stopped without waiting for the GC
+            current = asyncio.current_task()
+            return [t for t in asyncio.all_tasks() if t is not current and not t.done()]
+
+        self.assertEqual(self.run_client(run, "?prefetch_pages=1"), [])
+
+    def test_concurrent_queries(self):
+        async def run(client):
+            return await asyncio.gather(*[client.execute("SELECT") for _ in range(50)])
+
+        results = self.run_client(run)
+        self.assertEqual(len(results), 50)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    def test_insert(self):
+        async def run(client):
+            return await client.execute(
+                "INSERT INTO test (x,y) VALUES", [(1, "a"), (2, "b")]
+            )
+
+        _, inserted = self.run_client(run)
+        self.assertEqual(inserted, 2)
+        self.assertEqual(len(self.presigned), 1)
+        self.assertEqual(self.uploads, [b"1,a\r\n2,b\r\n"])
+        self.assertEqual(self.attachments[0]["sql"], "INSERT INTO test (x,y) VALUES")
+
+    def test_insert_off_the_loop(self):
+        threads = []
+
+        async def run(client):
+            serialize_data = client._uploader._serialize_data
+
+            def spy(*args):
+                threads.append(threading.current_thread())
+                return serialize_data(*args)
+
+            client._uploader._serialize_data = spy
+            await client.execute("INSERT INTO test (x,y) VALUES", [(1, "a")])
+            await client.execute("INSERT INTO test (x,y) VALUES", [(2, "b")])
+
+        self.run_client(run)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+        self.assertEqual(self.uploads, [b"1,a\r\n", b"2,b\r\n"])
+        # each attachment is a query of its own
+        query_ids = self.attachment_query_ids
+        self.assertEqual(len(set(query_ids)), 2)
+
+    def test_executemany(self):
+        async def run(client):
+            inserted = await client.executemany(
+                "INSERT INTO test (x,y) VALUES (%(x)s, %(y)s)",
+                [{"x": 1, "y": "a"}, {"y": "b", "x": 2}],
+            )
+            executed = await client.executemany(
+                "DELETE FROM test WHERE x = %(x)s", [{"x": 1}, {"x": 2}]
+            )
+            return inserted, executed
+
+        self.assertEqual(self.run_client(run), (2, 2))
+        self.assertEqual(self.uploads, [b"1,a\r\n2,b\r\n"])
+        self.assertEqual(
+            [r.json()["sql"] for r in self.server.requests if r.method == "POST"][-2:],
+            ["DELETE FROM test WHERE x = 1", "DELETE FROM test WHERE x = 2"],
+        )
+
+    def test_streaming_load(self):
+        async def run(client):
+            await client.insert("db", "t", [(1, "a"), (2, "b")])
+            return await client.execute(
+                "INSERT INTO test (x,y) VALUES", [(1, "a"), (2, "b")]
+            )
+
+        _, inserted = self.run_client(run, "?load_method=streaming_load&stream_upload=1")
+        self.assertEqual(inserted, 2)
+        self.assertEqual(self.presigned + self.uploads + self.attachments, [])
+        self.assertEqual(
+            [r.headers["X-DATABEND-SQL"].split(" FROM ")[0] for r in self.loads],
+            ["INSERT INTO db.t", "INSERT INTO test (x,y)"],
+        )
+        self.assertIn(b"\r\n\r\n1,a\r\n2,b\r\n\r\n--", self.loads[1].body)
+
+    def test_upload_to_stage(self):
+        async def run(client):
+            return await client.upload_to_stage("@~", "upload.csv", b"1,a\r\n")
+
+        self.assertEqual(self.run_client(run), "@~/upload.csv")
+        self.assertEqual(self.uploads, [b"1,a\r\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
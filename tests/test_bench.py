@@ -0,0 +1,70 @@
+import contextlib
+import io
+import json
+import unittest
+
+from benchmarks import load
+from databend_py import bench
+
+
+class BenchTestCase(unittest.TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(
+            bench.parse_mix("execute=2, insert"), ["execute", "execute", "insert"]
+        )
+        with self.assertRaises(ValueError):
+            bench.parse_mix("execute=1,drop=1")
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(bench.percentile(values, 50), 50)
+        self.assertEqual(bench.percentile(values, 99), 99)
+        self.assertEqual(bench.percentile([3], 95), 3)
+        self.assertEqual(bench.percentile([], 95), 0.0)
+
+    def test_run(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = load.main(
+                [
+                    "--threads=2",
+                    "--iterations=4",
+                    "--batch-rows=100",
+                    "--mix=execute,execute_iter,insert,upload_to_stage",
+                    "--json",
+                ]
+            )
+        self.assertEqual(status, 0)
+        report = json.loads(output.getvalue())
+        operations = report["operations"]
+        self.assertEqual(
+            sorted(operations), ["execute", "execute_iter", "insert", "upload_to_stage"]
+        )
+        for stats in operations.values():
+            self.assertEqual((stats["count"], stats["errors"]), (2, 0))
+            self.assertGreater(stats["bytes"], 0)
+            self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+        # the fake server answers 1000 rows, inserts send 100 rows
+        self.assertEqual(operations["execute"]["rows"], 2000)
+        self.assertEqual(operations["insert"]["rows"], 200)
+        self.assertEqual(report["phases"]["upload.put"]["count"], 4)
+        self.assertEqual(report["phases"]["upload.copy"]["count"], 2)
+
+    def test_errors(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), self.assertLogs(
+            "databend_py.log", "WARNING"
+        ) as logs:
+            status = bench.main(
+                ["http://root:@127.0.0.1:1/default", "--iterations=1"]
+            )
+        self.assertEqual(status, 1)
+        self.assertRegex(output.getvalue(), r"execute\s+0\s+1\s")
+        self.assertIn("execute failed with ConnectionError: 1", output.getvalue())
+        self.assertTrue(
+            any("bench execute failed: ConnectionError" in o for o in logs.output)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
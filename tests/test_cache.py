@@ -0,0 +1,162 @@
+import time
+import unittest
+
+from databend_py import Client, ClientPool
+from databend_py.cache import ResultCache, is_read_only, normalize_sql
+from tests.stub_server import StubServer, query_page
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("  SELECT a,\n\t b FROM  t WHERE s = 'x  y'  "),
+            "SELECT a, b FROM t WHERE s = 'x  y'",
+        )
+        self.assertEqual(
+            normalize_sql("SELECT 'it\\'s  '  ,  1"), "SELECT 'it\\'s  ' , 1"
+        )
+
+    def test_is_read_only(self):
+        read_only = [
+            "select 1",
+            " (SELECT 1)",
+            "-- dashboard\nSELECT 1",
+            "/* x */ WITH a AS (SELECT 1) SELECT * FROM a",
+            "SHOW TABLES",
+            "desc t",
+        ]
+        for sql in read_only:
+            self.assertTrue(is_read_only(sql), sql)
+        writes = [
+            "INSERT INTO t SELECT 1",
+            "DELETE FROM t",
+            "CREATE TABLE t (a INT)",
+            "BEGIN",
+            "",
+            "presign upload @~/a",
+        ]
+        for sql in writes:
+            self.assertFalse(is_read_only(sql), sql)
+
+    def test_lru(self):
+        rows = [(i, "x" * 100) for i in range(10)]
+        cache = ResultCache(ttl=60, max_bytes=1)
+        cache.put("a", [], rows)
+        self.assertIsNone(cache.get("a"))
+        cache = ResultCache(ttl=60, max_bytes=10000)
+        for key in "abc":
+            cache.put(key, [("n", "UInt64")], rows)
+        cache.get("a")
+        cache.put("d", [], rows)
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 10000)
+        self.assertGreater(stats["evictions"], 0)
+        # b was the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("d"))
+
+    def test_ttl(self):
+        cache = ResultCache(ttl=0.05, max_bytes=10000)
+        cache.put("a", [], [(1,)])
+        self.assertEqual(cache.get("a"), ([], [(1,)]))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class ClientResultCacheTestCase(unittest.TestCase):
+    def handler(self, request):
+        body = request.json()
+        self.queries.append(body["sql"])
+        session = {"database": body["session"]["database"]}
+        if body["sql"] == "BEGIN" or self.in_txn and body["sql"] != "COMMIT":
+            self.in_txn = True
+            session["txn_state"] = "Active"
+        else:
+            self.in_txn = False
+        return query_page([[str(len(self.queries))]], session=session)
+
+    def setUp(self):
+        self.queries = []
+        self.in_txn = False
+
+    def test_cache(self):
+        with StubServer(self.handler) as server:
+            client = Client.from_url(server.url + "?result_cache_ttl=60")
+            _, first = client.execute("SELECT n FROM t WHERE a = %(a)s", {"a": 1})
+            _, rows = client.execute("SELECT n  FROM t\nWHERE a = 1")
+            self.assertEqual(rows, first)
+            columns, rows = client.execute(
+                "SELECT n FROM t WHERE a = 1", with_column_types=True
+            )
+            self.assertEqual((columns, rows), ([("n", "UInt64")], first))
+            rows.append("mutated")
+            self.assertEqual(client.execute("SELECT n FROM t WHERE a = 1")[1], first)
+            self.assertEqual(len(self.queries), 1)
+
+            # other params, other database
+            client.execute("SELECT n FROM t WHERE a = %(a)s", {"a": 2})
+            client.connection.client_session = {"database": "other"}
+            client.execute("SELECT n FROM t WHERE a = 1")
+            self.assertEqual(len(self.queries), 3)
+            stats = client.result_cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"]), (3, 3))
+            self.assertEqual(stats["entries"], 3)
+
+            # writes clear the cache
+            client.execute("DELETE FROM t")
+            self.assertEqual(client.result_cache.stats()["entries"], 0)
+
+    def test_lazy_rows(self):
+        with StubServer(self.handler) as server:
+            client = Client.from_url(server.url + "?result_cache_ttl=60&lazy_rows=true")
+            _, first = client.execute("SELECT n FROM t")
+            # not converted to estimate the size of the cached result
+            self.assertIsNone(first[0]._cells)
+            _, rows = client.execute("SELECT n FROM t")
+        self.assertEqual(rows, [(1,)])
+        self.assertEqual(rows[0].n, 1)
+        self.assertEqual(len(self.queries), 1)
+
+    def test_bypass_in_transaction(self):
+        with StubServer(self.handler) as server:
+            client = Client.from_url(server.url + "?result_cache_ttl=60")
+            client.begin()
+            client.execute("SELECT 1")
+            client.execute("SELECT 1")
+            client.commit()
+            client.execute("SELECT 1")
+            client.execute("SELECT 1")
+        self.assertEqual(
+            self.queries, ["BEGIN", "SELECT 1", "SELECT 1", "COMMIT", "SELECT 1"]
+        )
+
+    def test_shared_by_pool(self):
+        with StubServer(self.handler) as server:
+            pool = ClientPool.from_url(
+                server.url + "?result_cache_ttl=60", min_size=0, max_size=2
+            )
+            a = pool.checkout()
+            b = pool.checkout()
+            self.assertIs(a.result_cache, b.result_cache)
+            a.execute("SELECT 1")
+            b.execute("SELECT 1")
+            self.assertEqual(len(self.queries), 1)
+            b.execute("DELETE FROM t")
+            a.execute("SELECT 1")
+            self.assertEqual(len(self.queries), 3)
+            pool.checkin(a)
+            pool.checkin(b)
+            pool.close()
+
+    def test_disabled(self):
+        with StubServer(self.handler) as server:
+            client = Client.from_url(server.url)
+            self.assertIsNone(client.result_cache)
+            client.execute("SELECT 1")
+            client.execute("SELECT 1")
+        self.assertEqual(len(self.queries), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -159,6 +159,46 @@ class DatabendPyTestCase(unittest.TestCase):
         print(result_list)
         self.assertEqual(result_list, [(1, 2, 3), (1, 2, 3), (1, 2, 3)])
 
+    def test_iter_query_over_paging(self):
+        client = Client.from_url(self.databend_url)
+        result = client.execute_iter("SELECT * FROM numbers(100001)")
+        self.assertEqual(next(result), (0,))
+        count = 1
+        for _ in result:
+            count += 1
+        self.assertEqual(count, 100001)
+
+    def test_select_with_prefetch(self):
+        if "?" in self.databend_url:
+            url_with_prefetch = f"{self.databend_url}&prefetch_pages=2"
+        else:
+            url_with_prefetch = f"{self.databend_url}?prefetch_pages=2"
+        client = Client.from_url(url_with_prefetch)
+        _, data = client.execute("SELECT * FROM numbers(100001)")
+        self.assertEqual(len(data), 100001)
+        result = client.execute_iter("SELECT * FROM numbers(100001)")
+        self.assertEqual(next(result), (0,))
+        result.close()
+
+    def test_execute_columnar(self):
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            self.skipTest("pandas is not installed")
+        client = Client.from_url(self.databend_url)
+        columns, data = client.execute_columnar(
+            "SELECT number, number % 2 = 0 AS even, if(number = 1, NULL, number::Float64) AS f "
+            "FROM numbers(10001)",
+            with_column_types=True,
+        )
+        self.assertEqual(columns[0], ("number", "UInt64"))
+        self.assertEqual(data["number"].dtype.name, "uint64")
+        self.assertEqual(int(data["number"].sum()), 50005000)
+        self.assertEqual(data["even"].dtype.name, "bool")
+        self.assertTrue(data["f"].mask[1])
+        df = client.query_df("SELECT number FROM numbers(3)")
+        self.assertEqual(df["number"].tolist(), [0, 1, 2])
+
     def test_insert(self):
         client = Client.from_url(self.databend_url)
         client.execute("DROP TABLE IF EXISTS test_upload")
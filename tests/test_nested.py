@@ -0,0 +1,119 @@
+import ast
+import unittest
+
+from databend_py.codec import JsonCodec
+from databend_py.datetypes import DatabendDataType
+from databend_py.nested import compile_decoder, parse_type, parse_value
+from databend_py.presign import presign_headers
+from databend_py.result import QueryResult
+
+
+class NestedDecodeTestCase(unittest.TestCase):
+    def test_parse_type(self):
+        self.assertEqual(
+            parse_type("Nullable(Array(Tuple(a Int32, b Nullable(Decimal(10, 2)))))"),
+            (
+                "Nullable",
+                (("Array", (("Tuple", (("Int32", ()), ("Nullable", (("Decimal", ()),)))),)),),
+            ),
+        )
+        self.assertEqual(QueryResult.extract_type("Nullable(Array(Int32))"), "Array")
+        self.assertEqual(QueryResult.extract_type("Nullable(Decimal(10, 2))"), "Decimal")
+        self.assertEqual(QueryResult.extract_type("Nullable(Int32)"), "Int32")
+        self.assertEqual(QueryResult.extract_type("Timestamp"), "Timestamp")
+
+    def test_arrays(self):
+        decode = compile_decoder("Array(Nullable(Int32))")
+        self.assertEqual(decode("[1,NULL,-3]"), [1, None, -3])
+        self.assertEqual(decode("[]"), [])
+        self.assertEqual(compile_decoder("Array(Float64)")("[1.5, 2]"), [1.5, 2.0])
+        decode = compile_decoder("Nullable(Array(Nullable(String)))")
+        self.assertEqual(
+            decode(r"['a','it\'s',NULL,'x,y]','\\',' NULL']"),
+            ["a", "it's", None, "x,y]", "\\", " NULL"],
+        )
+        self.assertEqual(
+            compile_decoder("Array(Array(Boolean))")("[[true,false],[]]"),
+            [[True, False], []],
+        )
+        self.assertIsNone(compile_decoder("Int32"))
+
+    def test_map_and_tuple(self):
+        decode = compile_decoder("Map(String, Array(Int64))")
+        self.assertEqual(decode("{'a':[1,2],'b':[]}"), {"a": [1, 2], "b": []})
+        self.assertEqual(decode("{}"), {})
+        decode = compile_decoder("Tuple(a Int32, b Nullable(String), c Decimal(10, 2))")
+        self.assertEqual(decode("(1,NULL,1.50)"), (1, None, "1.50"))
+        decode = compile_decoder("Array(Variant)", decode_variant=True)
+        self.assertEqual(
+            decode('[{"a":true,"b":null},[1,2.5]]'),
+            [{"a": True, "b": None}, [1, 2.5]],
+        )
+        with self.assertRaises(ValueError):
+            compile_decoder("Array(Int32)")("[1,2")
+        with self.assertRaises(ValueError):
+            compile_decoder("Map(String, Int32)")("{'a' 1}")
+
+    def test_variant(self):
+        page = {
+            "schema": [
+                {"name": "v", "type": "Nullable(Variant)"},
+                {"name": "m", "type": "Map(String, Variant)"},
+                {"name": "a", "type": "Array(Variant)"},
+            ],
+            "data": [
+                ['{"a":[true,null]}', """{'k':'{"x":1}','s':'"y"'}""", "['1','[2]']"],
+                ["NULL", "{}", "[]"],
+                ["null", "{'t':'text'}", '[{"b":false}]'],
+            ],
+        }
+        _, rows = QueryResult(iter(()), page, null_to_none=True).get_result()
+        # the JSON text by default
+        self.assertEqual(
+            [row[:2] for row in rows],
+            [
+                ('{"a":[true,null]}', {"k": '{"x":1}', "s": '"y"'}),
+                (None, {}),
+                ("null", {"t": "text"}),
+            ],
+        )
+        _, rows = QueryResult(
+            iter(()), page, null_to_none=True, decode_variant=True
+        ).get_result()
+        self.assertEqual(
+            rows,
+            [
+                ({"a": [True, None]}, {"k": {"x": 1}, "s": "y"}, [1, [2]]),
+                (None, {}, []),
+                (None, {"t": "text"}, [{"b": False}]),
+            ],
+        )
+        self.assertEqual(presign_headers('{"h":"v"}', JsonCodec), {"h": "v"})
+        self.assertEqual(presign_headers({"h": "v"}, JsonCodec), {"h": "v"})
+
+    def test_untyped(self):
+        for text in ("[1,'a',2.5]", "{'k':[1,2]}", "[]"):
+            self.assertEqual(parse_value(text), ast.literal_eval(text))
+        self.assertEqual(parse_value("[NULL,true,false]"), [None, True, False])
+        self.assertEqual(
+            DatabendDataType.type_convert_fn("JSON")('{"a":[true,null]}'),
+            {"a": [True, None]},
+        )
+
+    def test_query_result(self):
+        page = {
+            "schema": [
+                {"name": "a", "type": "Array(String)"},
+                {"name": "m", "type": "Nullable(Map(String, Int32))"},
+                {"name": "t", "type": "Tuple(Int32, String)"},
+            ],
+            "data": [["['x','y']", "{'k':1}", "(1,'z')"], ["[]", "NULL", "(2,'')"]],
+        }
+        _, rows = QueryResult(iter(()), page, null_to_none=True).get_result()
+        self.assertEqual(
+            rows, [(["x", "y"], {"k": 1}, (1, "z")), ([], None, (2, ""))]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import unittest
+
+from databend_py import Client
+from databend_py.codec import CODECS
+from databend_py.page_format import (
+    ARROW_CONTENT_TYPE,
+    ARROW_RESPONSE_METADATA_KEY,
+    ARROW_TYPE_METADATA_KEY,
+    JsonPageFormat,
+    PageFormat,
+    get_page_format,
+)
+from tests.stub_server import StubServer, query_page
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def arrow_page(rows_a, rows_b, next_uri):
+    schema = pa.schema(
+        [
+            pa.field("a", pa.int64(), metadata={ARROW_TYPE_METADATA_KEY: "Int64"}),
+            pa.field(
+                "b",
+                pa.string(),
+                metadata={ARROW_TYPE_METADATA_KEY: "Nullable(String)"},
+            ),
+        ],
+        metadata={
+            ARROW_RESPONSE_METADATA_KEY: json.dumps(
+                {
+                    "id": "q1",
+                    "session": {"database": "default"},
+                    "error": None,
+                    "next_uri": next_uri,
+                }
+            )
+        },
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(pa.table([rows_a, rows_b], schema=schema))
+    return 200, {"Content-Type": ARROW_CONTENT_TYPE}, sink.getvalue().to_pybytes()
+
+
+def json_page(rows, next_uri):
+    schema = [{"name": "a", "type": "Int64"}, {"name": "b", "type": "Nullable(String)"}]
+    return query_page(rows, next_uri, schema)
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class ArrowPageFormatTestCase(unittest.TestCase):
+    def arrow_handler(self, request):
+        if request.method == "POST":
+            return arrow_page([1, 2], ["x", None], "/v1/query/q1/page/1")
+        return arrow_page([3], ["z"], None)
+
+    def test_rows(self):
+        with StubServer(self.arrow_handler) as server:
+            client = Client.from_url(server.url + "?page_format=arrow")
+            columns, data = client.execute("SELECT", with_column_types=True)
+            self.assertEqual(columns, [("a", "Int64"), ("b", "String")])
+            self.assertEqual(data, [(1, "x"), (2, "NULL"), (3, "z")])
+            self.assertEqual(list(client.execute_iter("SELECT")), data)
+
+            post = server.requests[0]
+            self.assertTrue(post.headers["Accept"].startswith(ARROW_CONTENT_TYPE))
+            self.assertTrue(post.json()["string_fields"])
+            self.assertTrue(
+                server.requests[1].headers["Accept"].startswith(ARROW_CONTENT_TYPE)
+            )
+
+    def test_columnar(self):
+        with StubServer(self.arrow_handler) as server:
+            client = Client.from_url(server.url + "?page_format=arrow")
+            _, data = client.execute_columnar("SELECT")
+            self.assertEqual(data["a"].dtype.name, "int64")
+            self.assertEqual(data["a"].tolist(), [1, 2, 3])
+            self.assertEqual(data["b"].mask.tolist(), [False, True, False])
+
+    def test_json_fallback(self):
+        def handler(request):
+            if request.method == "POST":
+                return json_page([["1", "x"], ["2", "NULL"]], "/v1/query/q1/page/1")
+            return json_page([["3", "z"]], None)
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + "?page_format=arrow")
+            _, data = client.execute("SELECT")
+            self.assertEqual(data, [(1, "x"), (2, "NULL"), (3, "z")])
+            self.assertTrue(server.requests[0].json()["string_fields"])
+
+
+class JsonPageFormatTestCase(unittest.TestCase):
+    def test_default(self):
+        def handler(request):
+            return json_page([["1", "x"]], None)
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url)
+            self.assertIsInstance(client.connection.page_format, JsonPageFormat)
+            _, data = client.execute("SELECT")
+            self.assertEqual(data, [(1, "x")])
+            post = server.requests[0]
+            self.assertEqual(post.headers["Accept"], "application/json")
+            self.assertTrue(post.json()["string_fields"])
+
+    def test_json_codec(self):
+        def handler(request):
+            return json_page([["1", "ó"]], None)
+
+        for codec in CODECS:
+            with StubServer(handler) as server:
+                client = Client.from_url(server.url + "?json_codec=" + codec)
+                self.assertEqual(client.connection.codec.name, codec)
+                self.assertIs(client.connection.page_format.codec, client.connection.codec)
+                _, data = client.execute("SELECT 'ó'")
+                self.assertEqual(data, [(1, "ó")])
+                self.assertEqual(server.requests[0].json()["sql"], "SELECT 'ó'")
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_page_format("xml")
+        # formats implement decode
+        self.assertRaises(TypeError, PageFormat)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import time
+import unittest
+
+from databend_py import Client
+from databend_py.pagination import Pagination, PollBackoff
+from tests.stub_server import StubServer, query_page
+
+
+class PaginationTestCase(unittest.TestCase):
+    def paging_handler(self, request):
+        # 4 pages of max_rows_per_page rows
+        if request.method == "POST":
+            self.page_size = request.json()["pagination"]["max_rows_per_page"]
+            n = 0
+        else:
+            n = int(request.path.rsplit("/", 1)[1])
+        next_uri = f"/v1/query/q1/page/{n + 1}" if n < 3 else None
+        return query_page([[str(n)]] * self.page_size, next_uri)
+
+    def test_request_options(self):
+        with StubServer(self.paging_handler) as server:
+            client = Client.from_url(
+                server.url + "?max_rows_per_page=5&wait_time_secs=3"
+            )
+            _, rows = client.execute("SELECT")
+            self.assertEqual(len(rows), 20)
+            _, rows = client.execute("SELECT", settings={"max_rows_per_page": 2})
+            self.assertEqual(len(rows), 8)
+            self.assertEqual(len(list(client.execute_iter("SELECT"))), 20)
+
+        posts = [r.json() for r in server.requests if r.method == "POST"]
+        self.assertEqual(
+            [p["pagination"] for p in posts],
+            [
+                {"wait_time_secs": 3, "max_rows_per_page": 5},
+                {"wait_time_secs": 3, "max_rows_per_page": 2},
+                {"wait_time_secs": 3, "max_rows_per_page": 5},
+            ],
+        )
+
+    def test_server_defaults(self):
+        with StubServer(lambda request: query_page([["1"]], None)) as server:
+            Client.from_url(server.url).execute("SELECT")
+        self.assertNotIn("pagination", server.requests[0].json())
+
+    def test_adaptive(self):
+        with StubServer(self.paging_handler) as server:
+            client = Client.from_url(
+                server.url
+                + "?adaptive_pagination=true&max_rows_per_page=100"
+                + "&adaptive_max_rows_per_page=300"
+            )
+            client.execute("SELECT")
+            client.execute("SELECT", settings={"max_rows_per_page": 10})
+            client.execute("SELECT")
+            client.execute("SELECT")
+
+        posts = [r.json() for r in server.requests if r.method == "POST"]
+        self.assertEqual(
+            [p["pagination"]["max_rows_per_page"] for p in posts], [100, 10, 200, 300]
+        )
+
+    def test_adaptive_small_results(self):
+        pagination = Pagination(adaptive=True)
+        pagination.observe([10, 0])
+        pagination.observe([pagination.max_rows_per_page, 5])
+        self.assertEqual(pagination.max_rows_per_page, 10000)
+
+    def test_poll_backoff(self):
+        running = {"polls": 0}
+
+        def handler(request):
+            # the query runs for 5 polls, answered right away
+            if request.method == "POST":
+                return query_page([], "/v1/query/q1/page/0", [])
+            running["polls"] += 1
+            if running["polls"] < 5:
+                return query_page([], "/v1/query/q1/page/0", [])
+            return query_page([["1"]], None)
+
+        with StubServer(handler) as server:
+            start_time = time.monotonic()
+            _, rows = Client.from_url(server.url).execute("SELECT")
+            elapsed = time.monotonic() - start_time
+        self.assertEqual(rows, [(1,)])
+        # 0.05 + 0.1 + 0.2 + 0.4 between the polls, instead of spinning
+        self.assertGreater(elapsed, 0.7)
+
+    def test_poll_backoff_delays(self):
+        backoff = PollBackoff(initial=0.1, maximum=0.4)
+        running = {"data": [], "next_uri": "/v1/query/q1/page/1"}
+        self.assertEqual(backoff.observe(running, 0), 0.1)
+        self.assertAlmostEqual(backoff.observe(running, 0.05), 0.15)
+        self.assertEqual(backoff.observe(running, 0), 0.4)
+        # the server held the poll long enough
+        self.assertEqual(backoff.observe(running, 1), 0)
+        self.assertEqual(backoff.observe({"data": [["1"]], "next_uri": None}, 0), 0)
+        self.assertEqual(backoff.observe(running, 0), 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
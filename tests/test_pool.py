@@ -0,0 +1,111 @@
+import threading
+import time
+import unittest
+
+from databend_py import Client, ClientPool
+from databend_py.errors import PoolTimeoutException, ServerException
+
+
+class StubClient(Client):
+    def __init__(self):
+        super().__init__("localhost")
+        self.queries = []
+        self.healthy = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+    def execute(self, query, *args, **kwargs):
+        if not self.healthy:
+            raise ConnectionError("connection reset")
+        self.queries.append(query)
+        return [], [(1,)]
+
+
+class ClientPoolTestCase(unittest.TestCase):
+    def test_checkout_checkin(self):
+        pool = ClientPool(StubClient, min_size=1, max_size=2)
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+        a = pool.checkout()
+        b = pool.checkout()
+        self.assertIsNot(a, b)
+        self.assertIsNot(a.connection, b.connection)
+        with self.assertRaises(PoolTimeoutException):
+            pool.checkout(timeout=0.05)
+        pool.checkin(b)
+        self.assertIs(pool.checkout(), b)
+
+    def test_threads(self):
+        pool = ClientPool(StubClient, min_size=0, max_size=3)
+        in_use = set()
+        overlaps = []
+
+        def work():
+            for _ in range(20):
+                with pool.client() as client:
+                    overlaps.append(client in in_use)
+                    in_use.add(client)
+                    time.sleep(0.001)
+                    in_use.discard(client)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(any(overlaps))
+        self.assertEqual(len(overlaps), 160)
+        self.assertLessEqual(pool.size, 3)
+
+    def test_discard_on_error(self):
+        pool = ClientPool(StubClient, min_size=0, max_size=1)
+        with self.assertRaises(ServerException), pool.client():
+            raise ServerException("syntax error", 1005)
+        self.assertEqual(pool.idle, 1)
+        with self.assertRaises(ConnectionError), pool.client() as client:
+            raise ConnectionError()
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+        self.assertTrue(client.closed)
+
+    def test_rollback_on_checkin(self):
+        pool = ClientPool(StubClient, min_size=0, max_size=1)
+        client = pool.checkout()
+        client.connection.client_session = {"txn_state": "Active"}
+        pool.checkin(client)
+        self.assertEqual(client.queries, ["ROLLBACK"])
+
+    def test_idle_eviction_and_health_check(self):
+        pool = ClientPool(
+            StubClient, min_size=1, max_size=3, max_idle_time=0.05,
+            health_check_interval=0.05,
+        )
+        clients = [pool.checkout() for _ in range(3)]
+        for client in clients:
+            pool.checkin(client)
+        time.sleep(0.1)
+        pool.evict_idle()
+        self.assertEqual(pool.size, 1)
+
+        time.sleep(0.1)
+        survivor = pool._idle[-1][0]
+        survivor.healthy = False
+        client = pool.checkout()
+        self.assertIsNot(client, survivor)
+        self.assertEqual(pool.size, 1)
+
+    def test_close(self):
+        pool = ClientPool(StubClient, min_size=2, max_size=2)
+        client = pool.checkout()
+        pool.close()
+        self.assertEqual(pool.size, 1)
+        pool.checkin(client)
+        self.assertEqual(pool.size, 0)
+        self.assertTrue(client.closed)
+        with self.assertRaises(PoolTimeoutException):
+            pool.checkout()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import datetime
+import enum
+import unittest
+
+from databend_py import Client
+from databend_py.context import Context
+from databend_py.util.escape import PreparedQuery, escape_params, prepare
+from tests.test_uploader import StubStage
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+class PrepareTestCase(unittest.TestCase):
+    def test_substitute(self):
+        query = (
+            "SELECT * FROM t WHERE a = %(a)s AND b = %(b)s AND c LIKE 'x%%' "
+            "AND d = '{x}' AND e IN %(e)s AND f = %(a)s"
+        )
+        params = {
+            "a": 1,
+            "b": "it's\n\\",
+            "e": (2.5, None, Color.RED, datetime.date(2024, 1, 2)),
+            "unused": "x",
+        }
+        prepared = prepare(query)
+        self.assertIsInstance(prepared, PreparedQuery)
+        self.assertIs(prepare(query), prepared)
+        self.assertEqual(prepared, query)
+        self.assertEqual(prepared.names, ("a", "b", "e", "a"))
+        self.assertEqual(
+            prepared.substitute(params, Context()),
+            query % escape_params(params, Context()),
+        )
+        self.assertEqual(
+            prepared.substitute(params, Context()),
+            "SELECT * FROM t WHERE a = 1 AND b = 'it\\'s\\n\\\\' AND c LIKE 'x%' "
+            "AND d = '{x}' AND e IN (2.5, NULL, 'red', '2024-01-02') AND f = 1",
+        )
+        with self.assertRaises(KeyError):
+            prepared.substitute({"a": 1}, Context())
+
+    def test_other_formats(self):
+        prepared = prepare("SELECT %(a)d, %(b)s")
+        self.assertIsNone(prepared.template)
+        self.assertEqual(
+            prepared.substitute({"a": 1, "b": "x"}, Context()), "SELECT 1, 'x'"
+        )
+
+    def test_executemany(self):
+        with StubStage() as stage:
+            client = Client.from_url(stage.server.url)
+            query = client.prepare("UPDATE t SET a = %(a)s WHERE b = %(b)s")
+            count = client.executemany(query, [{"a": 1, "b": "x"}, {"b": "y", "a": 2}])
+            self.assertEqual(count, 2)
+            self.assertEqual(
+                [q["sql"] for q in stage.queries],
+                [
+                    "UPDATE t SET a = 1 WHERE b = 'x'",
+                    "UPDATE t SET a = 2 WHERE b = 'y'",
+                ],
+            )
+
+            # the rows of all the parameters are loaded at once
+            del stage.queries[:]
+            count = client.executemany(
+                "INSERT INTO t (a, b) VALUES (%(a)s, %(b)s)",
+                ({"b": "x", "a": i} for i in range(3)),
+            )
+            self.assertEqual(count, 3)
+            self.assertEqual(len(stage.uploads), 1)
+            self.assertEqual(stage.uploads[0].body, b"0,x\r\n1,x\r\n2,x\r\n")
+            self.assertEqual(stage.queries[-1]["sql"], "INSERT INTO t (a, b) VALUES")
+
+            # expressions in VALUES are executed one by one
+            del stage.queries[:]
+            client.executemany(
+                "INSERT INTO t VALUES (%(a)s, now())", [{"a": 1}, {"a": 2}]
+            )
+            self.assertEqual(
+                [q["sql"] for q in stage.queries],
+                ["INSERT INTO t VALUES (1, now())", "INSERT INTO t VALUES (2, now())"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,334 @@
+import datetime
+import pickle
+import sys
+import unittest
+import uuid
+import warnings
+from decimal import Decimal
+from types import MappingProxyType
+
+import pytz
+
+from databend_py import Client
+from databend_py.columnar import ColumnarResult, parse_numbers
+from databend_py.result import CompactRows, LazyRow, QueryResult
+from tests.stub_server import StubServer, query_page
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCHEMA = [
+    {"name": "id", "type": "UInt64"},
+    {"name": "name", "type": "String"},
+    {"name": "price", "type": "Nullable(Float64)"},
+    {"name": "flag", "type": "Boolean"},
+]
+
+
+def raw_page(rows):
+    return {"schema": SCHEMA, "data": rows}
+
+
+def sample_pages():
+    return [
+        raw_page([["1", "a", "1.5", "1"], ["2", "b", "NULL", "0"]]),
+        raw_page([]),
+        raw_page([["3", "c", "2.5", "1"]]),
+    ]
+
+
+def get_result(pages, **kwargs):
+    return QueryResult(iter(pages[1:]), pages[0], **kwargs).get_result()[1]
+
+
+class CompactRowsTestCase(unittest.TestCase):
+    def test_rows(self):
+        pages = sample_pages()
+        expected = get_result(pages)
+        rows = get_result(pages, compact_rows=True)
+        self.assertIsInstance(rows, CompactRows)
+        self.assertEqual(rows, expected)
+        self.assertEqual(expected, list(rows))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[-1], (3, "c", 2.5, True))
+        self.assertEqual(rows[1:], expected[1:])
+        with self.assertRaises(IndexError):
+            rows[3]
+        self.assertEqual(rows.column("price"), [1.5, "NULL", 2.5])
+        self.assertEqual(rows.column(0), [1, 2, 3])
+
+    def test_row_by_name(self):
+        row = get_result(sample_pages(), compact_rows=True)[0]
+        self.assertIsInstance(row, tuple)
+        self.assertEqual((row["name"], row.price, row[3]), ("a", 1.5, True))
+        self.assertEqual(row._asdict(), {"id": 1, "name": "a", "price": 1.5, "flag": True})
+        self.assertRaises(AttributeError, getattr, row, "missing")
+        self.assertEqual(pickle.loads(pickle.dumps(row)), (1, "a", 1.5, True))
+
+    def test_iter_result(self):
+        pages = sample_pages()
+        result = QueryResult(iter(pages[1:]), pages[0], compact_rows=True)
+        rows = list(result.iter_result())
+        self.assertEqual(rows, get_result(sample_pages()))
+        self.assertEqual([row.name for row in rows], ["a", "b", "c"])
+
+    def test_memory(self):
+        rows = [[str(i), str(i * 2), str(i * 0.5), "1"] for i in range(10000)]
+        schema = [
+            {"name": "a", "type": "Int64"},
+            {"name": "b", "type": "UInt64"},
+            {"name": "c", "type": "Float64"},
+            {"name": "d", "type": "Int32"},
+        ]
+        page = {"schema": schema, "data": rows}
+        tuples = get_result([page])
+        compact = get_result([page], compact_rows=True)
+        self.assertEqual(compact, tuples)
+        tuples_size = sys.getsizeof(tuples) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(c) for c in row) for row in tuples
+        )
+        compact_size = sum(
+            sys.getsizeof(column) for columns in compact._pages for column in columns
+        )
+        self.assertLess(compact_size * 5, tuples_size)
+
+    def test_client(self):
+        def handler(request):
+            return query_page(sample_pages()[0]["data"], schema=SCHEMA)
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + "?compact_rows=true&null_to_none=true")
+            _, rows = client.execute("SELECT")
+            iter_rows = list(client.execute_iter("SELECT"))
+        self.assertEqual(rows, [(1, "a", 1.5, True), (2, "b", None, False)])
+        self.assertEqual(rows[1].price, None)
+        self.assertEqual(iter_rows, rows)
+        self.assertEqual(iter_rows[1].price, None)
+
+
+class LazyRowsTestCase(unittest.TestCase):
+    def test_rows(self):
+        for null_to_none in (False, True):
+            expected = get_result(sample_pages(), null_to_none=null_to_none)
+            rows = get_result(sample_pages(), null_to_none=null_to_none, lazy_rows=True)
+            self.assertIsInstance(rows[0], LazyRow)
+            self.assertEqual(rows, expected)
+            self.assertEqual([tuple(row) for row in rows], expected)
+        pages = sample_pages()
+        result = QueryResult(iter(pages[1:]), pages[0], null_to_none=True, lazy_rows=True)
+        self.assertEqual(list(result.iter_result()), expected)
+        with self.assertRaises(ValueError):
+            QueryResult(iter(()), pages[0], compact_rows=True, lazy_rows=True)
+
+    def test_convert_on_access(self):
+        row = get_result(sample_pages(), lazy_rows=True)[0]
+        self.assertEqual(row._cells, None)
+        self.assertEqual((row["name"], row.price, row[-1]), ("a", 1.5, True))
+        self.assertEqual(row[1:3], ("a", 1.5))
+        self.assertEqual(len(row), 4)
+        self.assertEqual(row._asdict(), {"id": 1, "name": "a", "price": 1.5, "flag": True})
+        self.assertEqual(pickle.loads(pickle.dumps(row)), (1, "a", 1.5, True))
+        self.assertEqual(hash(row), hash((1, "a", 1.5, True)))
+        with self.assertRaises(IndexError):
+            row[4]
+        self.assertRaises(AttributeError, getattr, row, "missing")
+
+    def test_memoized(self):
+        calls = []
+
+        class CountingRow(LazyRow):
+            __slots__ = ()
+            _index = MappingProxyType({"a": 0, "b": 1})
+            _converters = (int, lambda d: calls.append(d) or int(d))
+
+        row = CountingRow(["1", "2"])
+        self.assertEqual((row.b, row.b, row[1]), (2, 2, 2))
+        self.assertEqual(calls, ["2"])
+
+
+TEMPORAL_SCHEMA = [
+    {"name": "ts", "type": "Nullable(Timestamp)"},
+    {"name": "d", "type": "Date"},
+    {"name": "dec", "type": "Decimal(10, 2)"},
+    {"name": "u", "type": "UUID"},
+    {"name": "a", "type": "Array(Date)"},
+]
+
+
+def temporal_page():
+    return {
+        "schema": TEMPORAL_SCHEMA,
+        "data": [
+            [
+                "2024-03-01 10:20:30.123456",
+                "2024-03-01",
+                "12.50",
+                "5f1c1e6c-2a3b-4c5d-8e9f-0a1b2c3d4e5f",
+                "['2024-03-01']",
+            ],
+            ["NULL", "1970-01-01", "-0.01", str(uuid.UUID(int=0)), "[]"],
+        ],
+    }
+
+
+class NativeTypesTestCase(unittest.TestCase):
+    def test_rows(self):
+        self.assertEqual(
+            get_result([temporal_page()])[0][:3],
+            ("2024-03-01 10:20:30.123456", "2024-03-01", "12.50"),
+        )
+        rows = get_result([temporal_page()], native_types=True, null_to_none=True)
+        self.assertEqual(
+            rows[0][:4],
+            (
+                datetime.datetime(2024, 3, 1, 10, 20, 30, 123456),
+                datetime.date(2024, 3, 1),
+                Decimal("12.50"),
+                uuid.UUID("5f1c1e6c-2a3b-4c5d-8e9f-0a1b2c3d4e5f"),
+            ),
+        )
+        # items of nested types are left to the nested decoders
+        self.assertEqual(rows[0][4], ["2024-03-01"])
+        self.assertEqual(
+            rows[1][:3], (None, datetime.date(1970, 1, 1), Decimal("-0.01"))
+        )
+
+    def test_timezone(self):
+        rows = get_result([temporal_page()], native_types=True, timezone="Asia/Shanghai")
+        ts = rows[0][0]
+        self.assertEqual(ts.utcoffset(), datetime.timedelta(hours=8))
+        self.assertEqual(
+            ts.astimezone(pytz.utc),
+            datetime.datetime(2024, 3, 1, 2, 20, 30, 123456, pytz.utc),
+        )
+        ts = get_result([temporal_page()], native_types=True, timezone="UTC")[0][0]
+        self.assertIs(ts.tzinfo, pytz.utc)
+        # ignored without native types
+        row = get_result([temporal_page()], timezone="UTC")[0]
+        self.assertEqual(row[0], "2024-03-01 10:20:30.123456")
+
+    def test_client(self):
+        def handler(request):
+            session = {"database": "default", "settings": {"timezone": "Europe/Paris"}}
+            return query_page(
+                [["2024-07-01 12:00:00.000000"]], schema=TEMPORAL_SCHEMA[:1], session=session
+            )
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + "?native_types=true")
+            _, rows = client.execute("SELECT")
+        self.assertEqual(rows[0][0].utcoffset(), datetime.timedelta(hours=2))
+
+
+NUMERIC_SCHEMA = [
+    {"name": "i", "type": "Int32"},
+    {"name": "u", "type": "UInt64"},
+    {"name": "f", "type": "Float32"},
+    {"name": "d", "type": "Nullable(Float64)"},
+    {"name": "b", "type": "Nullable(Boolean)"},
+    {"name": "s", "type": "String"},
+]
+
+
+def numeric_pages():
+    return [
+        {
+            "schema": NUMERIC_SCHEMA,
+            "data": [
+                ["-1", "18446744073709551615", "0.1", "1.25", "1", "x"],
+                ["2", "0", "3", "NULL", "NULL", "NULL"],
+            ],
+        },
+        {"schema": NUMERIC_SCHEMA, "data": [["3", "7", "-2.5", "1e300", "0", "z"]]},
+    ]
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class NumpyDecodeTestCase(unittest.TestCase):
+    def test_rows(self):
+        for null_to_none in (False, True):
+            expected = get_result(numeric_pages(), null_to_none=null_to_none)
+            rows = get_result(numeric_pages(), null_to_none=null_to_none, numpy_decode=True)
+            self.assertEqual(rows, expected)
+            for row, expected_row in zip(rows, expected):
+                self.assertEqual(
+                    [type(c) for c in row], [type(c) for c in expected_row]
+                )
+        self.assertEqual(rows[0][2], 0.1)
+
+    def test_iter_and_compact(self):
+        expected = get_result(numeric_pages())
+        pages = numeric_pages()
+        result = QueryResult(iter(pages[1:]), pages[0], numpy_decode=True)
+        self.assertEqual(list(result.iter_result()), expected)
+        rows = get_result(numeric_pages(), compact_rows=True, numpy_decode=True)
+        self.assertEqual(rows, expected)
+        # the NULL free columns are views over the parsed arrays
+        self.assertIsInstance(rows._pages[1][0], memoryview)
+        self.assertEqual(rows.column("u"), [18446744073709551615, 0, 7])
+
+    def test_malformed_numbers(self):
+        page = {
+            "schema": [{"name": "i", "type": "Int64"}],
+            "data": [["1"], ["-2"], ["3"]],
+        }
+        rows = get_result([page], numpy_decode=True)
+        self.assertEqual(rows, [(1,), (-2,), (3,)])
+        page["data"].append([""])
+        with self.assertRaises(ValueError):
+            get_result([page], numpy_decode=True)
+        page["data"][-1] = ["1 2"]
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            with self.assertRaises(ValueError):
+                get_result([page], numpy_decode=True)
+
+    def test_out_of_range_numbers(self):
+        page = {
+            "schema": [
+                {"name": "u", "type": "UInt8"},
+                {"name": "i", "type": "Nullable(Int8)"},
+            ],
+            "data": [["300", "-129"], ["1", "NULL"]],
+        }
+        expected = get_result([page])
+        self.assertEqual(expected, [(300, -129), (1, "NULL")])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.assertEqual(get_result([page], numpy_decode=True), expected)
+            self.assertEqual(
+                get_result([page], numpy_decode=True, compact_rows=True), expected
+            )
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class ColumnarResultTestCase(unittest.TestCase):
+    def get_columns(self, pages, **kwargs):
+        return ColumnarResult(iter(pages[1:]), pages[0], **kwargs).get_result()[1]
+
+    def test_converters(self):
+        for native_types in (False, True):
+            rows = get_result(
+                [temporal_page()], native_types=native_types, null_to_none=True
+            )
+            columns = self.get_columns([temporal_page()], native_types=native_types)
+            for i, field in enumerate(TEMPORAL_SCHEMA):
+                self.assertEqual(
+                    columns[field["name"]].tolist(), [row[i] for row in rows]
+                )
+        # nested columns are decoded by their full type
+        self.assertEqual(columns["a"].tolist(), [["2024-03-01"], []])
+
+    def test_empty_columns(self):
+        schema = NUMERIC_SCHEMA[:1] + [{"name": "s", "type": "Int16"}]
+        page = {"schema": schema, "data": []}
+        columns = self.get_columns([page])
+        self.assertEqual(columns["i"].dtype.name, "int32")
+        self.assertEqual(columns["s"].dtype.name, "int16")
+        self.assertEqual(parse_numbers([], "uint8").dtype.name, "uint8")
+
+
+if __name__ == "__main__":
+    unittest.main()
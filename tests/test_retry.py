@@ -0,0 +1,167 @@
+import time
+import unittest
+
+import requests
+
+from databend_py import Client
+from databend_py.errors import HTTPStatusException, WarehouseTimeoutException
+from databend_py.retry import RetryPolicy
+from tests.stub_server import StubServer, json_response, query_page
+
+FAST_RETRY = "?retry_initial_delay=0.01&retry_max_delay=0.05"
+
+
+def page(n, next_uri):
+    return query_page([[str(n)]], next_uri)
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def test_backoff(self):
+        policy = RetryPolicy(initial_delay=1, max_delay=5, jitter=0.5)
+        for attempt, base in [(1, 1), (2, 2), (3, 4), (4, 5), (10, 5)]:
+            delay = policy.backoff(attempt)
+            self.assertLessEqual(delay, base)
+            self.assertGreaterEqual(delay, base / 2)
+        self.assertEqual(RetryPolicy(jitter=0).backoff(3), 4)
+
+    def test_classify(self):
+        policy = RetryPolicy()
+        cases = [
+            (WarehouseTimeoutException("no endpoint"), True, True),
+            (HTTPStatusException("", 429), True, True),
+            (HTTPStatusException("", 503), True, True),
+            (HTTPStatusException("", 502), False, True),
+            (HTTPStatusException("", 504), False, True),
+            (HTTPStatusException("", 500), False, True),
+            (HTTPStatusException("", 400), False, False),
+            (requests.exceptions.ConnectTimeout(), True, True),
+            (requests.exceptions.ConnectionError(), False, True),
+            (requests.exceptions.ReadTimeout(), False, True),
+            (ValueError(), False, False),
+        ]
+        for exc, query, page_get in cases:
+            self.assertEqual(policy.classify(exc) is not None, query, exc)
+            self.assertEqual(
+                policy.classify(exc, idempotent=True) is not None, page_get, exc
+            )
+
+    def test_refused_connection(self):
+        policy = RetryPolicy()
+        with self.assertRaises(requests.exceptions.ConnectionError) as cm:
+            requests.post("http://127.0.0.1:1/v1/query/", timeout=5)
+        self.assertEqual(policy.classify(cm.exception), "connect")
+
+        client = Client.from_url(
+            "http://root:@127.0.0.1:1/default" + FAST_RETRY + "&retry_connect_max_attempts=3"
+        )
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.execute("SELECT 1")
+        self.assertEqual(
+            client.connection.retry_policy.stats.as_dict()["reasons"], {"connect": 2}
+        )
+
+    def test_max_attempts(self):
+        policy = RetryPolicy(max_attempts=3, initial_delay=0.001)
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise HTTPStatusException("unavailable", 503)
+
+        with self.assertRaises(HTTPStatusException):
+            policy.call(fail)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(policy.stats.as_dict()["reasons"], {"http_503": 2})
+        self.assertEqual(policy.stats.failures, 1)
+
+    def test_budgets(self):
+        policy = RetryPolicy.from_settings(
+            {"retry_connect_max_attempts": "2", "retry_warehouse_deadline": "600"}
+        )
+        self.assertEqual(policy.budget("connect"), (2, 5.0))
+        self.assertEqual(policy.budget("warehouse_timeout"), (11, 600.0))
+        self.assertEqual(policy.budget("http_503"), (5, 60.0))
+        start_time = time.monotonic()
+        exc = requests.exceptions.ConnectTimeout()
+        self.assertIsNotNone(policy.next_delay(exc, 1, start_time))
+        self.assertIsNone(policy.next_delay(exc, 2, start_time))
+        exc = WarehouseTimeoutException("no endpoint")
+        self.assertIsNotNone(policy.next_delay(exc, 10, start_time))
+
+    def test_deadline(self):
+        policy = RetryPolicy(initial_delay=0.05, jitter=0, deadline=0.2)
+        start_time = time.monotonic()
+        with self.assertRaises(HTTPStatusException):
+            policy.call(self.raise_unavailable)
+        self.assertLess(time.monotonic() - start_time, 0.2)
+        # 0.05 + 0.1, the next 0.2 wait would exceed the deadline
+        self.assertEqual(policy.stats.retries, 2)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(initial_delay=0.001)
+        exc = HTTPStatusException("too many requests", 429, retry_after=3)
+        self.assertEqual(policy.next_delay(exc, 1, time.monotonic()), 3)
+
+    @staticmethod
+    def raise_unavailable():
+        raise HTTPStatusException("unavailable", 503)
+
+
+class ClientRetryTestCase(unittest.TestCase):
+    def test_page_retry(self):
+        failures = {"/v1/query/q1/page/1": [500, 503]}
+
+        def handler(request):
+            if request.method == "POST":
+                return page(0, "/v1/query/q1/page/1")
+            if failures.get(request.path):
+                return failures[request.path].pop(0), {}, b"busy"
+            return page(1, None)
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + FAST_RETRY)
+            _, rows = client.execute("SELECT")
+        self.assertEqual(rows, [(0,), (1,)])
+        stats = client.retry_stats
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["reasons"], {"http_500": 1, "http_503": 1})
+
+    def test_query_not_retried(self):
+        def handler(request):
+            return 500, {}, b"internal error"
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + FAST_RETRY)
+            with self.assertRaises(HTTPStatusException) as cm:
+                client.execute("INSERT INTO t SELECT 1")
+        self.assertEqual(cm.exception.status_code, 500)
+        self.assertEqual(len(server.requests), 1)
+
+    def test_gateway_error_not_retried(self):
+        def handler(request):
+            return 502, {}, b"bad gateway"
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + FAST_RETRY)
+            with self.assertRaises(HTTPStatusException):
+                client.execute("INSERT INTO t SELECT 1")
+        self.assertEqual(len(server.requests), 1)
+
+    def test_warehouse_wakeup(self):
+        posts = []
+
+        def handler(request):
+            posts.append(request)
+            if len(posts) < 3:
+                return json_response({"error": "no endpoint to route"}, 404)
+            return page(0, None)
+
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url + FAST_RETRY)
+            _, rows = client.execute("SELECT")
+        self.assertEqual(rows, [(0,)])
+        self.assertEqual(client.retry_stats["reasons"], {"warehouse_timeout": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
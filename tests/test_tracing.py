@@ -0,0 +1,138 @@
+import unittest
+
+from databend_py import Client
+from databend_py.tracing import (
+    NOOP_TRACER,
+    LoggingTracer,
+    OpenTelemetryTracer,
+    Span,
+    Tracer,
+    get_tracer,
+)
+from tests.stub_server import StubServer, query_page
+from tests.test_uploader import StubStage, sample_rows
+
+try:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+except ImportError:
+    TracerProvider = None
+
+
+class RecordingSpan(Span):
+    __slots__ = ("attributes", "name")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.spans = []
+
+    def span(self, name, **attributes):
+        span = RecordingSpan(name, attributes)
+        self.spans.append(span)
+        return span
+
+    def named(self, name):
+        return [span.attributes for span in self.spans if span.name == name]
+
+
+def page(n, next_uri):
+    return query_page([[str(n)], [str(n)]], next_uri)
+
+
+class TracerTestCase(unittest.TestCase):
+    def test_get_tracer(self):
+        self.assertIs(get_tracer(), NOOP_TRACER)
+        self.assertIsInstance(get_tracer(debug=True), LoggingTracer)
+        self.assertIsInstance(get_tracer("log"), LoggingTracer)
+        tracer = RecordingTracer()
+        self.assertIs(get_tracer(tracer, debug=True), tracer)
+        with self.assertRaises(ValueError):
+            get_tracer("statsd")
+        self.assertIs(Client("localhost").connection.tracer, NOOP_TRACER)
+
+    def test_logging_tracer(self):
+        with self.assertLogs("databend_py.log", level="DEBUG") as cm:
+            with LoggingTracer().span("upload.put", rows=2) as span:
+                span.set_attribute("bytes", 10)
+            with self.assertRaises(KeyError), LoggingTracer().span("upload.copy"):
+                raise KeyError("t")
+        self.assertRegex(cm.output[0], r"span upload\.put [0-9.]+s rows=2 bytes=10")
+        self.assertIn("error=KeyError('t')", cm.output[1])
+
+    def test_query_spans(self):
+        def handler(request):
+            if request.method == "POST":
+                return page(0, "/v1/query/q1/page/1")
+            return page(1, None)
+
+        tracer = RecordingTracer()
+        with StubServer(handler) as server:
+            client = Client.from_url(server.url)
+            client.connection.tracer = tracer
+            _, rows = client.execute("SELECT n FROM t")
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            [span.name for span in tracer.spans],
+            ["query", "query.submit", "page.fetch", "page.decode"],
+        )
+        query = tracer.named("query")[0]
+        self.assertEqual(query["sql"], "SELECT n FROM t")
+        self.assertEqual(query["rows"], 2)
+        fetch = tracer.named("page.fetch")[0]
+        self.assertEqual(fetch["query_id"], "q1")
+        self.assertGreater(fetch["bytes"], 0)
+        self.assertEqual(tracer.named("page.decode")[0]["rows"], 2)
+
+    def test_upload_spans(self):
+        rows = sample_rows(10)
+        tracer = RecordingTracer()
+        with StubStage() as stage:
+            client = Client(
+                "127.0.0.1",
+                port=stage.server.port,
+                settings={"tracer": tracer},
+            )
+            client.insert("db", "t", rows)
+
+        names = [span.name for span in tracer.spans if span.name.startswith("upload")]
+        self.assertEqual(
+            names, ["upload.presign", "upload.serialize", "upload.put", "upload.copy"]
+        )
+        serialize = tracer.named("upload.serialize")[0]
+        put = tracer.named("upload.put")[0]
+        self.assertEqual((serialize["rows"], serialize["format"]), (10, "csv"))
+        self.assertEqual(put, {"rows": 10, "bytes": serialize["bytes"]})
+        self.assertEqual(put["bytes"], len(stage.uploads[0].body))
+        self.assertEqual(tracer.named("upload.copy")[0]["table"], "db.t")
+
+    @unittest.skipIf(TracerProvider is None, "requires opentelemetry-sdk")
+    def test_opentelemetry(self):
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        tracer = OpenTelemetryTracer(provider.get_tracer("test"))
+        with StubServer(lambda request: page(0, None)) as server:
+            client = Client.from_url(server.url)
+            client.connection.tracer = tracer
+            client.execute("SELECT 1")
+
+        submit, query = exporter.get_finished_spans()
+        self.assertEqual((submit.name, query.name), ("databend.query.submit", "databend.query"))
+        self.assertEqual(submit.parent.span_id, query.context.span_id)
+        self.assertEqual(query.attributes["databend.sql"], "SELECT 1")
+        self.assertEqual(query.attributes["databend.rows"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,339 @@
+import gzip
+import io
+import time
+import unittest
+
+from databend_py import Client
+from databend_py.errors import ServerException, UnexpectedException
+from tests.stub_server import StubServer, json_response, query_page
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class StubStage:
+    """
+    Answers presign queries with an url on the stub server itself, records
+    the uploads and the queries.
+    """
+
+    def __init__(self):
+        self.uploads = []
+        self.queries = []
+        # COPY statements answered with an error
+        self.failing_copies = 0
+        self.server = StubServer(self.handle)
+
+    def handle(self, request):
+        if request.method == "PUT":
+            self.uploads.append(request)
+            return 200, {}, b""
+        body = request.json()
+        self.queries.append(body)
+        if body["sql"].startswith("COPY") and self.failing_copies:
+            self.failing_copies -= 1
+            return json_response(
+                {
+                    "id": "q1",
+                    "error": {"code": 1006, "message": "column d is missing"},
+                    "next_uri": None,
+                }
+            )
+        if body["sql"].startswith("SELECT * FROM"):
+            schema = [
+                {"name": "a", "type": "Int64"},
+                {"name": "b", "type": "String"},
+                {"name": "c", "type": "Nullable(Float64)"},
+            ]
+            return query_page([], schema=schema)
+        if body["sql"].startswith("presign upload"):
+            schema = [
+                {"name": "method", "type": "String"},
+                {"name": "headers", "type": "Variant"},
+                {"name": "url", "type": "String"},
+            ]
+            url = f"http://127.0.0.1:{self.server.port}/stage"
+            return query_page([["PUT", "{}", url]], schema=schema)
+        return query_page([], schema=[])
+
+    def __enter__(self):
+        self.server.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.__exit__(*exc_info)
+
+
+def sample_rows(n):
+    return [(i, f"row, {i}", None if i % 3 else 1.5) for i in range(n)]
+
+
+class DataUploaderTestCase(unittest.TestCase):
+    def test_serialize_data_stream(self):
+        client = Client("localhost")
+        rows = sample_rows(25001)
+        expected = client._uploader._serialize_data(rows, False)
+        stats = {}
+        chunks = list(client._uploader._serialize_data_stream(rows, False, stats))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), expected)
+        self.assertEqual(stats, {"rows": 25001, "bytes": len(expected)})
+        compressed = b"".join(client._uploader._serialize_data_stream(iter(rows), True))
+        self.assertEqual(gzip.decompress(compressed), expected)
+
+    def test_stream_upload(self):
+        rows = sample_rows(100)
+        with StubStage() as stage:
+            Client.from_url(stage.server.url).insert("db", "t", rows)
+            client = Client.from_url(stage.server.url + "?stream_upload=true")
+            client.insert("db", "t", rows)
+            client.insert("db", "t", iter(rows))
+
+        buffered, streamed, streamed_iter = stage.uploads
+        self.assertNotIn("Transfer-Encoding", buffered.headers)
+        self.assertEqual(streamed.headers["Transfer-Encoding"], "chunked")
+        self.assertEqual(streamed.body, buffered.body)
+        self.assertEqual(streamed_iter.body, buffered.body)
+        copies = [q["sql"] for q in stage.queries if q["sql"].startswith("COPY")]
+        self.assertEqual(len(copies), 3)
+
+    def test_iterator_not_streamed(self):
+        with StubStage() as stage:
+            client = Client.from_url(stage.server.url)
+            with self.assertRaises(TypeError):
+                client.insert("db", "t", iter(sample_rows(10)))
+            with self.assertRaises(TypeError):
+                client.replace("db", "t", ["a"], iter(sample_rows(10)))
+        # rejected before presigning the upload
+        self.assertEqual(stage.queries, [])
+
+    def test_parallel_parts(self):
+        rows = sample_rows(35)
+        url_params = "?upload_parallelism=4&upload_part_rows=10"
+        with StubStage() as stage:
+            expected = Client("localhost")._uploader._serialize_data(rows, False)
+            client = Client.from_url(stage.server.url + url_params)
+            client.insert("db", "t", rows)
+
+            presigned = [q["sql"] for q in stage.queries if q["sql"].startswith("presign")]
+            self.assertEqual(len(presigned), 4)
+            stage_dir = presigned[0].split(" ")[-1].rsplit("/", 1)[0]
+            copy = stage.queries[-1]["sql"]
+            self.assertTrue(
+                copy.startswith(
+                    f"COPY INTO db.t FROM {stage_dir}/ FILES = ('part-00000.csv', "
+                    "'part-00001.csv', 'part-00002.csv', 'part-00003.csv') "
+                ),
+                copy,
+            )
+            self.assertEqual(len(stage.uploads), 4)
+            self.assertEqual(
+                sorted(len(u.body.splitlines()) for u in stage.uploads), [5, 10, 10, 10]
+            )
+            self.assertEqual(
+                sorted(b"".join(u.body for u in stage.uploads).splitlines()),
+                sorted(expected.splitlines()),
+            )
+
+            client.replace("db", "t", ["x"], rows)
+            attachment = stage.queries[-1]["stage_attachment"]
+            self.assertTrue(attachment["location"].endswith("/"))
+
+            Client.from_url(stage.server.url + url_params).insert("db", "t", rows[:10])
+            self.assertNotIn("FILES", stage.queries[-1]["sql"])
+
+    def test_parallel_parts_presign_pool(self):
+        rows = sample_rows(35)
+        url_params = "?upload_parallelism=4&upload_part_rows=10&presign_pool_size=4"
+        with StubStage() as stage:
+            with Client.from_url(stage.server.url + url_params) as client:
+                pool = client._uploader.presign_pool
+                self.assertIsNone(pool.get())
+                deadline = time.monotonic() + 5
+                while len(pool._ready) < 4 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                client.insert("db", "t", rows)
+                self.assertEqual(pool.hits, 4)
+
+            pooled_paths = [
+                q["sql"].split(" ")[2] for q in stage.queries if "EXPIRE" in q["sql"]
+            ]
+            copy = stage.queries[-1]["sql"]
+            self.assertTrue(copy.startswith("COPY INTO db.t FROM @~/ FILES = ("), copy)
+            files = copy.split("(")[1].split(")")[0].replace("'", "").split(", ")
+            self.assertEqual(len(files), 4)
+            self.assertTrue(all("@~/" + f in pooled_paths for f in files))
+            self.assertEqual(
+                sorted(len(u.body.splitlines()) for u in stage.uploads), [5, 10, 10, 10]
+            )
+
+    def test_presign_pool(self):
+        rows = sample_rows(10)
+        with StubStage() as stage:
+            with Client.from_url(stage.server.url + "?presign_pool_size=2") as client:
+                pool = client._uploader.presign_pool
+                # the first upload starts the pool
+                client.insert("db", "t", rows)
+                deadline = time.monotonic() + 5
+                while len(pool._ready) < 2 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                presigns = len([q for q in stage.queries if q["sql"].startswith("presign")])
+                client.insert("db", "t", rows)
+                client.replace("db", "t", ["x"], rows)
+                self.assertEqual((pool.hits, pool.misses), (2, 1))
+
+            presigned = [q["sql"] for q in stage.queries if q["sql"].startswith("presign")]
+            self.assertGreaterEqual(len(presigned), presigns)
+            self.assertTrue(presigned[-1].endswith(".csv EXPIRE = 3600"), presigned[-1])
+            pooled_paths = [sql.split(" ")[2] for sql in presigned if "EXPIRE" in sql]
+            copy = [q["sql"] for q in stage.queries if q["sql"].startswith("COPY")][-1]
+            self.assertIn(copy.split(" ")[4], pooled_paths)
+            attachment = stage.queries[-1]["stage_attachment"]
+            self.assertIn(attachment["location"], pooled_paths)
+            self.assertEqual(len(stage.uploads), 3)
+
+    def test_presign_pool_expire(self):
+        with StubStage() as stage:
+            client = Client.from_url(
+                stage.server.url + "?presign_pool_size=1&presign_expire=30"
+            )
+            pool = client._uploader.presign_pool
+            self.assertEqual(pool.expire_margin, 15)
+            self.assertIsNone(pool.get())
+            deadline = time.monotonic() + 5
+            while not pool._ready and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # urls expiring within the margin are never handed out
+            pool._ready[0].expires_at = time.monotonic() + 10
+            self.assertIsNone(pool.get())
+            while not pool._ready and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertIsNotNone(pool.get())
+            self.assertEqual((pool.hits, pool.misses), (1, 2))
+            client.close()
+            self.assertTrue(
+                all(q["sql"].endswith("EXPIRE = 30") for q in stage.queries)
+            )
+
+    @unittest.skipIf(pq is None, "pyarrow is not installed")
+    def test_parquet(self):
+        rows = sample_rows(25)
+        with StubStage() as stage:
+            client = Client.from_url(stage.server.url + "?upload_format=parquet")
+            client.insert("db", "t", rows)
+            client.insert("db", "t", iter(rows))
+            client.execute("INSERT INTO t (c, a) VALUES", [(1.5, 1)])
+            client.insert("db", "t", {"a": [1, 2], "b": ["x", "y"]})
+
+        selects = [q["sql"] for q in stage.queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(selects, ["SELECT * FROM db.t LIMIT 0"])
+        presigned = [q["sql"] for q in stage.queries if q["sql"].startswith("presign")]
+        self.assertTrue(all(sql.endswith(".parquet") for sql in presigned))
+        copy = next(q["sql"] for q in stage.queries if q["sql"].startswith("COPY"))
+        self.assertIn(".parquet FILE_FORMAT = (type = PARQUET) PURGE", copy)
+        attachment = next(q for q in stage.queries if "stage_attachment" in q)
+        self.assertEqual(
+            attachment["stage_attachment"]["file_format_options"], {"type": "PARQUET"}
+        )
+
+        tables = [pq.read_table(io.BytesIO(u.body)) for u in stage.uploads]
+        self.assertEqual(tables[0].column_names, ["a", "b", "c"])
+        self.assertEqual(str(tables[0].schema.field("a").type), "int64")
+        self.assertEqual(tables[0].to_pylist(), tables[1].to_pylist())
+        self.assertEqual(
+            [tuple(r.values()) for r in tables[0].to_pylist()], rows
+        )
+        self.assertEqual(tables[2].to_pylist(), [{"c": 1.5, "a": 1}])
+        self.assertEqual(tables[3].column_names, ["a", "b"])
+
+    @unittest.skipIf(pq is None, "pyarrow is not installed")
+    def test_parquet_columns_refreshed(self):
+        with StubStage() as stage:
+            client = Client.from_url(stage.server.url + "?upload_format=parquet")
+            client.insert("db", "t", sample_rows(1))
+            # the table was altered, its cached columns are stale
+            stage.failing_copies = 1
+            with self.assertRaises(UnexpectedException):
+                client.insert("db", "t", sample_rows(1))
+            client.insert("db", "t", sample_rows(1))
+
+        selects = [q["sql"] for q in stage.queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(selects, ["SELECT * FROM db.t LIMIT 0"] * 2)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            Client("localhost", settings={"upload_format": "xml"})
+
+
+def multipart_file(request):
+    boundary = request.headers["Content-Type"].split("boundary=")[1].encode()
+    part = request.body.split(b"--" + boundary)[1]
+    headers, content = part.split(b"\r\n\r\n", 1)
+    return headers, content[: -len(b"\r\n")]
+
+
+class StreamingLoadTestCase(unittest.TestCase):
+    def handle(self, request):
+        if request.path != "/v1/streaming_load":
+            return query_page([], schema=[])
+        if "fail" in request.headers["X-DATABEND-SQL"]:
+            return json_response(
+                {"error": {"code": 1025, "message": "Unknown table fail"}}, 400
+            )
+        return json_response({"id": "q1", "stats": {"rows": 1, "bytes": 1}})
+
+    def test_insert(self):
+        rows = sample_rows(100)
+        expected = Client("localhost")._uploader._serialize_data(rows, False)
+        with StubServer(self.handle) as server:
+            client = Client.from_url(server.url + "?load_method=streaming_load")
+            client.insert("db", "t", rows)
+            client.replace("db", "t", ["a", "b"], rows)
+            client.execute("INSERT INTO t (a, b, c) VALUES", rows)
+            stream_client = Client.from_url(
+                server.url + "?load_method=streaming_load&stream_upload=true&compress=true"
+            )
+            stream_client.insert("db", "t", iter(rows))
+
+        # a single request per batch, no presign, no stage, no COPY
+        self.assertEqual(len(server.requests), 4)
+        file_format = (
+            "FROM @_databend_load FILE_FORMAT = "
+            "(type = CSV RECORD_DELIMITER = '\\r\\n' COMPRESSION = AUTO)"
+        )
+        self.assertEqual(
+            [r.headers["X-DATABEND-SQL"] for r in server.requests],
+            [
+                "INSERT INTO db.t " + file_format,
+                "REPLACE INTO db.t ON (a,b) " + file_format,
+                "INSERT INTO t (a, b, c) " + file_format,
+                "INSERT INTO db.t " + file_format,
+            ],
+        )
+        for request in server.requests[:3]:
+            self.assertEqual(request.method, "PUT")
+            headers, content = multipart_file(request)
+            self.assertIn(b'name="upload"; filename="data.csv"', headers)
+            self.assertEqual(content, expected)
+        streamed = server.requests[3]
+        self.assertEqual(streamed.headers["Transfer-Encoding"], "chunked")
+        headers, content = multipart_file(streamed)
+        self.assertIn(b'filename="data.csv.gz"', headers)
+        self.assertEqual(gzip.decompress(content), expected)
+
+    def test_error(self):
+        with StubServer(self.handle) as server:
+            client = Client.from_url(server.url + "?load_method=streaming_load")
+            with self.assertRaises(ServerException) as cm:
+                client.insert("db", "fail", sample_rows(1))
+            self.assertEqual(cm.exception.code, 1025)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            Client("localhost", settings={"load_method": "ftp"})
+
+
+if __name__ == "__main__":
+    unittest.main()